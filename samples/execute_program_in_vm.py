@@ -23,13 +23,41 @@ python execute_program_in_vm.py
     This should work on any debian/ubuntu type of vm, and will basically copy
     the content of the network configuration to /tmp/plop
 
+    With --vm_name_pattern and/or --vm_list the same program is run across
+    every matching VM using a pool of workers, and a report of the exit codes
+    is printed once all of them completed:
+
+python execute_program_in_vm.py ... --vm_name_pattern "web-*" --workers 32
+    --path_to_program "/usr/bin/uptime"
+
 """
 import time
 import re
-from tools import cli, service_instance, pchelper
+from tools import cli, service_instance, pchelper, guestops
 from pyVmomi import vim, vmodl
 
 
+def run_on_vms(si, args, creds, program_spec):
+    """
+    Run program_spec on all VMs selected by name pattern or list and print
+    the aggregated exit codes
+    """
+    names = guestops.read_vm_list(args.vm_list) if args.vm_list else None
+    vms = guestops.select_vms(si, names=names, pattern=args.vm_name_pattern)
+    if not vms:
+        raise SystemExit("Unable to locate any virtual machine.")
+
+    print("Running %s on %d VMs" % (args.path_to_program, len(vms)))
+    results = guestops.run_programs_on_vms(si, vms, creds, [program_spec],
+                                           workers=args.workers, timeout=args.timeout)
+    report = guestops.summarize(results)
+    for outcome, vm_names in sorted(report.items(), key=lambda item: -len(item[1])):
+        print("%s: %d VMs" % (outcome, len(vm_names)))
+        for vm_name in vm_names:
+            print("  %s" % vm_name)
+    return 0 if all(result.succeeded for result in results) else 1
+
+
 def main():
     """
     Simple command-line program for executing a process in the VM without the
@@ -44,12 +72,35 @@ def main():
     parser.add_custom_argument('--program_arguments', required=False, action='store',
                                help='Program command line options. '
                                     'e.g. "/etc/network/interfaces > /tmp/plop"')
+    parser.add_custom_argument('--vm_name_pattern', required=False, action='store',
+                               help='Run on every VM whose name matches this glob pattern')
+    parser.add_custom_argument('--vm_list', required=False, action='store',
+                               help='Run on every VM named in this file, one name per line')
+    parser.add_custom_argument('--workers', required=False, action='store', type=int,
+                               default=16, help='Number of VMs processed concurrently')
+    parser.add_custom_argument('--timeout', required=False, action='store', type=int,
+                               default=600, help='Seconds to wait for the program in each VM')
     args = parser.get_args()
-   
+
     si = service_instance.connect(args)
     try:
         content = si.RetrieveContent()
 
+        creds = vim.vm.guest.NamePasswordAuthentication(
+            username=args.vm_user, password=args.vm_password
+        )
+
+        if args.program_arguments:
+            program_spec = vim.vm.guest.ProcessManager.ProgramSpec(
+                programPath=args.path_to_program,
+                arguments=args.program_arguments)
+        else:
+            program_spec = vim.vm.guest.ProcessManager.ProgramSpec(
+                programPath=args.path_to_program)
+
+        if args.vm_name_pattern or args.vm_list:
+            return run_on_vms(si, args, creds, program_spec)
+
         vm = None
         if args.uuid:
             # if instanceUuid(last argument) is false it will search for VM BIOS UUID instead
@@ -67,21 +118,9 @@ def main():
                 "Rerun the script after verifying that VMwareTools "
                 "is running")
 
-        creds = vim.vm.guest.NamePasswordAuthentication(
-            username=args.vm_user, password=args.vm_password
-        )
-
         try:
             profile_manager = content.guestOperationsManager.processManager
 
-            if args.program_arguments:
-                program_spec = vim.vm.guest.ProcessManager.ProgramSpec(
-                    programPath=args.path_to_program,
-                    arguments=args.program_arguments)
-            else:
-                program_spec = vim.vm.guest.ProcessManager.ProgramSpec(
-                    programPath=args.path_to_program)
-
             res = profile_manager.StartProgramInGuest(vm, creds, program_spec)
 
             if res > 0:
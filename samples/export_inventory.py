@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Example of exporting an inventory snapshot of all VMs, hosts, datastores
+and networks into a SQLite database.
+
+The properties are retrieved in pages of --page-size objects and written to
+the database as they arrive. Reports can then query the snapshot with any
+SQLite client instead of querying vCenter again, e.g.:
+
+    sqlite3 inventory.db "SELECT host.name, count(*) FROM vm
+                          JOIN host ON vm.host = host.moid GROUP BY host.name"
+    sqlite3 inventory.db "SELECT vm.name FROM vm
+                          JOIN vm_datastore ON vm.moid = vm_datastore.vm
+                          JOIN datastore ON datastore.moid = vm_datastore.datastore
+                          WHERE datastore.name = 'datastore1'"
+"""
+
+from tools import cli, service_instance, inventory_export
+
+__author__ = "VMware, Inc."
+
+
+def main():
+    parser = cli.Parser()
+    parser.add_custom_argument('--output', required=False, action='store',
+                               default='inventory.db',
+                               help='SQLite database to write the snapshot to')
+    parser.add_custom_argument('--page-size', required=False, action='store', type=int,
+                               default=1000, help='Objects retrieved per round trip')
+    args = parser.get_args()
+    si = service_instance.connect(args)
+
+    counts = inventory_export.export_inventory(si, args.output, args.page_size)
+    for table, count in counts.items():
+        print("%s: %d" % (table, count))
+    print("Snapshot written to %s" % args.output)
+
+
+# Start program
+if __name__ == "__main__":
+    main()
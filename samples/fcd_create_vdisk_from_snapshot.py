@@ -42,8 +42,7 @@ def main():
         content = si.RetrieveContent()
 
         # Connect to SPBM Endpoint
-        pbm_si = pbmhelper.create_pbm_session(si._stub)
-        pbm_content = pbm_si.RetrieveContent()
+        pbm_content = pbmhelper.get_pbm_content(si._stub)
 
         # Retrieving Storage Policy
         if args.storage_policy_name:
@@ -15,29 +15,8 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-from tools import cli, service_instance
-
-MAX_DEPTH = 10
-
-
-def print_vminfo(vm, depth=1):
-    """
-    Print information for a particular virtual machine or recurse into a folder
-    with depth protection
-    """
-
-    # if this is a group it will have children. if it does, recurse into them
-    # and then return
-    if hasattr(vm, 'childEntity'):
-        if depth > MAX_DEPTH:
-            return
-        vmlist = vm.childEntity
-        for child in vmlist:
-            print_vminfo(child, depth+1)
-        return
-
-    summary = vm.summary
-    print(summary.config.name)
+from pyVmomi import vim
+from tools import cli, output, pchelper, service_instance
 
 
 def main():
@@ -46,17 +25,22 @@ def main():
     """
 
     parser = cli.Parser()
+    parser.add_optional_arguments(cli.Argument.OUTPUT)
     args = parser.get_args()
     si = service_instance.connect(args)
 
-    content = si.RetrieveContent()
-    for child in content.rootFolder.childEntity:
-        if hasattr(child, 'vmFolder'):
-            datacenter = child
-            vmfolder = datacenter.vmFolder
-            vmlist = vmfolder.childEntity
-            for vm in vmlist:
-                print_vminfo(vm)
+    container_view = pchelper.get_container_view(si, obj_type=[vim.VirtualMachine])
+    try:
+        with output.open_writer(args.output, ['name']) as writer:
+            for page in pchelper.iter_properties(si, view_ref=container_view,
+                                                 obj_type=vim.VirtualMachine,
+                                                 path_set=['name']):
+                for properties in page:
+                    writer.write(properties)
+                if writer.closed:
+                    break
+    finally:
+        container_view.Destroy()
 
 
 # Start program
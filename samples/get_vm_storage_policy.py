@@ -13,11 +13,17 @@ and Virtual Disk Storage Policies
 
 Thanks to William Lam (https://github.com/lamw) for ideas from
 the script list_vm_storage_policy.py
+
+With --bulk the VM names and virtual disks are collected in one property
+collector call, associated profiles and compliance results are queried for
+many VM homes and disks per PBM call, and every distinct profile is retrieved
+only once. The report is printed as tab separated lines while it is built:
+
+    vm name, entity (VM Home or disk label), policy names, compliance status
 """
 
-import re
-from pyVmomi import pbm, vim, VmomiSupport, SoapStubAdapter
-from tools import cli, service_instance
+from pyVmomi import pbm, vim
+from tools import cli, service_instance, name_index, pbmhelper
 
 
 class BColors(object):
@@ -34,42 +40,7 @@ class BColors(object):
     UNDERLINE = '\033[4m'
 
 
-def pbm_connect(stub_adapter, disable_ssl_verification=False):
-    """Connect to the VMware Storage Policy Server
-
-    :param stub_adapter: The ServiceInstance stub adapter
-    :type stub_adapter: SoapStubAdapter
-    :param disable_ssl_verification: A flag used to skip ssl certificate
-        verification (default is False)
-    :type disable_ssl_verification: bool
-    :returns: A VMware Storage Policy Service content object
-    :rtype: ServiceContent
-    """
-
-    if disable_ssl_verification:
-        import ssl
-        if hasattr(ssl, '_create_unverified_context'):
-            ssl_context = ssl._create_unverified_context()
-        else:
-            ssl_context = None
-    else:
-        ssl_context = None
-
-    VmomiSupport.GetRequestContext()["vcSessionCookie"] = \
-        stub_adapter.cookie.split('"')[1]
-    hostname = stub_adapter.host.split(":")[0]
-    pbm_stub = SoapStubAdapter(
-        host=hostname,
-        version="pbm.version.version1",
-        path="/pbm/sdk",
-        poolSize=0,
-        sslContext=ssl_context)
-    pbm_si = pbm.ServiceInstance("ServiceInstance", pbm_stub)
-    pbm_content = pbm_si.RetrieveContent()
-    return pbm_content
-
-
-def get_storage_profiles(profile_manager, ref):
+def get_storage_profiles(profile_manager, ref, catalogue=None):
     """Get vmware storage policy profiles associated with specified entities
 
     :param profileManager: A VMware Storage Policy Service manager object
@@ -77,6 +48,9 @@ def get_storage_profiles(profile_manager, ref):
     :param ref: A server reference to a virtual machine, virtual disk,
         or datastore
     :type ref: pbm.ServerObjectRef
+    :param catalogue: A profile catalogue used instead of retrieving the
+        profiles on every call (default is None)
+    :type catalogue: pbmhelper.ProfileCatalogue
     :returns: A list of VMware Storage Policy profiles associated with
         the specified entities
     :rtype: pbm.profile.Profile[]
@@ -85,6 +59,8 @@ def get_storage_profiles(profile_manager, ref):
     profiles = []
     profile_ids = profile_manager.PbmQueryAssociatedProfile(ref)
     if len(profile_ids) > 0:
+        if catalogue is not None:
+            return catalogue.get(profile_ids)
         profiles = profile_manager.PbmRetrieveContent(profileIds=profile_ids)
         return profiles
     return profiles
@@ -129,35 +105,114 @@ def show_storage_profile(profiles):
                 show_storage_profile_capabilities(capabilities)
 
 
-def search_vm_by_name(si, name, strict=False):
+def search_vm_by_name(si, name, strict=False, match_mode=None):
     """Search virtual machine by name
 
+    The names of all virtual machines are collected in one property
+    collector call and matched against a sorted index.
+
     :param si: A ServiceInstance managed object
     :type name: si
-    :param name: A virtual machine name
+    :param name: A virtual machine name or pattern
     :type name: str
     :param strict: A flag used to set strict search method
         (default is False)
     :type strict: bool
-    :returns: A virtual machine object
-    :rtype: VirtualMachine
+    :param match_mode: 'exact', 'glob' or 'regex', overrides strict
+        (default is None)
+    :type match_mode: str
+    :returns: A list of virtual machine objects
+    :rtype: VirtualMachine[]
     """
 
-    content = si.content
-    root_folder = content.rootFolder
-    obj_view = content.viewManager.CreateContainerView(root_folder, [vim.VirtualMachine], True)
-    vm_list = obj_view.view
-    obj_view.Destroy()
-    obj = []
-    for vm in vm_list:
-        if strict:
-            if (vm.name == name):
-                obj.append(vm)
-                return obj
-        else:
-            if re.match(".*{}.*".format(name), vm.name):
-                obj.append(vm)
-    return obj
+    if match_mode is None:
+        match_mode = 'exact' if strict else 'regex'
+    index = name_index.NameIndex.from_inventory(si, vim.VirtualMachine)
+    return [record['obj'] for record in index.search(name, match_mode)]
+
+
+def collect_vm_disks(si, name, strict=False, match_mode=None):
+    """Collect the names and virtual disks of the matching virtual machines
+    in one property collector call
+
+    :param si: A ServiceInstance managed object
+    :type name: si
+    :param name: A virtual machine name or pattern
+    :type name: str
+    :param strict: A flag used to set strict search method
+        (default is False)
+    :type strict: bool
+    :param match_mode: 'exact', 'glob' or 'regex', overrides strict
+        (default is None)
+    :type match_mode: str
+    :returns: A list of (vm moid, vm name, [(disk key, disk label)])
+    :rtype: list
+    """
+
+    if match_mode is None:
+        match_mode = 'exact' if strict else 'regex'
+    index = name_index.NameIndex.from_inventory(si, vim.VirtualMachine,
+                                                ['config.hardware.device'])
+    vms = []
+    for record in index.search(name, match_mode):
+        disks = [(device.key, device.deviceInfo.label)
+                 for device in record.get('config.hardware.device', [])
+                 if isinstance(device, vim.vm.device.VirtualDisk)]
+        vms.append((record['obj']._moId, record['name'], disks))
+    return vms
+
+
+def bulk_storage_profile_report(pbm_content, vms, batch_size=200):
+    """Generate the storage policy and compliance status of the VM Home and
+    every virtual disk of many virtual machines
+
+    PbmQueryAssociatedProfiles and PbmFetchComplianceResult are called once
+    per batch of virtual machines and each distinct profile is retrieved only
+    once, through the profile catalogue of the PBM session.
+
+    :param pbm_content: A VMware Storage Policy Service content object
+    :type pbm_content: ServiceContent
+    :param vms: A list of (vm moid, vm name, [(disk key, disk label)])
+    :type vms: list
+    :param batch_size: The number of virtual machines per PBM call
+    :type batch_size: int
+    :returns: A generator of (vm name, entity label, profile names,
+        compliance status)
+    :rtype: generator
+    """
+
+    pm = pbm_content.profileManager
+    cm = pbm_content.complianceManager
+    vm_type = pbm.ServerObjectRef.ObjectType("virtualMachine")
+    disk_type = pbm.ServerObjectRef.ObjectType("virtualDiskId")
+    catalogue = pbmhelper.get_profile_catalogue(pm)
+
+    for start in range(0, len(vms), batch_size):
+        rows = []
+        for vm_moid, vm_name, disks in vms[start:start + batch_size]:
+            rows.append((vm_name, "VM Home",
+                         pbm.ServerObjectRef(key=vm_moid, objectType=vm_type)))
+            for disk_key, label in disks:
+                rows.append((vm_name, label,
+                             pbm.ServerObjectRef(key="{}:{}".format(vm_moid, disk_key),
+                                                 objectType=disk_type)))
+        refs = [ref for _, _, ref in rows]
+
+        associated = {}
+        for result in pm.PbmQueryAssociatedProfiles(entities=refs):
+            associated[result.object.key] = [profile_id.uniqueId
+                                             for profile_id in result.profileId]
+        # retrieves the profiles not seen in previous batches in one call
+        catalogue.get({unique_id for profile_ids in associated.values()
+                       for unique_id in profile_ids})
+
+        compliance = {}
+        for result in cm.PbmFetchComplianceResult(entities=refs):
+            compliance[result.entity.key] = result.complianceStatus
+
+        for vm_name, label, ref in rows:
+            names = [profile.name for profile in catalogue.get(associated.get(ref.key, []))]
+            yield vm_name, label, names, compliance.get(ref.key, "unknown")
 
 
 def main():
@@ -168,20 +223,37 @@ def main():
     parser.add_required_arguments(cli.Argument.VM_NAME)
     parser.add_custom_argument('--strict', required=False, action='store_true',
                                help='Search strict virtual machine name matches')
+    parser.add_custom_argument('--match-mode', required=False,
+                               choices=name_index.MATCH_MODES,
+                               help='How --vm-name is matched, overrides --strict '
+                                    '(default is regex)')
+    parser.add_custom_argument('--bulk', required=False, action='store_true',
+                               help='Print a batched policy and compliance report, one '
+                                    'line per VM Home and virtual disk')
+    parser.add_custom_argument('--batch-size', required=False, type=int, default=200,
+                               help='Number of virtual machines per PBM call in --bulk mode')
     args = parser.get_args()
     si = service_instance.connect(args)
 
-    pbm_content = pbm_connect(si._stub, args.disable_ssl_verification)
+    pbm_content = pbmhelper.get_pbm_content(si._stub)
     pm = pbm_content.profileManager
+    catalogue = pbmhelper.get_profile_catalogue(pm)
+
+    if args.bulk:
+        vms = collect_vm_disks(si, args.vm_name, args.strict, args.match_mode)
+        for vm_name, label, names, status in bulk_storage_profile_report(
+                pbm_content, vms, args.batch_size):
+            print("{}\t{}\t{}\t{}".format(vm_name, label, ",".join(names), status))
+        return
 
-    vm_list = search_vm_by_name(si, args.vm_name, args.strict)
+    vm_list = search_vm_by_name(si, args.vm_name, args.strict, args.match_mode)
     for vm in vm_list:
         print("Virtual machine name: {}{}{}".format(BColors.OKGREEN,
                                                     vm.name,
                                                     BColors.ENDC))
         pm_object_type = pbm.ServerObjectRef.ObjectType("virtualMachine")
         pm_ref = pbm.ServerObjectRef(key=vm._moId, objectType=pm_object_type)
-        profiles = get_storage_profiles(pm, pm_ref)
+        profiles = get_storage_profiles(pm, pm_ref, catalogue)
         if len(profiles) > 0:
             print("Home Storage Profile:")
             show_storage_profile(profiles)
@@ -193,7 +265,7 @@ def main():
                 pm_object_type = pbm.ServerObjectRef.ObjectType("virtualDiskId")
                 pm_ref = pbm.ServerObjectRef(
                     key="{}:{}".format(vm._moId, device.key), objectType=pm_object_type)
-                profiles = get_storage_profiles(pm, pm_ref)
+                profiles = get_storage_profiles(pm, pm_ref, catalogue)
                 if len(profiles) > 0:
                     print(device.deviceInfo.label)
                     show_storage_profile(profiles)
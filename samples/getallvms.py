@@ -16,43 +16,16 @@
 
 """
 Python program for listing the VMs on an ESX / vCenter host
+
+The VM summaries are retrieved in pages with the property collector and
+written with the format given by --output as they arrive. The default
+table format prints one line per VM instead of the earlier block of
+"Name : ..." lines per VM.
 """
 
 import re
 from pyVmomi import vmodl, vim
-from tools import cli, service_instance
-
-
-def print_vm_info(virtual_machine):
-    """
-    Print information for a particular virtual machine or recurse into a
-    folder with depth protection
-    """
-    summary = virtual_machine.summary
-    print("Name       : ", summary.config.name)
-    print("Template   : ", summary.config.template)
-    print("Path       : ", summary.config.vmPathName)
-    print("Guest      : ", summary.config.guestFullName)
-    print("Instance UUID : ", summary.config.instanceUuid)
-    print("Bios UUID     : ", summary.config.uuid)
-    annotation = summary.config.annotation
-    if annotation:
-        print("Annotation : ", annotation)
-    print("State      : ", summary.runtime.powerState)
-    if summary.guest is not None:
-        ip_address = summary.guest.ipAddress
-        tools_version = summary.guest.toolsStatus
-        if tools_version is not None:
-            print("VMware-tools: ", tools_version)
-        else:
-            print("Vmware-tools: None")
-        if ip_address:
-            print("IP         : ", ip_address)
-        else:
-            print("IP         : None")
-    if summary.runtime.question is not None:
-        print("Question  : ", summary.runtime.question.text)
-    print("")
+from tools import cli, output, pchelper, service_instance, vm
 
 
 def main():
@@ -61,29 +34,28 @@ def main():
     """
 
     parser = cli.Parser()
+    parser.add_optional_arguments(cli.Argument.OUTPUT)
     parser.add_custom_argument('-f', '--find', required=False,
                                action='store', help='String to match VM names')
     args = parser.get_args()
     si = service_instance.connect(args)
 
     try:
-        content = si.RetrieveContent()
-
-        container = content.rootFolder  # starting point to look into
-        view_type = [vim.VirtualMachine]  # object types to look for
-        recursive = True  # whether we should look into it recursively
-        container_view = content.viewManager.CreateContainerView(
-            container, view_type, recursive)
-
-        children = container_view.view
-        if args.find is not None:
-            pat = re.compile(args.find, re.IGNORECASE)
-        for child in children:
-            if args.find is None:
-                print_vm_info(child)
-            else:
-                if pat.search(child.summary.config.name) is not None:
-                    print_vm_info(child)
+        pat = re.compile(args.find, re.IGNORECASE) if args.find is not None else None
+        container_view = pchelper.get_container_view(si, obj_type=[vim.VirtualMachine])
+        try:
+            with output.open_writer(args.output, vm.VM_COLUMNS) as writer:
+                for page in pchelper.iter_properties(si, view_ref=container_view,
+                                                     obj_type=vim.VirtualMachine,
+                                                     path_set=['summary']):
+                    for properties in page:
+                        summary = properties['summary']
+                        if pat is None or pat.search(summary.config.name) is not None:
+                            writer.write(vm.vm_record(summary))
+                    if writer.closed:
+                        break
+        finally:
+            container_view.Destroy()
 
     except vmodl.MethodFault as error:
         print("Caught vmodl fault : " + error.msg)
@@ -2,7 +2,6 @@
 #
 # cpaggen - May 16 2015 - Proof of Concept (little to no error checks)
 #  - rudimentary args parser
-#  - get_hosts_portgroups() is quite slow; there is probably a better way
 #
 # Licensed under the Apache License, Version 2.0 (the "License");
 # you may not use this file except in compliance with the License.
@@ -17,102 +16,44 @@
 # limitations under the License.
 
 from pyVmomi import vim
-from tools import cli, service_instance
+from tools import cli, service_instance, pchelper
+from tools.network_index import NetworkIndex
 import sys
 
 
-def get_vm_hosts(content):
-    print("Getting all ESX hosts ...")
-    host_view = content.viewManager.CreateContainerView(content.rootFolder,
-                                                        [vim.HostSystem],
-                                                        True)
-    hosts = list(host_view.view)
-    host_view.Destroy()
-    return hosts
-
-
-def get_vms(content):
+def get_vms(si):
     print("Getting all VMs ...")
-    vm_view = content.viewManager.CreateContainerView(content.rootFolder,
-                                                      [vim.VirtualMachine],
-                                                      True)
-    obj = [vm for vm in vm_view.view]
+    vm_view = pchelper.get_container_view(si, obj_type=[vim.VirtualMachine])
+    vms = pchelper.collect_properties(si, view_ref=vm_view, obj_type=vim.VirtualMachine,
+                                      path_set=['name', 'runtime.powerState',
+                                                'runtime.host', 'config.hardware.device'])
     vm_view.Destroy()
-    return obj
-
-
-def get_hosts_portgroups(hosts):
-    print("Collecting portgroups on all hosts. This may take a while ...")
-    host_pg_dict = {}
-    for host in hosts:
-        pgs = host.config.network.portgroup
-        host_pg_dict[host] = pgs
-        print("\tHost {} done.".format(host.name))
-    print("\tPortgroup collection complete.")
-    return host_pg_dict
+    return vms
 
 
-def print_vminfo(vm):
-    vm_power_state = vm.runtime.powerState
-    print("Found VM:", vm.name + "(" + vm_power_state + ")")
-    get_vm_nics(vm)
+def print_vminfo(vm, network_index):
+    print("Found VM:", vm['name'] + "(" + vm['runtime.powerState'] + ")")
+    get_vm_nics(vm, network_index)
 
 
-def get_vm_nics(vm):
-    for dev in vm.config.hardware.device:
+def get_vm_nics(vm, network_index):
+    for dev in vm.get('config.hardware.device', []):
         if isinstance(dev, vim.vm.device.VirtualEthernetCard):
-            dev_backing = dev.backing
-            port_group = None
-            vlan_id = None
-            v_switch = None
-            if hasattr(dev_backing, 'port'):
-                port_group_key = dev.backing.port.portgroupKey
-                dvs_uuid = dev.backing.port.switchUuid
-                try:
-                    dvs = content.dvSwitchManager.QueryDvsByUuid(dvs_uuid)
-                except Exception:
-                    port_group = "** Error: DVS not found **"
-                    vlan_id = "NA"
-                    v_switch = "NA"
-                else:
-                    pg_obj = dvs.LookupDvPortGroup(port_group_key)
-                    port_group = pg_obj.config.name
-                    vlan_id = str(pg_obj.config.defaultPortConfig.vlan.vlanId)
-                    v_switch = str(dvs.name)
-            else:
-                port_group = dev.backing.network.name
-                vm_host = vm.runtime.host
-                # global variable hosts is a list, not a dict
-                host_pos = hosts.index(vm_host)
-                view_host = hosts[host_pos]
-                # global variable host_pg_dict stores portgroups per host
-                pgs = host_pg_dict[view_host]
-                for p in pgs:
-                    if port_group in p.key:
-                        vlan_id = str(p.spec.vlanId)
-                        v_switch = str(p.spec.vswitchName)
-            if port_group is None:
-                port_group = 'NA'
-            if vlan_id is None:
-                vlan_id = 'NA'
-            if v_switch is None:
-                v_switch = 'NA'
+            v_switch, port_group, vlan_id = network_index.resolve(dev, vm.get('runtime.host'))
             print('\t' + dev.deviceInfo.label + '->' + dev.macAddress +
                   ' @ ' + v_switch + '->' + port_group +
                   ' (VLAN ' + vlan_id + ')')
 
 
 def main():
-    global content, hosts, host_pg_dict
     parser = cli.Parser()
     args = parser.get_args()
     si = service_instance.connect(args)
-    content = si.RetrieveContent()
-    hosts = get_vm_hosts(content)
-    host_pg_dict = get_hosts_portgroups(hosts)
-    vms = get_vms(content)
+    print("Collecting switches and portgroups ...")
+    network_index = NetworkIndex.from_inventory(si)
+    vms = get_vms(si)
     for vm in vms:
-        print_vminfo(vm)
+        print_vminfo(vm, network_index)
 
 
 # Main section
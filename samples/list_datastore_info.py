@@ -5,11 +5,24 @@
 """
 vSphere Python SDK program for listing all ESXi datastores and their
 associated devices
+
+The mount info of all ESXi hosts is retrieved with one property collector
+call. One record is written per ESXi host and VMFS datastore, or with
+--by-datastore one record per datastore, deduplicated by volume UUID, with
+the extents and the list of hosts mounting it. The format is given by
+--output; --json is a deprecated alias of --output jsonl.
 """
 
-import json
+import sys
 from pyVmomi import vmodl, vim
-from tools import cli, service_instance
+from tools import cli, output, pchelper, service_instance
+
+COLUMNS = ['host', 'datastore', 'uuid', 'capacity', 'vmfs_version', 'local', 'ssd',
+           'extents']
+DATASTORE_COLUMNS = ['datastore', 'uuid', 'capacity', 'vmfs_version', 'local', 'ssd',
+                     'extents', 'hosts']
+WIDTHS = {'host': 30, 'datastore': 30, 'uuid': 36, 'capacity': 10, 'vmfs_version': 12,
+          'local': 6, 'ssd': 6}
 
 
 # http://stackoverflow.com/questions/1094841/
@@ -27,20 +40,68 @@ def sizeof_fmt(num):
     return "%3.1f%s" % (num, 'TB')
 
 
-def print_fs(host_fs):
+def fs_record(host_name, host_fs, human_readable=False):
     """
-    Prints the host file system volume info
+    Convert the host file system volume info to a record
 
-    :param host_fs:
-    :return:
+    :param host_name: name of the ESXi host
+    :param host_fs: HostFileSystemMountInfo of a VMFS volume
+    :param human_readable: whether to format the capacity with sizeof_fmt
+    :return: dict with the keys of COLUMNS
+    """
+    volume = host_fs.volume
+    return {
+        'host': host_name,
+        'datastore': volume.name,
+        'uuid': volume.uuid,
+        'capacity': sizeof_fmt(volume.capacity) if human_readable else volume.capacity,
+        'vmfs_version': volume.version,
+        'local': volume.local,
+        'ssd': volume.ssd,
+        'extents': [extent.diskName for extent in volume.extent],
+    }
+
+
+def collect_mount_info(si):
+    """
+    Retrieve the names and file system mount info of all ESXi hosts with one
+    property collector call
+
+    :param si: service instance
+    :return: list of (host name, [HostFileSystemMountInfo])
+    """
+    view = pchelper.get_container_view(si, obj_type=[vim.HostSystem])
+    try:
+        hosts = pchelper.collect_properties(
+            si, view_ref=view, obj_type=vim.HostSystem,
+            path_set=['name', 'config.fileSystemVolume.mountInfo'])
+    finally:
+        view.Destroy()
+    return [(host['name'], host.get('config.fileSystemVolume.mountInfo') or [])
+            for host in sorted(hosts, key=lambda host: host['name'])]
+
+
+def datastore_records(mount_info, human_readable=False):
+    """
+    Deduplicate the VMFS volumes mounted on several hosts by UUID
+
+    :param mount_info: list of (host name, [HostFileSystemMountInfo])
+    :param human_readable: whether to format the capacity with sizeof_fmt
+    :return: list of dicts with the keys of DATASTORE_COLUMNS
     """
-    print("{}\t{}\t".format("Datastore:     ", host_fs.volume.name))
-    print("{}\t{}\t".format("UUID:          ", host_fs.volume.uuid))
-    print("{}\t{}\t".format("Capacity:      ", sizeof_fmt(
-        host_fs.volume.capacity)))
-    print("{}\t{}\t".format("VMFS Version:  ", host_fs.volume.version))
-    print("{}\t{}\t".format("Is Local VMFS: ", host_fs.volume.local))
-    print("{}\t{}\t".format("SSD:           ", host_fs.volume.ssd))
+    datastores = {}
+    for host_name, host_mounts in mount_info:
+        for host_mount_info in host_mounts:
+            if host_mount_info.volume.type != "VMFS":
+                continue
+            uuid = host_mount_info.volume.uuid
+            if uuid not in datastores:
+                record = fs_record(host_name, host_mount_info, human_readable)
+                del record['host']
+                record['hosts'] = []
+                datastores[uuid] = record
+            datastores[uuid]['hosts'].append(host_name)
+    return sorted(datastores.values(), key=lambda record: record['datastore'])
 
 
 def main():
@@ -50,73 +111,36 @@ def main():
    """
 
     parser = cli.Parser()
-    parser.add_custom_argument('--json', default=False, action='store_true', help='Output to JSON')
+    parser.add_optional_arguments(cli.Argument.OUTPUT)
+    parser.add_custom_argument('--by-datastore', required=False, action='store_true',
+                               help='One record per datastore with the hosts mounting it')
+    parser.add_custom_argument('--json', required=False, action='store_true',
+                               help='Deprecated, same as --output jsonl')
     args = parser.get_args()
+    if args.json:
+        print("--json is deprecated, use --output jsonl", file=sys.stderr)
+        args.output = 'jsonl'
     si = service_instance.connect(args)
 
     try:
 
-        content = si.RetrieveContent()
-        # Search for all ESXi hosts
-        objview = content.viewManager.CreateContainerView(content.rootFolder,
-                                                          [vim.HostSystem],
-                                                          True)
-        esxi_hosts = objview.view
-        objview.Destroy()
-
-        datastores = {}
-        for esxi_host in esxi_hosts:
-            if not args.json:
-                print("{}\t{}\t\n".format("ESXi Host:    ", esxi_host.name))
-
-            # All Filesystems on ESXi host
-            storage_system = esxi_host.configManager.storageSystem
-            host_file_sys_vol_mount_info = \
-                storage_system.fileSystemVolumeInfo.mountInfo
-
-            datastore_dict = {}
-            # Map all filesystems
-            for host_mount_info in host_file_sys_vol_mount_info:
-                # Extract only VMFS volumes
-                if host_mount_info.volume.type == "VMFS":
-
-                    extents = host_mount_info.volume.extent
-                    if not args.json:
-                        print_fs(host_mount_info)
-                    else:
-                        datastore_details = {
-                            'uuid': host_mount_info.volume.uuid,
-                            'capacity': host_mount_info.volume.capacity,
-                            'vmfs_version': host_mount_info.volume.version,
-                            'local': host_mount_info.volume.local,
-                            'ssd': host_mount_info.volume.ssd
-                        }
-
-                    extent_arr = []
-                    extent_count = 0
-                    for extent in extents:
-                        if not args.json:
-                            print("{}\t{}\t".format(
-                                "Extent[" + str(extent_count) + "]:",
-                                extent.diskName))
-                            extent_count += 1
-                        else:
-                            # create an array of the devices backing the given
-                            # datastore
-                            extent_arr.append(extent.diskName)
-                            # add the extent array to the datastore info
-                            datastore_details['extents'] = extent_arr
-                            # associate datastore details with datastore name
-                            datastore_dict[host_mount_info.volume.name] = \
-                                datastore_details
-                    if not args.json:
-                        print
-
-            # associate ESXi host with the datastore it sees
-            datastores[esxi_host.name] = datastore_dict
-
-        if args.json:
-            print(json.dumps(datastores))
+        mount_info = collect_mount_info(si)
+        human_readable = args.output == 'table'
+
+        if args.by_datastore:
+            with output.open_writer(args.output, DATASTORE_COLUMNS, widths=WIDTHS) as writer:
+                for record in datastore_records(mount_info, human_readable):
+                    writer.write(record)
+            return 0
+
+        with output.open_writer(args.output, COLUMNS, widths=WIDTHS) as writer:
+            for host_name, host_mounts in mount_info:
+                for host_mount_info in host_mounts:
+                    # Extract only VMFS volumes
+                    if host_mount_info.volume.type == "VMFS":
+                        writer.write(fs_record(host_name, host_mount_info, human_readable))
+                if writer.closed:
+                    break
 
     except vmodl.MethodFault as error:
         print("Caught vmodl fault : " + error.msg)
@@ -12,52 +12,63 @@
 #
 
 import requests
-from tools import cli, pchelper, service_instance
+from tools import cli, output, pchelper, service_instance
 from pyVmomi import vim
 
-_columns_four = "{0!s:<20} {1!s:<30} {2!s:<30} {3!s:<20}"
-
 # disable  urllib3 warnings
 requests.packages.urllib3.disable_warnings(
     requests.packages.urllib3.exceptions.InsecureRequestWarning)
 
+PROPERTIES = ['name', 'guest.toolsRunningStatus', 'guest.toolsVersion',
+              'guest.toolsVersionStatus2']
+COLUMNS = ['Name', 'Status', 'Version', 'Version Status']
+WIDTHS = {'Name': 20, 'Status': 30, 'Version': 30}
+
 
-def get_vms(content):
-    obj_view = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.VirtualMachine], True)
-    vms_list = obj_view.view
-    obj_view.Destroy()
-    return vms_list
+def tools_status_record(properties):
+    return dict(zip(COLUMNS, [properties.get(path) for path in PROPERTIES]))
 
 
-def print_vmwareware_tools_status(vm):
-    print(_columns_four.format(vm.name,
-                               vm.guest.toolsRunningStatus,
-                               str(vm.guest.toolsVersion),
-                               vm.guest.toolsVersionStatus2))
+def iter_vms(si, container=None):
+    """
+    Yield the tools properties of the VMs below container page by page
+    """
+    obj_view = pchelper.get_container_view(si, [vim.VirtualMachine], container)
+    try:
+        for page in pchelper.iter_properties(si, view_ref=obj_view,
+                                             obj_type=vim.VirtualMachine,
+                                             path_set=PROPERTIES):
+            yield page
+    finally:
+        obj_view.Destroy()
 
 
 def main():
     parser = cli.Parser()
-    parser.add_optional_arguments(cli.Argument.VM_NAME)
+    parser.add_optional_arguments(cli.Argument.VM_NAME, cli.Argument.OUTPUT)
     args = parser.get_args()
     si = service_instance.connect(args)
 
     content = si.RetrieveContent()
 
     if args.vm_name:
-        print('Searching for VM {}'.format(args.vm_name))
         vm_obj = pchelper.get_obj(content, [vim.VirtualMachine], args.vm_name)
-        if vm_obj:
-            print(_columns_four.format('Name', 'Status',
-                                       'Version', 'Version Status'))
-            print_vmwareware_tools_status(vm_obj)
-        else:
+        if not vm_obj:
             print("VM not found")
+            return
+        pages = [[{'name': vm_obj.name,
+                   'guest.toolsRunningStatus': vm_obj.guest.toolsRunningStatus,
+                   'guest.toolsVersion': vm_obj.guest.toolsVersion,
+                   'guest.toolsVersionStatus2': vm_obj.guest.toolsVersionStatus2}]]
     else:
-        print(_columns_four.format('Name', 'Status', 'Version', 'Version Status'))
-        for vm_obj in get_vms(content):
-            print_vmwareware_tools_status(vm_obj)
+        pages = iter_vms(si)
+
+    with output.open_writer(args.output, COLUMNS, widths=WIDTHS) as writer:
+        for page in pages:
+            for properties in page:
+                writer.write(tools_status_record(properties))
+            if writer.closed:
+                break
 
 
 # start
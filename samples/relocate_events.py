@@ -7,13 +7,16 @@ This code is released under the terms of the Apache 2
 http://www.apache.org/licenses/LICENSE-2.0.html
 
 Simple example for getting the vMotion/relocate events of a VM.
-There are additional filters for time that I didn't include as I
-didn't want to add time parsing complications.
+The events are read in pages through an EventHistoryCollector, so the
+history is not truncated at 1000 events. --begin-time and --end-time take
+ISO 8601 timestamps, e.g. 2021-03-01T00:00:00+00:00, and --tail keeps
+printing new events once the history has been read.
 
 """
+import datetime
 import re
 from pyVmomi import vim
-from tools import cli, service_instance
+from tools import cli, service_instance, events
 
 __author__ = 'prziborowski'
 
@@ -34,6 +37,14 @@ def main():
     parser.add_custom_argument('--filterUsers', help="Comma-separated list of users to filter on")
     parser.add_custom_argument('--filterSystemUser', action='store_true',
                                help="Filter system user, defaults to false.")
+    parser.add_custom_argument('--begin-time', type=datetime.datetime.fromisoformat,
+                               help="Only events logged at or after this ISO 8601 time")
+    parser.add_custom_argument('--end-time', type=datetime.datetime.fromisoformat,
+                               help="Only events logged at or before this ISO 8601 time")
+    parser.add_custom_argument('--page-size', type=int, default=100,
+                               help="Number of events read per round trip, at most 1000")
+    parser.add_custom_argument('--tail', action='store_true',
+                               help="Keep reading new events after the history")
     args = parser.get_args()
     si = service_instance.connect(args)
 
@@ -48,7 +59,9 @@ def main():
                         (datacenter.name, args.vm_name))
     by_entity = vim.event.EventFilterSpec.ByEntity(entity=vm, recursion="self")
     ids = ['VmRelocatedEvent', 'DrsVmMigratedEvent', 'VmMigratedEvent']
-    filter_spec = vim.event.EventFilterSpec(entity=by_entity, eventTypeId=ids)
+    filter_spec = vim.event.EventFilterSpec(entity=by_entity, eventTypeId=ids,
+                                            time=events.time_filter(args.begin_time,
+                                                                    args.end_time))
 
     # Optionally filter by users
     user_list = []
@@ -58,10 +71,11 @@ def main():
         by_user = vim.event.EventFilterSpec.ByUsername(userList=user_list)
         by_user.systemUser = args.filterSystemUser
         filter_spec.userName = by_user
-    event_manager = si.content.eventManager
-    events = event_manager.QueryEvent(filter_spec)
 
-    for event in events:
+    count = 0
+    for event in events.read_events(si, filter_spec, page_size=args.page_size,
+                                    tail=args.tail):
+        count += 1
         print("%s" % event._wsdlName)
         print("VM: %s" % event.vm.name)
         print("User: %s" % event.userName)
@@ -70,7 +84,7 @@ def main():
                                         event.datacenter.name))
         print("Datastore: %s -> %s" % (event.sourceDatastore.name,
                                        event.ds.name))
-    print("%s" % events)
+    print("%d events" % count)
 
 
 if __name__ == '__main__':
@@ -1,38 +1,82 @@
 #!/usr/bin/env python
 
-from tools import cli, service_instance
+from tools import cli, service_instance, esxtop, host_service
 
 """
 Example of connecting to the ESXTOP service provided
 by vCenter Server's Service Manager
+
+With --cluster-name the esxtop counters of all hosts of the cluster are
+sampled concurrently. Every sample prints the instances of the counter
+given with --counter as tab separated rows, or the number of instances of
+every counter.
 """
 
 __author__ = 'William Lam'
 
 
+def print_sample(timestamp, snapshots, counter):
+    fields = next((frames[counter].fields for frames in snapshots.values()
+                   if not isinstance(frames, Exception) and counter in frames), None)
+    if fields:
+        print("time\thost\t" + '\t'.join(name for name, _ in fields))
+    for host_name in sorted(snapshots):
+        frames = snapshots[host_name]
+        if isinstance(frames, Exception):
+            print("%s\t%s\tError: %s" % (timestamp, host_name, frames))
+        elif counter is None:
+            print("%s\t%s\t%s" % (timestamp, host_name, ' '.join(
+                '%s=%d' % (name, len(frame)) for name, frame in sorted(frames.items()))))
+        elif counter in frames:
+            frame = frames[counter]
+            for row in range(len(frame)):
+                print("%s\t%s\t%s" % (timestamp, host_name, '\t'.join(
+                    str(frame[name][row]) for name, _ in frame.fields)))
+
+
 # Start program
 def main():
     parser = cli.Parser()
-    parser.add_optional_arguments(cli.Argument.ESX_IP)
+    parser.add_optional_arguments(cli.Argument.ESX_IP, cli.Argument.CLUSTER_NAME)
+    parser.add_custom_argument('--counter', required=False, action='store',
+                               help='Esxtop counter to print, e.g. PCPU. '
+                                    'Prints the instance count of all counters if not given')
+    parser.add_custom_argument('--samples', required=False, action='store', type=int, default=1,
+                               help='Number of snapshots to take')
+    parser.add_custom_argument('--interval', required=False, action='store', type=int, default=5,
+                               help='Seconds between snapshots')
+    parser.add_custom_argument('--workers', required=False, action='store', type=int, default=8,
+                               help='Number of hosts sampled concurrently')
     args = parser.get_args()
     si = service_instance.connect(args)
 
-    # "vmware.host." prefix is required when connecting to VC
-    location = "vmware.host." + args.esx_ip
+    if args.cluster_name:
+        host_names = host_service.cluster_host_names(si, args.cluster_name)
+    else:
+        host_names = [args.esx_ip]
 
-    services = si.content.serviceManager.QueryServiceList(
-        location=[location])
+    errors = {}
+    collectors = esxtop.collect_schemas(si, host_names, args.workers, errors)
+    for host_name, error in sorted(errors.items()):
+        if isinstance(error, LookupError):
+            print("Unable to retrieve the Esxtop service of ESXi host %s. Please ensure "
+                  "--esx-ip is the FQDN or IP Address of the managed ESXi host in your "
+                  "vCenter Server" % host_name)
+        else:
+            print("Unable to retrieve the Esxtop schema of ESXi host %s: %s" % (host_name, error))
+    if not collectors:
+        return
 
-    if services:
-        for service in services:
-            if service.serviceName == "Esxtop":
-                results = service.service.ExecuteSimpleCommand(
-                    arguments=["CounterInfo"])
-                print(results)
-    else:
-        print("Unable to retrieve the service list from \
-ESXi host. Pleaes ensure --esx_ip property is the FQDN or IP \
-Address of the managed ESXi host in your vCenter Server")
+    try:
+        for timestamp, snapshots in esxtop.sample_hosts(collectors, args.samples,
+                                                        args.interval, args.workers):
+            print_sample(int(timestamp), snapshots, args.counter)
+    finally:
+        for host_name, collector in collectors.items():
+            try:
+                collector.close()
+            except Exception as ex:
+                print("Unable to free the Esxtop stats of ESXi host %s: %s" % (host_name, ex))
 
 
 # Start program
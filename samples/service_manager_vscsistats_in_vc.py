@@ -1,38 +1,84 @@
 #!/usr/bin/env python
 
-from tools import cli, service_instance
+import time
+
+from tools import cli, service_instance, host_service, vscsistats
 
 """
 Example of fonnecting to the vScsiStats service provided
 by vCenter Server's Service Manager
+
+The collection is started on the host given with --esx-ip or on all hosts of
+--cluster-name, the histograms are fetched at the start and at the end of
+--duration seconds, and the collection is stopped again. For every virtual
+disk the IO count and the percentiles of the IOs issued in between are
+printed for the latency, IO length and seek distance histograms.
 """
 
 __author__ = 'William Lam'
 
+HISTOGRAMS = ('Latency', 'IO lengths', 'Distance')
+
+
+def print_percentiles(before, after, percentiles):
+    print("host\tworldGroup\tdisk\thistogram\tcount\t" +
+          '\t'.join('p%g' % p for p in percentiles))
+    for host_name in sorted(after):
+        histograms = after[host_name]
+        if isinstance(histograms, Exception):
+            print("%s\tError: %s" % (host_name, histograms))
+            continue
+        for key in sorted(histograms, key=str):
+            histogram = histograms[key]
+            if histogram.disk is None or not histogram.name.startswith(HISTOGRAMS):
+                continue
+            earlier = before.get(host_name)
+            if isinstance(earlier, dict) and key in earlier:
+                histogram = histogram.diff(earlier[key])
+            print("%s\t%s\t%s\t%s\t%s\t%s" % (
+                host_name, histogram.world_group, histogram.device or histogram.disk,
+                histogram.name, histogram.total,
+                '\t'.join(str(histogram.percentile(p)) for p in percentiles)))
+
 
 # Start program
 def main():
     parser = cli.Parser()
-    parser.add_optional_arguments(cli.Argument.ESX_IP)
+    parser.add_optional_arguments(cli.Argument.ESX_IP, cli.Argument.CLUSTER_NAME)
+    parser.add_custom_argument('--duration', required=False, action='store', type=int,
+                               default=30, help='Seconds to collect histograms for')
+    parser.add_custom_argument('--percentiles', required=False, action='store',
+                               default='50,90,99',
+                               help='Comma separated percentiles to print')
+    parser.add_custom_argument('--workers', required=False, action='store', type=int, default=8,
+                               help='Number of hosts queried concurrently')
     args = parser.get_args()
     si = service_instance.connect(args)
 
-    # "vmware.host." prefix is required when using VC
-    location = "vmware.host." + args.esx_ip
+    if args.cluster_name:
+        host_names = host_service.cluster_host_names(si, args.cluster_name)
+    else:
+        host_names = [args.esx_ip]
+    percentiles = [float(p) for p in args.percentiles.split(',')]
 
-    services = si.content.serviceManager.QueryServiceList(
-        location=[location])
+    services = vscsistats.get_services(si, host_names, args.workers)
+    started = vscsistats.run_on_hosts(services, 'StartVscsiStats', args.workers)
+    for host_name, result in started.items():
+        if isinstance(result, Exception):
+            print("Unable to start vscsiStats on ESXi host %s: %s. Please ensure --esx-ip "
+                  "is the FQDN or IP Address of the managed ESXi host in your "
+                  "vCenter Server" % (host_name, result))
+    services = {h: services[h] for h in host_names if not isinstance(started[h], Exception)}
+    if not services:
+        return
 
-    if services:
-        for service in services:
-            if service.serviceName == "VscsiStats":
-                results = service.service.ExecuteSimpleCommand(
-                    arguments=["FetchAllHistograms"])
-                print(results)
-    else:
-        print("Unable to retrieve the service list from \
-ESXi host. Pleaes ensure --esx_ip property is the FQDN or IP \
-Address of the managed ESXi host in your vCenter Server")
+    try:
+        before = vscsistats.fetch_hosts(services, args.workers)
+        time.sleep(args.duration)
+        after = vscsistats.fetch_hosts(services, args.workers)
+        print_percentiles(before, after, percentiles)
+    finally:
+        vscsistats.run_on_hosts(services, 'StopVscsiStats', args.workers)
 
 
 # Start program
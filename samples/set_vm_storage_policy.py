@@ -13,11 +13,17 @@ and Virtual Disk Storage Policies
 
 Thanks to William Lam (https://github.com/lamw) for ideas from
 the script list_vm_storage_policy.py
+
+With --bulk the VM Home and all selected virtual disks of a VM are changed
+with a single ReconfigVM_Task, entities that already have the policy are
+skipped, and the reconfigure tasks of many VMs run concurrently, at most
+--max_in_flight at a time.
 """
 
+import functools
 import re
-from tools import cli, service_instance
-from pyVmomi import pbm, vim, VmomiSupport, SoapStubAdapter
+from tools import cli, service_instance, name_index, pbmhelper, tasks
+from pyVmomi import pbm, vim
 
 
 class BColors(object):
@@ -34,41 +40,6 @@ class BColors(object):
     UNDERLINE = '\033[4m'
 
 
-def pbm_connect(stub_adapter, disable_ssl_verification=False):
-    """Connect to the VMware Storage Policy Server
-
-    :param stub_adapter: The ServiceInstance stub adapter
-    :type stub_adapter: SoapStubAdapter
-    :param disable_ssl_verification: A flag used to skip ssl certificate
-        verification (default is False)
-    :type disable_ssl_verification: bool
-    :returns: A VMware Storage Policy Service content object
-    :rtype: ServiceContent
-    """
-
-    if disable_ssl_verification:
-        import ssl
-        if hasattr(ssl, '_create_unverified_context'):
-            ssl_context = ssl._create_unverified_context()
-        else:
-            ssl_context = None
-    else:
-        ssl_context = None
-
-    VmomiSupport.GetRequestContext()["vcSessionCookie"] = \
-        stub_adapter.cookie.split('"')[1]
-    hostname = stub_adapter.host.split(":")[0]
-    pbm_stub = SoapStubAdapter(
-        host=hostname,
-        version="pbm.version.version1",
-        path="/pbm/sdk",
-        poolSize=0,
-        sslContext=ssl_context)
-    pbm_si = pbm.ServiceInstance("ServiceInstance", pbm_stub)
-    pbm_content = pbm_si.RetrieveContent()
-    return pbm_content
-
-
 def check_storage_profile_associated(profile_manager, ref, name):
     """Get name of VMware Storage Policy profile associated with
         the specified entities
@@ -87,8 +58,8 @@ def check_storage_profile_associated(profile_manager, ref, name):
 
     profile_ids = profile_manager.PbmQueryAssociatedProfile(ref)
     if len(profile_ids) > 0:
-        profiles = profile_manager.PbmRetrieveContent(profileIds=profile_ids)
-        for profile in profiles:
+        catalogue = pbmhelper.get_profile_catalogue(profile_manager)
+        for profile in catalogue.get(profile_ids):
             if profile.name == name:
                 return True
     return False
@@ -101,22 +72,11 @@ def search_storage_profile_by_name(profile_manager, name):
     :type profileManager: pbm.profile.ProfileManager
     :param name: A VMware Storage Policy profile name
     :type name: str
-    :returns: A VMware Storage Policy profile
+    :returns: A VMware Storage Policy profile or None
     :rtype: pbm.profile.Profile
     """
 
-    profile_ids = profile_manager.PbmQueryProfile(
-        resourceType=pbm.profile.ResourceType(resourceType="STORAGE"),
-        profileCategory="REQUIREMENT"
-    )
-    if len(profile_ids) > 0:
-        storage_profiles = profile_manager.PbmRetrieveContent(
-            profileIds=profile_ids)
-
-    for storageProfile in storage_profiles:
-        if storageProfile.name == name:
-            return storageProfile
-    return -1
+    return pbmhelper.get_profile_catalogue(profile_manager).by_name(name)
 
 
 def set_vm_storage_profile(vm, profile):
@@ -166,35 +126,133 @@ def set_virtual_disk_storage_profile(vm, hardware_device, profile):
     vm.ReconfigVM_Task(spec)
 
 
-def search_vm_by_name(si, name, strict=False):
+def search_vm_by_name(si, name, strict=False, match_mode=None):
     """Search virtual machine by name
 
+    The names of all virtual machines are collected in one property
+    collector call and matched against a sorted index.
+
     :param si: A ServiceInstance managed object
     :type name: si
-    :param name: A virtual machine name
+    :param name: A virtual machine name or pattern
     :type name: str
     :param strict: A flag used to set strict search method
         (default is False)
     :type strict: bool
-    :returns: A virtual machine object
-    :rtype: VirtualMachine
+    :param match_mode: 'exact', 'glob' or 'regex', overrides strict
+        (default is None)
+    :type match_mode: str
+    :returns: A list of virtual machine objects
+    :rtype: VirtualMachine[]
     """
 
-    content = si.content
-    root_folder = content.rootFolder
-    obj_view = content.viewManager.CreateContainerView(root_folder, [vim.VirtualMachine], True)
-    vm_list = obj_view.view
-    obj_view.Destroy()
-    obj = []
-    for vm in vm_list:
-        if strict:
-            if vm.name == name:
-                obj.append(vm)
-                return obj
-        else:
-            if re.match(".*{}.*".format(name), vm.name):
-                obj.append(vm)
-    return obj
+    if match_mode is None:
+        match_mode = 'exact' if strict else 'regex'
+    index = name_index.NameIndex.from_inventory(si, vim.VirtualMachine)
+    return [record['obj'] for record in index.search(name, match_mode)]
+
+
+def plan_storage_profile_changes(si, profile_manager, name, match_mode, profile,
+                                 set_vm_home, vd_number, batch_size=200):
+    """Build one reconfigure spec per virtual machine that folds the VM Home
+    and every selected virtual disk profile change together
+
+    Names and devices are collected in one property collector call and the
+    associated profiles are queried once per batch of virtual machines.
+    VM Homes and disks already associated with the profile are left out,
+    virtual machines with nothing to change are skipped.
+
+    :param si: A ServiceInstance managed object
+    :type name: si
+    :param profile_manager: A VMware Storage Policy Service manager object
+    :type profileManager: pbm.profile.ProfileManager
+    :param name: A virtual machine name or pattern
+    :type name: str
+    :param match_mode: 'exact', 'glob' or 'regex'
+    :type match_mode: str
+    :param profile: A VMware Storage Policy profile
+    :type profile: pbm.profile.Profile
+    :param set_vm_home: A flag used to set the profile of the VM Home
+    :type set_vm_home: bool
+    :param vd_number: The sequence numbers of the virtual disks, or None
+    :type vd_number: list
+    :param batch_size: The number of virtual machines per PBM call
+    :type batch_size: int
+    :returns: A list of (vm, vm name, ConfigSpec, [changed entity labels])
+    :rtype: list
+    """
+
+    index = name_index.NameIndex.from_inventory(si, vim.VirtualMachine,
+                                                ['config.hardware.device'])
+    records = index.search(name, match_mode)
+    vm_type = pbm.ServerObjectRef.ObjectType("virtualMachine")
+    disk_type = pbm.ServerObjectRef.ObjectType("virtualDiskId")
+    unique_id = profile.profileId.uniqueId
+
+    plans = []
+    for start in range(0, len(records), batch_size):
+        candidates = []
+        for record in records[start:start + batch_size]:
+            vm = record['obj']
+            entities = []
+            if set_vm_home:
+                entities.append(("VM Home", None,
+                                 pbm.ServerObjectRef(key=vm._moId, objectType=vm_type)))
+            for device in record.get('config.hardware.device', []):
+                if not isinstance(device, vim.vm.device.VirtualDisk) or not vd_number:
+                    continue
+                match = re.search('Hard disk (.+)', device.deviceInfo.label)
+                if match and match.group(1) in vd_number:
+                    entities.append((device.deviceInfo.label, device,
+                                     pbm.ServerObjectRef(key="{}:{}".format(vm._moId, device.key),
+                                                         objectType=disk_type)))
+            candidates.append((vm, record['name'], entities))
+
+        refs = [ref for _, _, entities in candidates for _, _, ref in entities]
+        compliant = set()
+        if refs:
+            for result in profile_manager.PbmQueryAssociatedProfiles(entities=refs):
+                if unique_id in [profile_id.uniqueId for profile_id in result.profileId]:
+                    compliant.add(result.object.key)
+
+        for vm, vm_name, entities in candidates:
+            spec = vim.vm.ConfigSpec()
+            labels = []
+            for label, device, ref in entities:
+                if ref.key in compliant:
+                    continue
+                profile_spec = vim.vm.DefinedProfileSpec(profileId=unique_id)
+                if device is None:
+                    spec.vmProfile = [profile_spec]
+                else:
+                    device_spec = vim.vm.device.VirtualDeviceSpec()
+                    device_spec.operation = vim.vm.device.VirtualDeviceSpec.Operation.edit
+                    device_spec.device = device
+                    device_spec.profile = [profile_spec]
+                    spec.deviceChange.append(device_spec)
+                labels.append(label)
+            if labels:
+                plans.append((vm, vm_name, spec, labels))
+    return plans
+
+
+def apply_storage_profile_changes(si, plans, max_in_flight=8):
+    """Submit the reconfigure specs concurrently
+
+    :param si: A ServiceInstance managed object
+    :type name: si
+    :param plans: A list of (vm, vm name, ConfigSpec, [changed entity labels])
+    :type plans: list
+    :param max_in_flight: The maximum number of running reconfigure tasks
+    :type max_in_flight: int
+    :returns: A generator of (vm name, task state, task error or None)
+    :rtype: generator
+    """
+
+    jobs = [(vm_name, functools.partial(vm.ReconfigVM_Task, spec))
+            for vm, vm_name, spec, _ in plans]
+    for vm_name, state, value in tasks.run_throttled(si, jobs, max_in_flight):
+        yield vm_name, state, value if state == vim.TaskInfo.State.error else None
 
 
 def main():
@@ -205,18 +263,28 @@ def main():
     parser.add_required_arguments(cli.Argument.VM_NAME, cli.Argument.STORAGE_POLICY_NAME)
     parser.add_custom_argument('--strict', required=False, action='store_true',
                                help='Search strict virtual machine name matches')
+    parser.add_custom_argument('--match_mode', required=False,
+                               choices=name_index.MATCH_MODES,
+                               help='How --vm-name is matched, overrides --strict '
+                                    '(default is regex)')
     parser.add_custom_argument('--set_vm_home', required=False, action='store_true',
                                help='Set the specified policy for vm home.')
     parser.add_custom_argument('--virtual_disk_number', required=False, nargs='+', metavar='int',
                                help='The sequence numbers of the virtual disks for which '
                                     'the specified policy should be set. Space as delimiter.')
+    parser.add_custom_argument('--bulk', required=False, action='store_true',
+                               help='Change the VM Home and disks of each VM with one '
+                                    'reconfigure task and run the tasks concurrently.')
+    parser.add_custom_argument('--max_in_flight', required=False, type=int, default=8,
+                               help='Maximum number of concurrent reconfigure tasks '
+                                    'in --bulk mode.')
     args = parser.get_args()
     si = service_instance.connect(args)
 
     vd_number = args.virtual_disk_number
     policy_name = args.storage_policy_name
 
-    pbm_content = pbm_connect(si._stub, args.disable_ssl_verification)
+    pbm_content = pbmhelper.get_pbm_content(si._stub)
     pm = pbm_content.profileManager
 
     storage_profile = search_storage_profile_by_name(pm, policy_name)
@@ -224,7 +292,23 @@ def main():
         raise SystemExit('Unable to find storage profile with name '
                          '{}{}{}.'.format(BColors.FAIL, policy_name, BColors.ENDC))
 
-    vm_list = search_vm_by_name(si, args.vm_name, args.strict)
+    if args.bulk:
+        match_mode = args.match_mode or ('exact' if args.strict else 'regex')
+        plans = plan_storage_profile_changes(si, pm, args.vm_name, match_mode, storage_profile,
+                                             args.set_vm_home, vd_number)
+        for _, vm_name, _, labels in plans:
+            print('{}: set {} policy: {}'.format(vm_name, ', '.join(labels), policy_name))
+        failed = 0
+        for vm_name, state, error in apply_storage_profile_changes(si, plans,
+                                                                   args.max_in_flight):
+            if error is not None:
+                failed += 1
+                print('VM reconfiguration task error: '
+                      '{}{}: {}{}'.format(BColors.FAIL, vm_name, error.msg, BColors.ENDC))
+        print('{} VMs reconfigured, {} failed'.format(len(plans) - failed, failed))
+        return
+
+    vm_list = search_vm_by_name(si, args.vm_name, args.strict, args.match_mode)
     for vm in vm_list:
         pm_object_type = pbm.ServerObjectRef.ObjectType("virtualMachine")
         pm_ref = pbm.ServerObjectRef(key=vm._moId, objectType=pm_object_type)
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest import TestCase
+
+from mock import Mock
+from pyVmomi import vim
+
+from samples.tools.async_collector import (
+    AsyncPropertyCollector,
+    wait_for_task,
+    wait_for_tasks
+)
+
+
+def update_set(version, *object_updates):
+    return SimpleNamespace(version=version,
+                           filterSet=[SimpleNamespace(objectSet=list(object_updates))])
+
+
+def object_update(obj, kind='modify', **changes):
+    change_set = [SimpleNamespace(name=name.replace('__', '.'), op='assign', val=val)
+                  for name, val in changes.items()]
+    return SimpleNamespace(obj=obj, kind=kind, changeSet=change_set)
+
+
+def service_instance(pc):
+    si = Mock()
+    si.content.propertyCollector.CreatePropertyCollector.return_value = pc
+    return si
+
+
+class AsyncPropertyCollectorTests(TestCase):
+
+    def test_should_skip_timeouts_and_track_version(self):
+        pc = Mock()
+        vm = vim.VirtualMachine('vm-1')
+        pc.WaitForUpdatesEx.side_effect = [
+            None,
+            update_set('1', object_update(vm, 'enter', name='foo')),
+            update_set('2', object_update(vm, name='bar')),
+        ]
+
+        async def collect():
+            received = []
+            async with AsyncPropertyCollector(service_instance(pc)) as collector:
+                async for change in collector.changes():
+                    received.append(change)
+                    if len(received) == 2:
+                        break
+            return received
+
+        received = asyncio.run(collect())
+
+        self.assertEqual(received, [(vm, 'enter', {'name': 'foo'}),
+                                    (vm, 'modify', {'name': 'bar'})])
+        versions = [c[0][0] for c in pc.WaitForUpdatesEx.call_args_list]
+        self.assertEqual(versions, ['', '', '1'])
+        pc.DestroyPropertyCollector.assert_called_once_with()
+
+    def test_should_cancel_server_side_wait_on_cancellation(self):
+        pc = Mock()
+        released = threading.Event()
+        pc.WaitForUpdatesEx.side_effect = lambda *_: released.wait(5)
+        pc.CancelWaitForUpdates.side_effect = released.set
+
+        async def consume():
+            collector = AsyncPropertyCollector(service_instance(pc))
+            task = asyncio.ensure_future(collector.updates().__anext__())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await collector.close()
+
+        asyncio.run(consume())
+
+        pc.CancelWaitForUpdates.assert_called_once_with()
+
+
+class WaitForTasksTests(TestCase):
+
+    def test_should_return_results_in_task_order(self):
+        first, second = vim.Task('task-1'), vim.Task('task-2')
+        pc = Mock()
+        pc.WaitForUpdatesEx.side_effect = [
+            update_set('1', object_update(first, 'enter', info__state='running'),
+                       object_update(second, 'enter', info__state='running')),
+            update_set('2', object_update(second, info__state='success', info__result='b')),
+            update_set('3', object_update(first, info__state='success', info__result='a')),
+        ]
+
+        results = asyncio.run(wait_for_tasks(service_instance(pc), [first, second]))
+
+        self.assertEqual(results, ['a', 'b'])
+
+    def test_should_raise_task_error(self):
+        task = vim.Task('task-1')
+        pc = Mock()
+        pc.WaitForUpdatesEx.side_effect = [
+            update_set('1', object_update(task, 'enter', info__state='error',
+                                          info__error=vim.fault.InvalidState())),
+        ]
+
+        with self.assertRaises(vim.fault.InvalidState):
+            asyncio.run(wait_for_task(service_instance(pc), task))
+        pc.DestroyPropertyCollector.assert_called_once_with()
@@ -0,0 +1,94 @@
+import datetime
+import io
+import os
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+from pyVmomi import vim
+
+from samples.tools.datastore_transfer import (
+    DatastoreLocation,
+    _BufferedReader,
+    is_up_to_date,
+    list_local_files,
+    list_remote_files,
+    locate_datastores
+)
+from samples.tools import pchelper
+
+
+class DatastoreTransferTests(TestCase):
+
+    def test_should_read_in_large_buffers(self):
+        reader = _BufferedReader(io.BytesIO(b'x' * 10), 10, 4)
+
+        self.assertEqual(len(reader), 10)
+        self.assertEqual(reader.read(8192), b'xxxx')
+
+    def test_should_compare_size_and_mtime(self):
+        self.assertTrue(is_up_to_date((10, 100), (10, 100)))
+        self.assertTrue(is_up_to_date((10, 100), (10, 200)))
+        self.assertFalse(is_up_to_date((10, 200), (10, 100)))
+        self.assertFalse(is_up_to_date((10, 100), (11, 100)))
+        self.assertFalse(is_up_to_date((10, 100), None))
+
+    def test_should_list_local_files_with_posix_paths(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, 'linux'))
+            with open(os.path.join(tmp, 'linux', 'a.iso'), 'wb') as f:
+                f.write(b'abc')
+            os.utime(os.path.join(tmp, 'linux', 'a.iso'), (50, 50))
+
+            self.assertEqual(list_local_files(tmp), {'linux/a.iso': (3, 50)})
+
+    @patch('samples.tools.datastore_transfer.tasks.wait_for_tasks')
+    def test_should_list_remote_files_relative_to_directory(self, _):
+        modification = datetime.datetime(1970, 1, 1, 0, 1, 40, tzinfo=datetime.timezone.utc)
+        browser = Mock()
+        browser.SearchDatastoreSubFolders_Task.return_value.info.result = [
+            vim.host.DatastoreBrowser.SearchResults(
+                folderPath='[ds1] iso/',
+                file=[vim.host.DatastoreBrowser.FolderInfo(path='linux'),
+                      vim.host.DatastoreBrowser.FileInfo(path='b.iso', fileSize=5,
+                                                         modification=modification)]),
+            vim.host.DatastoreBrowser.SearchResults(
+                folderPath='[ds1] iso/linux',
+                file=[vim.host.DatastoreBrowser.FileInfo(path='a.iso', fileSize=3,
+                                                         modification=modification)]),
+        ]
+        location = DatastoreLocation('ds', 'ds1', 'dc', 'DC1', browser)
+
+        files = list_remote_files(Mock(), location, '/iso/')
+
+        self.assertEqual(files, {'b.iso': (5, 100), 'linux/a.iso': (3, 100)})
+        self.assertEqual(browser.SearchDatastoreSubFolders_Task.call_args[0][0], '[ds1] iso')
+
+
+class LocateDatastoresTests(TestCase):
+
+    def setUp(self):
+        self.datastores = [vim.Datastore('datastore-%d' % i) for i in range(3)]
+        datacenters = [
+            {'obj': vim.Datacenter('dc-1'), 'name': 'dc1', 'datastore': self.datastores[:2]},
+            {'obj': vim.Datacenter('dc-2'), 'name': 'dc2', 'datastore': self.datastores[2:]}]
+        datastores = [{'obj': ds, 'name': name, 'browser': None}
+                      for ds, name in zip(self.datastores, ['local', 'shared', 'local'])]
+        patcher = patch.object(pchelper, 'collect_properties',
+                               side_effect=lambda si, view_ref, obj_type, **_:
+                               datacenters if obj_type is vim.Datacenter else datastores)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(pchelper, 'get_container_view')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_should_fail_for_names_in_several_datacenters(self):
+        with self.assertRaisesRegex(RuntimeError, r'local \(dc1, dc2\)'):
+            locate_datastores(Mock(), ['local', 'shared'])
+
+    def test_should_select_datacenter(self):
+        locations = locate_datastores(Mock(), ['local'], datacenter_name='dc2')
+
+        self.assertEqual([(location.datastore, location.datacenter_name) for location in locations],
+                         [(self.datastores[2], 'dc2')])
@@ -0,0 +1,72 @@
+from unittest import TestCase, skipIf
+
+from mock import Mock, patch
+
+from samples.tools import esxtop
+
+COUNTER_INFO = '''
+|PCPU|NumOfLCPUs,U32|NumOfCores,U32|TimeStamp,STR|
+|LCPU|LCPUID,U32|UsedTimeInUsec,U64|Load,F64|
+'''
+
+STATS = '''
+==NUM-OF-OBJECTS==|PCPU,1|LCPU,2|
+|PCPU|8|4|2021-03-01 10:00:00|
+|LCPU|0|1500|0.25|
+|LCPU|1|2500|0.5|
+|UNKNOWN|1|
+'''
+
+
+class EsxtopTests(TestCase):
+
+    def setUp(self):
+        self.schema = esxtop.parse_counter_info(COUNTER_INFO)
+
+    def test_should_parse_counter_schema(self):
+        self.assertEqual(self.schema['LCPU'],
+                         [('LCPUID', 'U32'), ('UsedTimeInUsec', 'U64'), ('Load', 'F64')])
+
+    def test_should_parse_stats_into_frames(self):
+        frames = esxtop.parse_stats(STATS, self.schema)
+
+        self.assertEqual(sorted(frames), ['LCPU', 'PCPU'])
+        self.assertEqual(len(frames['LCPU']), 2)
+        self.assertEqual(list(frames['LCPU']['UsedTimeInUsec']), [1500, 2500])
+        self.assertEqual(list(frames['LCPU']['Load']), [0.25, 0.5])
+        self.assertEqual(list(frames['PCPU']['TimeStamp']), ['2021-03-01 10:00:00'])
+
+    @skipIf(esxtop.numpy is None, 'NumPy is not installed')
+    def test_should_store_typed_numpy_columns(self):
+        frames = esxtop.parse_stats(STATS, self.schema)
+
+        self.assertEqual(frames['LCPU']['UsedTimeInUsec'].dtype, esxtop.numpy.int64)
+        self.assertEqual(frames['LCPU']['Load'].sum(), 0.75)
+
+    def test_should_fetch_schema_once(self):
+        service = Mock()
+        service.ExecuteSimpleCommand.side_effect = \
+            lambda arguments: COUNTER_INFO if arguments == ['CounterInfo'] else STATS
+        collector = esxtop.EsxtopCollector(service)
+
+        collector.snapshot()
+        collector.snapshot()
+
+        self.assertEqual([c[1]['arguments'] for c in service.ExecuteSimpleCommand.call_args_list],
+                         [['CounterInfo'], ['FetchStats'], ['FetchStats']])
+
+    @patch('samples.tools.esxtop.host_service.get_host_service')
+    def test_should_report_schema_errors(self, get_host_service):
+        failing = Mock()
+        failing.ExecuteSimpleCommand.side_effect = RuntimeError('fault')
+        working = Mock()
+        working.ExecuteSimpleCommand.return_value = COUNTER_INFO
+        get_host_service.side_effect = \
+            lambda si, host_name, service_name: {'esx1': working, 'esx2': failing}.get(host_name)
+        errors = {}
+
+        collectors = esxtop.collect_schemas(Mock(), ['esx1', 'esx2', 'esx3'], errors=errors)
+
+        self.assertEqual(list(collectors), ['esx1'])
+        self.assertIsInstance(errors['esx2'], RuntimeError)
+        self.assertIsInstance(errors['esx3'], LookupError)
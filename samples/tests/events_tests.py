@@ -0,0 +1,48 @@
+import datetime
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from samples.tools.events import read_events, time_filter
+
+
+class ReadEventsTests(TestCase):
+
+    def setUp(self):
+        self.si = Mock()
+        self.collector = self.si.content.eventManager.CreateCollectorForEvents.return_value
+
+    def test_should_read_all_pages_and_destroy_collector(self):
+        self.collector.ReadNextEvents.side_effect = [[1, 2], [3], []]
+
+        events = list(read_events(self.si, 'spec', page_size=2))
+
+        self.assertEqual(events, [1, 2, 3])
+        self.collector.RewindCollector.assert_called_once_with()
+        self.collector.ReadNextEvents.assert_called_with(2)
+        self.collector.DestroyCollector.assert_called_once_with()
+
+    def test_should_clamp_page_size(self):
+        self.collector.ReadNextEvents.side_effect = [[]]
+
+        list(read_events(self.si, 'spec', page_size=5000))
+
+        self.collector.ReadNextEvents.assert_called_with(1000)
+
+    @patch('samples.tools.events.time.sleep')
+    def test_should_follow_new_events_in_tail_mode(self, sleep):
+        self.collector.ReadNextEvents.side_effect = [[1], [], [], [2]]
+
+        reader = read_events(self.si, 'spec', tail=True, poll_interval=3)
+        events = [next(reader), next(reader)]
+        reader.close()
+
+        self.assertEqual(events, [1, 2])
+        self.assertEqual(sleep.call_count, 2)
+        self.collector.DestroyCollector.assert_called_once_with()
+
+    def test_should_build_time_filter(self):
+        begin = datetime.datetime(2021, 3, 1, tzinfo=datetime.timezone.utc)
+
+        self.assertIsNone(time_filter())
+        self.assertEqual(time_filter(begin).beginTime, begin)
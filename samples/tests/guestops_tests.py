@@ -0,0 +1,142 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import TestCase
+
+from mock import Mock, patch
+from pyVmomi import vim
+
+from samples.tools.guestops import (
+    ProgramResult,
+    expand_local_paths,
+    fix_transfer_url,
+    join_guest_path,
+    run_programs,
+    run_programs_on_vms,
+    summarize,
+    transfer_to_vms,
+    upload_file
+)
+
+
+def process(pid, exit_code=None):
+    return SimpleNamespace(pid=pid, exitCode=exit_code,
+                           endTime=None if exit_code is None else 'done')
+
+
+class RunProgramsTests(TestCase):
+
+    def setUp(self):
+        self.process_manager = Mock()
+        self.process_manager.StartProgramInGuest.side_effect = [11, 12]
+
+    @patch('samples.tools.guestops.time.sleep')
+    def test_should_poll_all_pids_in_one_call(self, sleep):
+        self.process_manager.ListProcessesInGuest.side_effect = [
+            [process(11), process(12)],
+            [process(11, 0), process(12)],
+            [process(12, 3)],
+        ]
+
+        result = run_programs(self.process_manager, 'vm', 'vm-a', 'creds', ['spec1', 'spec2'],
+                              initial_interval=1, max_interval=2)
+
+        self.assertEqual(result.pids, [11, 12])
+        self.assertEqual(result.exit_codes, {11: 0, 12: 3})
+        pids_polled = [c[0][2] for c in self.process_manager.ListProcessesInGuest.call_args_list]
+        self.assertEqual(pids_polled, [[11, 12], [11, 12], [12]])
+        self.assertEqual([c[0][0] for c in sleep.call_args_list], [1, 1.5])
+
+    def test_should_record_fault(self):
+        self.process_manager.StartProgramInGuest.side_effect = vim.fault.InvalidGuestLogin(
+            msg='bad login')
+
+        result = run_programs(self.process_manager, 'vm', 'vm-a', 'creds', ['spec'])
+
+        self.assertEqual(result.error, 'bad login')
+        self.assertFalse(result.succeeded)
+
+    def test_should_record_connection_error(self):
+        self.process_manager.ListProcessesInGuest.side_effect = ConnectionResetError(
+            'connection reset')
+
+        result = run_programs(self.process_manager, 'vm', 'vm-a', 'creds', ['spec'])
+
+        self.assertEqual(result.pids, [11])
+        self.assertEqual(result.error, 'connection reset')
+
+
+class FanOutTests(TestCase):
+
+    def test_should_skip_vms_without_tools(self):
+        si = Mock()
+        process_manager = si.content.guestOperationsManager.processManager
+        process_manager.StartProgramInGuest.return_value = 5
+        process_manager.ListProcessesInGuest.return_value = [process(5, 0)]
+
+        results = run_programs_on_vms(si, [('vm1', 'a', 'guestToolsRunning'),
+                                           ('vm2', 'b', 'guestToolsNotRunning')],
+                                      'creds', ['spec'], workers=2)
+
+        self.assertEqual(summarize(results), {'VMware Tools not running': ['b'], (0,): ['a']})
+
+    def test_should_summarize_timeouts(self):
+        report = summarize([ProgramResult('b', [1], {1: None}),
+                            ProgramResult('a', [1], {})])
+
+        self.assertEqual(report, {'running': ['a', 'b']})
+
+
+class TransferTests(TestCase):
+
+    def test_should_replace_wildcard_host(self):
+        self.assertEqual(fix_transfer_url('https://*:443/guestFile?id=1', 'vc'),
+                         'https://vc:443/guestFile?id=1')
+
+    def test_should_keep_guest_path_separator(self):
+        self.assertEqual(join_guest_path('C:\\temp\\', 'a', 'b'), 'C:\\temp\\a\\b')
+        self.assertEqual(join_guest_path('/opt/', 'a', 'b'), '/opt/a/b')
+
+    def test_should_expand_directory_tree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            bundle = os.path.join(tmp, 'bundle')
+            os.makedirs(os.path.join(bundle, 'bin'))
+            for name in ('README', os.path.join('bin', 'agent')):
+                with open(os.path.join(bundle, name), 'w') as f:
+                    f.write(name)
+
+            pairs = expand_local_paths([bundle], '/opt')
+
+            self.assertEqual(sorted(guest for _, guest in pairs),
+                             ['/opt/bundle/README', '/opt/bundle/bin/agent'])
+
+    def test_should_stream_file_object(self):
+        file_manager = Mock()
+        file_manager.InitiateFileTransferToGuest.return_value = 'https://*:443/guestFile'
+        session = Mock()
+        with tempfile.NamedTemporaryFile() as local_file:
+            local_file.write(b'payload')
+            local_file.flush()
+
+            size = upload_file(file_manager, session, 'vm', 'creds', local_file.name,
+                               '/tmp/payload', 'vc')
+
+        self.assertEqual(size, 7)
+        self.assertEqual(file_manager.InitiateFileTransferToGuest.call_args[0][4], 7)
+        url = session.put.call_args[0][0]
+        data = session.put.call_args[1]['data']
+        self.assertEqual(url, 'https://vc:443/guestFile')
+        self.assertTrue(hasattr(data, 'read'))
+
+    @patch('samples.tools.guestops.create_session')
+    def test_should_record_connection_error_per_vm(self, create_session):
+        si = Mock()
+        file_manager = si.content.guestOperationsManager.fileManager
+        file_manager.MakeDirectoryInGuest.side_effect = [ConnectionResetError('reset'), None]
+        file_manager.InitiateFileTransferToGuest.return_value = 'https://*:443/guestFile'
+        vms = [('vm-1', 'a', 'guestToolsRunning'), ('vm-2', 'b', 'guestToolsRunning')]
+        with tempfile.NamedTemporaryFile() as local_file:
+            results = transfer_to_vms(si, vms, 'creds', [(local_file.name, '/opt/x')], 'vc',
+                                      workers=1)
+
+        self.assertEqual([(r.vm_name, r.error) for r in results], [('a', 'reset'), ('b', None)])
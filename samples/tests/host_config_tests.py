@@ -0,0 +1,128 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+from pyVmomi import vim, vmodl, VmomiSupport
+
+from samples.tools import host_config, pchelper
+from samples.tools.host_config import HostOptions
+
+
+def host(name, **values):
+    return HostOptions(vim.HostSystem(name), name, Mock(),
+                       {key.replace('_', '.'): value for key, value in values.items()})
+
+
+class ReadOptionsTests(TestCase):
+
+    def setUp(self):
+        self.si = Mock()
+        self.option_managers = [Mock(), Mock()]
+        hosts = [{'obj': vim.HostSystem('host-%d' % i), 'name': 'esx-%02d' % i,
+                  'configManager.advancedOption': option_manager}
+                 for i, option_manager in enumerate(self.option_managers)]
+        patcher = patch.object(pchelper, 'collect_properties', return_value=hosts[::-1])
+        self.collect_properties = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(pchelper, 'get_container_view')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_should_query_only_given_keys(self):
+        def query_options(name):
+            if name == 'Misc.Missing':
+                raise vim.fault.InvalidName()
+            return [vim.option.OptionValue(key=name, value=1)]
+
+        for option_manager in self.option_managers:
+            option_manager.QueryOptions.side_effect = query_options
+
+        hosts = host_config.read_options(self.si, keys=['VSAN.ClomRepairDelay',
+                                                        'Misc.Missing'])
+
+        self.assertEqual([(h.name, h.values) for h in hosts],
+                         [('esx-00', {'VSAN.ClomRepairDelay': 1}),
+                          ('esx-01', {'VSAN.ClomRepairDelay': 1})])
+        self.si.content.propertyCollector.RetrievePropertiesEx.assert_not_called()
+
+    def test_should_query_keys_with_common_prefix_once(self):
+        self.option_managers[0].QueryOptions.return_value = [
+            vim.option.OptionValue(key='VSAN.ClomRepairDelay', value=60),
+            vim.option.OptionValue(key='VSAN.DomLongOpTraceMS', value=1000),
+            vim.option.OptionValue(key='VSAN.Other', value=0)]
+        self.option_managers[1].QueryOptions.side_effect = vmodl.fault.SystemError()
+
+        hosts = host_config.read_options(self.si, keys=['VSAN.ClomRepairDelay',
+                                                        'VSAN.DomLongOpTraceMS'])
+
+        self.option_managers[0].QueryOptions.assert_called_once_with(name='VSAN.')
+        self.assertEqual(hosts[0].values, {'VSAN.ClomRepairDelay': 60,
+                                           'VSAN.DomLongOpTraceMS': 1000})
+        self.assertIsNone(hosts[0].error)
+        self.assertEqual(hosts[1].values, {})
+        self.assertIsInstance(hosts[1].error, vmodl.fault.SystemError)
+
+    def test_should_page_through_all_settings(self):
+        def page(option_manager, value, token=None):
+            return vmodl.query.PropertyCollector.RetrieveResult(token=token, objects=[
+                vmodl.query.PropertyCollector.ObjectContent(obj=option_manager, propSet=[
+                    vmodl.DynamicProperty(name='setting', val=vim.option.OptionValue.Array([
+                        vim.option.OptionValue(key='Key', value=value)]))])])
+
+        option_managers = [vim.option.OptionManager('option-%d' % i) for i in range(2)]
+        for host in self.collect_properties.return_value:
+            host['configManager.advancedOption'] = option_managers[int(host['name'][-1])]
+        collector = self.si.content.propertyCollector
+        collector.RetrievePropertiesEx.return_value = page(option_managers[0], 0, 'next')
+        collector.ContinueRetrievePropertiesEx.return_value = page(option_managers[1], 1)
+
+        hosts = host_config.read_options(self.si, page_size=1)
+
+        self.assertEqual([(h.name, h.values) for h in hosts],
+                         [('esx-00', {'Key': 0}), ('esx-01', {'Key': 1})])
+        self.assertEqual(collector.RetrievePropertiesEx.call_args[0][1].maxObjects, 1)
+        collector.ContinueRetrievePropertiesEx.assert_called_once_with('next')
+
+
+class PlanChangesTests(TestCase):
+
+    def test_should_only_plan_differing_settings(self):
+        hosts = [host('esx-01', VSAN_ClomRepairDelay=60, Misc_Enabled=True),
+                 host('esx-02', VSAN_ClomRepairDelay=120, Misc_Enabled=True),
+                 host('esx-03', Misc_Enabled=False)]
+
+        plans = host_config.plan_changes(hosts, {'VSAN.ClomRepairDelay': '120',
+                                                 'Misc.Enabled': 'true'})
+
+        self.assertEqual([(h.name, [(o.key, o.value) for o in changes]) for h, changes in plans],
+                         [('esx-01', [('VSAN.ClomRepairDelay', 120)]),
+                          ('esx-03', [('Misc.Enabled', True)])])
+
+    def test_should_keep_type_of_current_value(self):
+        value = host_config.coerce_value('42', VmomiSupport.long(1))
+
+        self.assertIs(type(value), VmomiSupport.long)
+        self.assertEqual(host_config.coerce_value('on', 'off'), 'on')
+
+
+class RolloutTests(TestCase):
+
+    def setUp(self):
+        self.hosts = [host('esx-%02d' % i, Key=0) for i in range(4)]
+        self.plans = [(h, [vim.option.OptionValue(key='Key', value=1)]) for h in self.hosts]
+
+    def test_should_update_canary_first(self):
+        results = list(host_config.rollout(self.plans, parallelism=2, canary=1))
+
+        self.assertEqual([r.host_name for r in results], ['esx-00', 'esx-01', 'esx-02', 'esx-03'])
+        self.assertTrue(all(r.error is None for r in results))
+        for h, changes in self.plans:
+            h.option_manager.UpdateOptions.assert_called_once_with(changedValue=changes)
+
+    def test_should_stop_when_canary_fails(self):
+        self.hosts[0].option_manager.UpdateOptions.side_effect = vim.fault.InvalidName()
+
+        results = list(host_config.rollout(self.plans, canary=1))
+
+        self.assertIsInstance(results[0].error, vim.fault.InvalidName)
+        self.assertEqual({r.error for r in results[1:]}, {'canary failed'})
+        self.hosts[1].option_manager.UpdateOptions.assert_not_called()
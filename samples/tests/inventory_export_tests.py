@@ -0,0 +1,88 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+from pyVmomi import vim, vmodl
+
+from samples.tools import inventory_export, pchelper
+
+
+def page_result(objects, token=None):
+    return vim.PropertyCollector.RetrieveResult(token=token, objects=[
+        vim.PropertyCollector.ObjectContent(obj=obj, propSet=[
+            vmodl.DynamicProperty(name=name, val=val)
+            for name, val in props.items()]) for obj, props in objects])
+
+
+class IterPropertiesTests(TestCase):
+
+    def test_should_continue_until_no_token(self):
+        si = Mock()
+        collector = si.content.propertyCollector
+        collector.RetrievePropertiesEx.return_value = page_result(
+            [(vim.VirtualMachine('vm-1'), {'name': 'a'})], token='1')
+        collector.ContinueRetrievePropertiesEx.return_value = page_result(
+            [(vim.VirtualMachine('vm-2'), {'name': 'b'})])
+
+        pages = list(pchelper.iter_properties(si, vim.view.ContainerView('view-1'),
+                                              vim.VirtualMachine, ['name'],
+                                              include_mors=True, page_size=1))
+
+        self.assertEqual([[item['name'] for item in page] for page in pages], [['a'], ['b']])
+        self.assertEqual(pages[1][0]['obj'], vim.VirtualMachine('vm-2'))
+        collector.ContinueRetrievePropertiesEx.assert_called_once_with('1')
+
+
+class ExportInventoryTests(TestCase):
+
+    def setUp(self):
+        self.host = vim.HostSystem('host-1')
+        self.datastore = vim.Datastore('datastore-1')
+        self.objects = {
+            vim.VirtualMachine: [[
+                {'obj': vim.VirtualMachine('vm-1'), 'name': 'web-01',
+                 'runtime.powerState': 'poweredOn', 'runtime.host': self.host,
+                 'config.template': False, 'config.hardware.numCPU': 2,
+                 'datastore': [self.datastore]}],
+                [{'obj': vim.VirtualMachine('vm-2'), 'name': 'web-02',
+                  'runtime.host': self.host, 'config.template': True}]],
+            vim.HostSystem: [[{'obj': self.host, 'name': 'esx-01',
+                               'runtime.inMaintenanceMode': False}]],
+            vim.Datastore: [[{'obj': self.datastore, 'name': 'datastore1',
+                              'summary.capacity': 2 ** 40}]],
+            vim.Network: [],
+        }
+
+    def export(self, path):
+        si = Mock()
+        si.content.about.instanceUuid = 'vc-uuid'
+        with patch.object(pchelper, 'get_container_view'), \
+                patch.object(pchelper, 'iter_properties',
+                             side_effect=lambda si, view_ref, obj_type, **kwargs:
+                             iter(self.objects[obj_type])):
+            return inventory_export.export_inventory(si, path)
+
+    def test_should_write_queryable_snapshot(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'inventory.db')
+
+        self.export(path)
+        counts = self.export(path)
+        connection = sqlite3.connect(path)
+        self.addCleanup(connection.close)
+
+        self.assertEqual(counts, {'vm': 2, 'host': 1, 'datastore': 1, 'network': 0})
+        self.assertEqual(connection.execute(
+            'SELECT vm.name, vm.template, host.name FROM vm '
+            'JOIN host ON vm.host = host.moid ORDER BY vm.name').fetchall(),
+            [('web-01', 0, 'esx-01'), ('web-02', 1, 'esx-01')])
+        self.assertEqual(connection.execute(
+            'SELECT vm, datastore FROM vm_datastore').fetchall(), [('vm-1', 'datastore-1')])
+        self.assertEqual(connection.execute(
+            'SELECT capacity_bytes FROM datastore').fetchone(), (2 ** 40,))
+        self.assertEqual(connection.execute('SELECT vcenter FROM snapshot').fetchone(),
+                         ('vc-uuid',))
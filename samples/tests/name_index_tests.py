@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from samples.tools.name_index import NameIndex
+
+
+def records(*names):
+    return [{'name': name, 'obj': 'obj-' + name} for name in names]
+
+
+class NameIndexTests(TestCase):
+
+    def setUp(self):
+        self.index = NameIndex(records('web-02', 'db-01', 'web-01', 'web', 'app-web-01') +
+                               [{'obj': 'nameless'}])
+
+    def names(self, found):
+        return [record['name'] for record in found]
+
+    def test_should_ignore_records_without_name(self):
+        self.assertEqual(len(self.index), 5)
+
+    def test_should_match_exact_names(self):
+        self.assertEqual(self.index.exact('web-01'), [{'name': 'web-01', 'obj': 'obj-web-01'}])
+        self.assertEqual(self.index.exact('web-03'), [])
+
+    def test_should_match_prefix(self):
+        self.assertEqual(self.names(self.index.prefix('web-')), ['web-01', 'web-02'])
+
+    def test_should_match_glob(self):
+        self.assertEqual(self.names(self.index.glob('web-0[2-9]')), ['web-02'])
+        self.assertEqual(self.names(self.index.glob('*web*')),
+                         ['app-web-01', 'web', 'web-01', 'web-02'])
+        self.assertEqual(self.names(self.index.glob('web')), ['web'])
+
+    def test_should_search_regex_anywhere_in_name(self):
+        self.assertEqual(self.names(self.index.search('web-0', 'regex')),
+                         ['app-web-01', 'web-01', 'web-02'])
+
+    def test_should_reject_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            self.index.search('web', 'fuzzy')
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from pyVmomi import vim
+
+from samples.tools.network_index import NetworkIndex, vlan_to_str
+
+VDS = vim.dvs.VmwareDistributedVirtualSwitch
+NIC = vim.vm.device.VirtualEthernetCard
+
+
+def dvs_nic(switch_uuid, portgroup_key):
+    port = vim.dvs.PortConnection(switchUuid=switch_uuid, portgroupKey=portgroup_key)
+    return vim.vm.device.VirtualVmxnet3(
+        backing=NIC.DistributedVirtualPortBackingInfo(port=port))
+
+
+def standard_nic(network_name):
+    return vim.vm.device.VirtualE1000(backing=NIC.NetworkBackingInfo(deviceName=network_name))
+
+
+def host_port_group(name, vswitch, vlan_id):
+    return vim.host.PortGroup(spec=vim.host.PortGroup.Specification(
+        name=name, vswitchName=vswitch, vlanId=vlan_id))
+
+
+class NetworkIndexTests(TestCase):
+
+    def setUp(self):
+        self.dvs = VDS('dvs-1')
+        self.host = vim.HostSystem('host-1')
+        self.index = NetworkIndex(
+            switches=[{'obj': self.dvs, 'uuid': 'uuid-1', 'name': 'dvSwitch'}],
+            dv_port_groups=[{
+                'key': 'dvportgroup-1', 'name': 'prod',
+                'config.distributedVirtualSwitch': self.dvs,
+                'config.defaultPortConfig': VDS.VmwarePortConfigPolicy(
+                    vlan=VDS.VlanIdSpec(vlanId=100))}],
+            hosts=[{'obj': self.host, 'config.network.portgroup': [
+                host_port_group('VM Network', 'vSwitch0', 0),
+                host_port_group('VM Network 2', 'vSwitch1', 20)]}])
+
+    def test_should_resolve_distributed_port_group(self):
+        self.assertEqual(self.index.resolve(dvs_nic('uuid-1', 'dvportgroup-1'), self.host),
+                         ('dvSwitch', 'prod', '100'))
+
+    def test_should_report_unknown_switch(self):
+        self.assertEqual(self.index.resolve(dvs_nic('uuid-2', 'dvportgroup-1'), self.host),
+                         ('NA', '** Error: DVS not found **', 'NA'))
+
+    def test_should_resolve_host_port_group_by_exact_name(self):
+        self.assertEqual(self.index.resolve(standard_nic('VM Network 2'), self.host),
+                         ('vSwitch1', 'VM Network 2', '20'))
+        self.assertEqual(self.index.resolve(standard_nic('VM Network'), vim.HostSystem('host-2')),
+                         ('NA', 'VM Network', 'NA'))
+
+    def test_should_format_trunk_and_private_vlans(self):
+        trunk = VDS.TrunkVlanSpec(vlanId=[vim.NumericRange(start=10, end=20),
+                                          vim.NumericRange(start=30, end=30)])
+
+        self.assertEqual(vlan_to_str(trunk), '10-20,30')
+        self.assertEqual(vlan_to_str(VDS.PvlanSpec(pvlanId=7)), '7')
+        self.assertEqual(vlan_to_str(None), 'NA')
@@ -0,0 +1,63 @@
+import io
+import json
+from unittest import TestCase
+
+from mock import Mock
+
+from samples.tools import output
+
+RECORDS = [{'name': 'web-01', 'state': 'poweredOn', 'ip': '10.0.0.1'},
+           {'name': 'web, 02', 'state': 'poweredOff', 'ip': None, 'extra': 1}]
+
+
+def write(output_format, records=RECORDS, **kwargs):
+    stream = io.StringIO()
+    with output.open_writer(output_format, ['name', 'state', 'ip'], stream, **kwargs) as writer:
+        for record in records:
+            writer.write(record)
+    return stream.getvalue()
+
+
+class OutputTests(TestCase):
+
+    def test_should_write_table(self):
+        self.assertEqual(write('table', widths={'name': 8, 'state': 10}).splitlines(),
+                         ['name     state      ip',
+                          'web-01   poweredOn  10.0.0.1',
+                          'web, 02  poweredOff '])
+
+    def test_should_write_csv(self):
+        self.assertEqual(write('csv').splitlines(),
+                         ['name,state,ip', 'web-01,poweredOn,10.0.0.1',
+                          '"web, 02",poweredOff,'])
+
+    def test_should_write_json_lines(self):
+        for output_format in ('jsonl', 'ndjson'):
+            self.assertEqual([json.loads(line) for line in write(output_format).splitlines()],
+                             [RECORDS[0], {'name': 'web, 02', 'state': 'poweredOff',
+                                           'ip': None}])
+
+    def test_should_write_header_without_records(self):
+        self.assertEqual(write('csv', records=[]), 'name,state,ip\r\n')
+        self.assertEqual(write('jsonl', records=[]), '')
+
+    def test_should_flush_every_ndjson_record(self):
+        stream = Mock()
+        writer = output.open_writer('ndjson', ['name'], stream)
+        writer.write(RECORDS[0])
+        writer.write(RECORDS[1])
+
+        self.assertEqual(stream.flush.call_count, 2)
+
+    def test_should_close_when_reader_goes_away(self):
+        stream = Mock()
+        stream.write.side_effect = BrokenPipeError()
+        writer = output.open_writer('jsonl', ['name'], stream)
+
+        writer.write(RECORDS[0])
+        writer.write(RECORDS[1])
+        writer.close()
+
+        self.assertTrue(writer.closed)
+        self.assertEqual(stream.write.call_count, 1)
+        stream.close.assert_not_called()
@@ -0,0 +1,129 @@
+import gc
+from types import SimpleNamespace
+from unittest import TestCase
+
+from mock import Mock, patch
+from pyVmomi import pbm
+
+from samples.tools import pbmhelper
+from samples.tools.pbmhelper import ProfileCatalogue, create_pbm_session, get_pbm_content, \
+    get_profile_catalogue
+
+
+def profile_id(unique_id):
+    return pbm.profile.ProfileId(uniqueId=unique_id)
+
+
+def profile(unique_id, name):
+    return SimpleNamespace(profileId=profile_id(unique_id), name=name)
+
+
+class ProfileCatalogueTests(TestCase):
+
+    def setUp(self):
+        self.profiles = {'p1': profile('p1', 'gold'), 'p2': profile('p2', 'silver'),
+                         'p3': profile('p3', 'bronze')}
+        self.profile_manager = Mock()
+        self.profile_manager.PbmQueryProfile.return_value = [profile_id('p1'), profile_id('p2')]
+        self.profile_manager.PbmRetrieveContent.side_effect = \
+            lambda profileIds: [self.profiles[p.uniqueId] for p in profileIds]
+        self.catalogue = ProfileCatalogue(self.profile_manager, max_age=60)
+
+    def retrieved_ids(self):
+        return [[p.uniqueId for p in c[1]['profileIds']]
+                for c in self.profile_manager.PbmRetrieveContent.call_args_list]
+
+    def test_should_load_profiles_once(self):
+        self.assertEqual(self.catalogue.by_name('gold').profileId.uniqueId, 'p1')
+        self.assertEqual(self.catalogue.by_id('p2').name, 'silver')
+        self.assertIsNone(self.catalogue.by_name('platinum'))
+
+        self.assertEqual(self.profile_manager.PbmQueryProfile.call_count, 1)
+        self.assertEqual(self.retrieved_ids(), [['p1', 'p2']])
+
+    def test_should_retrieve_unknown_ids_once(self):
+        found = self.catalogue.get([profile_id('p3'), 'p1', 'p3'])
+        self.catalogue.get(['p3'])
+
+        self.assertEqual([p.name for p in found], ['bronze', 'gold', 'bronze'])
+        self.assertEqual(self.retrieved_ids(), [['p1', 'p2'], ['p3']])
+
+    @patch('samples.tools.pbmhelper.time.time')
+    def test_should_only_fetch_new_profiles_on_revalidation(self, now):
+        now.return_value = 0
+        self.catalogue.profiles()
+        self.profile_manager.PbmQueryProfile.return_value = [profile_id('p2'), profile_id('p3')]
+        now.return_value = 61
+
+        names = sorted(p.name for p in self.catalogue.profiles())
+
+        self.assertEqual(names, ['bronze', 'silver'])
+        self.assertEqual(self.retrieved_ids(), [['p1', 'p2'], ['p3']])
+
+    def test_should_retrieve_invalidated_profile_again(self):
+        self.catalogue.profiles()
+        self.catalogue.invalidate(profile_id('p1'))
+
+        self.catalogue.by_name('gold')
+
+        self.assertEqual(self.retrieved_ids(), [['p1', 'p2'], ['p1']])
+
+
+class VcStub(object):
+
+    def __init__(self, session='abc'):
+        self.cookie = 'vmware_soap_session="%s"; Path=/; HttpOnly; Secure;' % session
+        self.host = 'vcenter.example.com:443'
+        self.poolSize = 5
+        self.schemeArgs = {'context': 'tls-context'}
+
+
+class PbmSessionTests(TestCase):
+
+    @patch('samples.tools.pbmhelper.pbm.ServiceInstance')
+    @patch('samples.tools.pbmhelper.SoapStubAdapter')
+    def test_should_reuse_session_per_stub(self, stub_adapter, service_instance):
+        vc_stub = VcStub()
+
+        pbm_si = create_pbm_session(vc_stub)
+        content = get_pbm_content(vc_stub)
+
+        self.assertIs(create_pbm_session(vc_stub), pbm_si)
+        self.assertIs(get_pbm_content(vc_stub), content)
+        stub_adapter.assert_called_once_with(
+            host='vcenter.example.com', port=443, version='pbm.version.version1',
+            path='/pbm/sdk', poolSize=5, sslContext='tls-context',
+            requestContext={'vcSessionCookie': 'abc'})
+        pbm_si.RetrieveContent.assert_called_once_with()
+
+    @patch('samples.tools.pbmhelper.pbm.ServiceInstance')
+    @patch('samples.tools.pbmhelper.SoapStubAdapter')
+    def test_should_create_new_session_after_login(self, stub_adapter, service_instance):
+        vc_stub = VcStub()
+        create_pbm_session(vc_stub)
+        vc_stub.cookie = VcStub('def').cookie
+
+        create_pbm_session(vc_stub)
+        create_pbm_session(VcStub())
+
+        self.assertEqual(stub_adapter.call_count, 3)
+
+    @patch('samples.tools.pbmhelper.pbm.ServiceInstance')
+    @patch('samples.tools.pbmhelper.SoapStubAdapter')
+    def test_should_keep_catalogue_on_session(self, stub_adapter, service_instance):
+        vc_stub = VcStub()
+        create_pbm_session(vc_stub)
+        profile_manager = SimpleNamespace(_stub=stub_adapter.return_value)
+
+        catalogue = get_profile_catalogue(profile_manager)
+
+        self.assertIs(get_profile_catalogue(profile_manager), catalogue)
+        del vc_stub
+        gc.collect()
+        self.assertEqual(len(pbmhelper._sessions), 0)
+
+    def test_should_not_share_catalogue_without_session(self):
+        profile_manager = SimpleNamespace(_stub=object())
+
+        self.assertIsNot(get_profile_catalogue(profile_manager),
+                         get_profile_catalogue(profile_manager))
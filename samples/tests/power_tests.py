@@ -0,0 +1,110 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+from pyVmomi import vim
+
+from samples.tools import power
+
+
+def vm(name, power_state, host='host-1'):
+    return Mock(name=name), name, power_state, vim.HostSystem(host)
+
+
+class CheckOperationTests(TestCase):
+
+    def test_should_accept_multi_for_power_on_only(self):
+        power.check_operation('on', multi=True)
+        power.check_operation('destroy')
+
+        for operation in ('off', 'destroy'):
+            with self.assertRaises(ValueError):
+                power.check_operation(operation, multi=True)
+
+    def test_should_reject_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            power.check_operation('suspend')
+
+
+class RunPowerOperationTests(TestCase):
+
+    @patch('samples.tools.power.tasks.run_throttled')
+    def test_should_skip_vms_in_target_state(self, run_throttled):
+        vms = [vm('web-01', 'poweredOn'), vm('web-02', 'poweredOff', 'host-2')]
+        run_throttled.return_value = [(str(vms[1][0]), 'success', None)]
+
+        results = list(power.run_power_operation(Mock(), vms, 'on', 8, max_per_host=2,
+                                                 max_per_second=5))
+
+        self.assertEqual([(r.vm_name, r.state) for r in results],
+                         [('web-01', 'skipped'), ('web-02', 'success')])
+        self.assertIs(results[1].vm, vms[1][0])
+        jobs = run_throttled.call_args[0][1]
+        self.assertEqual([(key, group) for key, _, group in jobs],
+                         [(str(vms[1][0]), "'vim.HostSystem:host-2'")])
+        self.assertEqual(run_throttled.call_args[1], {'max_per_group': 2, 'max_per_second': 5})
+
+    @patch('samples.tools.power.tasks.run_throttled')
+    def test_should_keep_results_of_vms_with_the_same_name(self, run_throttled):
+        vms = [vm('web', 'poweredOn'), vm('web', 'poweredOn')]
+        run_throttled.return_value = [(str(vms[1][0]), 'success', None),
+                                      (str(vms[0][0]), 'error', vim.fault.InvalidState())]
+
+        results = list(power.run_power_operation(Mock(), vms, 'off'))
+
+        self.assertEqual([(r.vm, r.state) for r in results],
+                         [(vms[1][0], 'success'), (vms[0][0], 'error')])
+
+    @patch('samples.tools.power.tasks.run_throttled')
+    def test_should_only_shutdown_running_guests(self, run_throttled):
+        running = vm('db-01', 'poweredOn')
+        run_throttled.return_value = [(str(running[0]), 'error', vim.fault.ToolsUnavailable())]
+
+        results = list(power.run_power_operation(
+            Mock(), [running, vm('db-02', 'suspended')], 'shutdown'))
+
+        self.assertEqual([(r.vm_name, r.state) for r in results],
+                         [('db-02', 'skipped'), ('db-01', 'error')])
+        self.assertIsInstance(results[1].error, vim.fault.ToolsUnavailable)
+        self.assertIs(run_throttled.call_args[0][1][0][1], running[0].ShutdownGuest)
+
+
+class PowerOnByDatacenterTests(TestCase):
+
+    def setUp(self):
+        self.datacenter = Mock()
+        self.vms = [vim.VirtualMachine('vm-%d' % i) for i in range(3)]
+        self.tasks = [vim.Task('task-%d' % i) for i in range(3)]
+
+    def run_throttled(self, si, jobs, max_in_flight):
+        # complete every job right away, PowerOnMultiVM_Task results come first
+        for key, start in jobs:
+            value = start()
+            if isinstance(value, vim.Task):
+                yield key, 'error' if value is self.tasks[1] else 'success', \
+                    vim.fault.InsufficientResourcesFault()
+            else:
+                yield key, 'success', value
+
+    @patch('samples.tools.power.tasks.run_throttled')
+    def test_should_batch_and_retry_failed_vms(self, run_throttled):
+        run_throttled.side_effect = self.run_throttled
+        self.datacenter.PowerOnMultiVM_Task.side_effect = [
+            vim.cluster.PowerOnVmResult(attempted=[
+                vim.cluster.AttemptedVmInfo(vm=self.vms[0], task=self.tasks[0]),
+                vim.cluster.AttemptedVmInfo(vm=self.vms[1], task=self.tasks[1])]),
+            vim.cluster.PowerOnVmResult(notAttempted=[
+                vim.cluster.NotAttemptedVmInfo(vm=self.vms[2], fault=vim.fault.NoHost())]),
+            vim.cluster.PowerOnVmResult(attempted=[
+                vim.cluster.AttemptedVmInfo(vm=self.vms[1], task=self.tasks[2]),
+                vim.cluster.AttemptedVmInfo(vm=self.vms[2], task=self.tasks[0])]),
+        ]
+        vms = {self.datacenter: [(vm, vm._moId, 'poweredOff', None) for vm in self.vms] +
+               [(vim.VirtualMachine('vm-9'), 'vm-9', 'poweredOn', None)]}
+
+        results = list(power.power_on_by_datacenter(Mock(), vms, batch_size=2, retries=1))
+
+        self.assertEqual(sorted((r.vm_name, r.state) for r in results),
+                         [('vm-0', 'success'), ('vm-1', 'success'), ('vm-2', 'success'),
+                          ('vm-9', 'skipped')])
+        batches = [c[0][0] for c in self.datacenter.PowerOnMultiVM_Task.call_args_list]
+        self.assertEqual(batches, [self.vms[:2], self.vms[2:], self.vms[1:]])
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from mock import Mock, patch
+from pyVmomi import vim
+
+from samples.tools.tasks import run_throttled
+
+
+def update_set(version, task, **changes):
+    change_set = [SimpleNamespace(name=name.replace('__', '.'), val=val)
+                  for name, val in changes.items()]
+    return SimpleNamespace(version=version, filterSet=[SimpleNamespace(
+        objectSet=[SimpleNamespace(obj=task, changeSet=change_set)])])
+
+
+class RunThrottledTests(TestCase):
+
+    def setUp(self):
+        self.si = Mock()
+        self.collector = self.si.content.propertyCollector.CreatePropertyCollector.return_value
+        self.tasks = [vim.Task('task-%d' % i) for i in range(3)]
+
+    def test_should_limit_tasks_in_flight(self):
+        started = []
+
+        def start(i):
+            def _start():
+                started.append(i)
+                return self.tasks[i]
+            return _start
+
+        def wait(version, _):
+            # two tasks are started before the first wait
+            self.assertEqual(len(started), {'': 2, '1': 3, '2': 3}[version])
+            return {
+                '': update_set('1', self.tasks[1], info__state='success', info__result='b'),
+                '1': update_set('2', self.tasks[0], info__state='error',
+                                info__error=vim.fault.InvalidState()),
+                '2': update_set('3', self.tasks[2], info__state='success', info__result='c'),
+            }[version]
+
+        self.collector.WaitForUpdatesEx.side_effect = wait
+
+        results = list(run_throttled(self.si, [(i, start(i)) for i in range(3)],
+                                     max_in_flight=2))
+
+        self.assertEqual([(key, state) for key, state, _ in results],
+                         [(1, 'success'), (0, 'error'), (2, 'success')])
+        self.assertIsInstance(results[1][2], vim.fault.InvalidState)
+        self.assertEqual(
+            self.collector.CreateFilter.return_value.DestroyPropertyFilter.call_count, 3)
+        self.collector.DestroyPropertyCollector.assert_called_once_with()
+
+    def test_should_report_start_faults(self):
+        def start():
+            raise vim.fault.InvalidPowerState()
+
+        results = list(run_throttled(self.si, [('vm', start)]))
+
+        self.assertEqual(results[0][:2], ('vm', 'error'))
+        self.collector.WaitForUpdatesEx.assert_not_called()
+
+    def test_should_limit_tasks_per_group(self):
+        started = []
+
+        def start(i):
+            def _start():
+                started.append(i)
+                return self.tasks[i]
+            return _start
+
+        def wait(version, _):
+            # task 1 waits for task 0 of the same host, task 2 starts right away
+            self.assertEqual(started, {'': [0, 2], '1': [0, 2, 1], '2': [0, 2, 1]}[version])
+            return {
+                '': update_set('1', self.tasks[0], info__state='success'),
+                '1': update_set('2', self.tasks[1], info__state='success'),
+                '2': update_set('3', self.tasks[2], info__state='success'),
+            }[version]
+
+        self.collector.WaitForUpdatesEx.side_effect = wait
+        jobs = [(0, start(0), 'host-1'), (1, start(1), 'host-1'), (2, start(2), 'host-2')]
+
+        results = list(run_throttled(self.si, jobs, max_in_flight=4, max_per_group=1))
+
+        self.assertEqual([key for key, _, _ in results], [0, 1, 2])
+
+    def test_should_report_operations_without_task(self):
+        results = list(run_throttled(self.si, [('vm', lambda: None)]))
+
+        self.assertEqual(results, [('vm', 'success', None)])
+
+    @patch('samples.tools.tasks.time')
+    def test_should_limit_tasks_started_per_second(self, time):
+        time.monotonic.side_effect = [10.0, 10.1, 10.5, 11.2, 11.2]
+        self.collector.WaitForUpdatesEx.side_effect = [
+            update_set('1', task, info__state='success') for task in self.tasks]
+
+        list(run_throttled(self.si, [(i, lambda i=i: self.tasks[i]) for i in range(3)],
+                           max_in_flight=4, max_per_second=2))
+
+        # the second task waits for the interval, the third one is already due
+        time.sleep.assert_called_once()
+        self.assertAlmostEqual(time.sleep.call_args[0][0], 0.4)
@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from samples.tools import host_service, vscsistats
+
+HISTOGRAMS = '''
+Histogram: Latency of IOs in Microseconds (us) for virtual machine worldGroupID : 12345, \
+virtual disk handleID : 8192 (scsi0:0) {
+ min : 90
+ max : 20000
+ mean : 900
+ count : {count}
+   {
+      {b1}               (<=                   100)
+      {b2}               (<=                  1000)
+      {b3}               (<=                 10000)
+      {b4}               (>                  10000)
+   }
+}
+Histogram: IO lengths of commands for virtual machine worldGroupID : 12345 {
+ min : 512
+ max : 4096
+ mean : 4000
+ count : 2
+   {
+      0                  (<=                   512)
+      2                  (>                    512)
+   }
+}
+'''
+
+
+def payload(*counts):
+    return HISTOGRAMS.replace('{count}', str(sum(counts))).replace(
+        '{b1}', str(counts[0])).replace('{b2}', str(counts[1])).replace(
+        '{b3}', str(counts[2])).replace('{b4}', str(counts[3]))
+
+
+class VscsiStatsTests(TestCase):
+
+    def setUp(self):
+        self.histograms = vscsistats.parse_histograms(payload(50, 40, 9, 1))
+        self.latency = self.histograms[(12345, 8192, 'Latency of IOs in Microseconds (us)')]
+
+    def test_should_parse_histograms_by_world_group_and_disk(self):
+        self.assertEqual(sorted(self.histograms, key=str),
+                         [(12345, 8192, 'Latency of IOs in Microseconds (us)'),
+                          (12345, None, 'IO lengths of commands')])
+        self.assertEqual(self.latency.device, 'scsi0:0')
+        self.assertEqual(list(self.latency.limits), [100, 1000, 10000])
+        self.assertEqual(list(self.latency.counts), [50, 40, 9, 1])
+        self.assertEqual(self.latency.stats['mean'], 900)
+
+    def test_should_compute_percentiles(self):
+        self.assertEqual(self.latency.percentile(50), 100)
+        self.assertEqual(self.latency.percentile(90), 1000)
+        self.assertEqual(self.latency.percentile(99), 10000)
+        self.assertEqual(self.latency.percentile(100), 10000)
+
+    def test_should_diff_snapshots(self):
+        later = vscsistats.parse_histograms(payload(50, 40, 29, 21))[self.latency.key]
+
+        delta = later.diff(self.latency)
+
+        self.assertEqual(list(delta.counts), [0, 0, 20, 20])
+        self.assertEqual(delta.total, 40)
+        self.assertEqual(delta.percentile(50), 10000)
+        self.assertIsNone(self.latency.diff(self.latency).percentile(50))
+
+
+class ServicesTests(TestCase):
+
+    def test_should_look_up_services_once(self):
+        service = Mock()
+        service.ExecuteSimpleCommand.return_value = payload(1, 0, 0, 0)
+        with patch.object(host_service, 'get_host_service',
+                          side_effect=lambda si, name, _: service if name == 'esx-01' else None
+                          ) as get_host_service:
+            services = vscsistats.get_services(Mock(), ['esx-01', 'esx-02'])
+            vscsistats.run_on_hosts(services, 'StartVscsiStats')
+            histograms = vscsistats.fetch_hosts(services)
+            vscsistats.run_on_hosts(services, 'StopVscsiStats')
+
+        self.assertEqual(get_host_service.call_count, 2)
+        self.assertEqual(service.ExecuteSimpleCommand.call_count, 3)
+        self.assertEqual(len(histograms['esx-01']), 2)
+        self.assertIsInstance(histograms['esx-02'], LookupError)
@@ -0,0 +1,203 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+asyncio front-end for PropertyCollector long-polling.
+
+pyVmomi calls are blocking, so every call is run on an executor. Each
+AsyncPropertyCollector owns a private PropertyCollector, which keeps its
+filters and update versions independent from any other collector on the same
+session. A collector that is waiting for updates occupies one executor thread
+for up to max_wait_seconds per WaitForUpdatesEx call, which is nearly all the
+time, so an executor shared by several collectors needs at least one thread
+per collector, plus threads for the other calls, or updates are starved.
+
+Sample Usage:
+
+    async with AsyncPropertyCollector(si) as collector:
+        await collector.create_filter(filter_spec)
+        async for obj, kind, changes in collector.changes():
+            print(obj, kind, changes)
+"""
+
+import asyncio
+import functools
+
+from pyVmomi import vim, vmodl
+
+__author__ = "VMware, Inc."
+
+TASK_PROPERTIES = ['info.state', 'info.result', 'info.error']
+
+
+class AsyncPropertyCollector:
+    """
+    Wraps a private PropertyCollector and exposes WaitForUpdatesEx as an
+    async iterator. Cancelling the consuming coroutine cancels the pending
+    server-side wait.
+    """
+
+    def __init__(self, si, executor=None, max_wait_seconds=30, max_object_updates=None):
+        """
+        si: The Service Instance
+        executor: concurrent.futures executor used for the blocking calls,
+                  the loop default executor is used when None. It needs a
+                  thread for every collector waiting on it at once
+        max_wait_seconds: upper bound for a single WaitForUpdatesEx call
+        max_object_updates: maximum number of object updates per batch
+        """
+        self.si = si
+        self.executor = executor
+        self.wait_options = vmodl.query.PropertyCollector.WaitOptions()
+        if max_wait_seconds is not None:
+            self.wait_options.maxWaitSeconds = max_wait_seconds
+        if max_object_updates is not None:
+            self.wait_options.maxObjectUpdates = max_object_updates
+        self.version = ''
+        self.pc = None
+        self.filters = []
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def open(self):
+        """ Create the private PropertyCollector """
+        if self.pc is None:
+            self.pc = await self._call(
+                self.si.content.propertyCollector.CreatePropertyCollector)
+            self.version = ''
+        return self
+
+    async def create_filter(self, filter_spec, partial_updates=True):
+        """
+        Register a filter spec with the collector and return the filter.
+        partial_updates: only report changed properties on 'modify'
+        """
+        await self.open()
+        pc_filter = await self._call(self.pc.CreateFilter, filter_spec, partial_updates)
+        self.filters.append(pc_filter)
+        return pc_filter
+
+    async def close(self):
+        """ Destroy the filters and the private PropertyCollector """
+        if self.pc is None:
+            return
+        pc, self.pc = self.pc, None
+        filters, self.filters = self.filters, []
+        for pc_filter in filters:
+            await self._call(pc_filter.DestroyPropertyFilter)
+        await self._call(pc.DestroyPropertyCollector)
+
+    async def updates(self):
+        """
+        Async generator of vmodl.query.PropertyCollector.UpdateSet objects.
+        Timed out waits are retried transparently.
+        """
+        await self.open()
+        while True:
+            try:
+                result = await self._call(self.pc.WaitForUpdatesEx, self.version,
+                                          self.wait_options)
+            except asyncio.CancelledError:
+                # the executor thread is still blocked in WaitForUpdatesEx,
+                # release it before propagating the cancellation
+                await self._cancel_wait()
+                raise
+            if result is None:
+                continue
+            self.version = result.version
+            yield result
+
+    async def changes(self):
+        """
+        Async generator of (obj, kind, changes) tuples where changes is a
+        dict of property path to value. 'leave' updates carry an empty dict.
+        """
+        async for result in self.updates():
+            for filter_set in result.filterSet:
+                for obj_update in filter_set.objectSet:
+                    yield (obj_update.obj, obj_update.kind,
+                           {change.name: change.val for change in obj_update.changeSet
+                            if change.op != 'remove'})
+
+    async def _cancel_wait(self):
+        pc = self.pc
+        if pc is None:
+            return
+        try:
+            await asyncio.shield(self._call(pc.CancelWaitForUpdates))
+        except vmodl.MethodFault:
+            pass
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+def create_task_filter_spec(tasks):
+    """
+    Create a filter spec that watches the state, result and error of tasks.
+    """
+    obj_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=task) for task in tasks]
+    property_spec = vmodl.query.PropertyCollector.PropertySpec(type=vim.Task,
+                                                               pathSet=TASK_PROPERTIES,
+                                                               all=False)
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec()
+    filter_spec.objectSet = obj_specs
+    filter_spec.propSet = [property_spec]
+    return filter_spec
+
+
+async def wait_for_tasks(si, tasks, executor=None, max_wait_seconds=30):
+    """
+    Await completion of all tasks. Returns the list of task results in the
+    order of tasks and raises the fault of the first task that fails.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    pending = {task._GetMoId(): task for task in tasks}  # pylint: disable=W0212
+    results = {}
+    infos = {moid: {} for moid in pending}
+
+    async with AsyncPropertyCollector(si, executor, max_wait_seconds) as collector:
+        await collector.create_filter(create_task_filter_spec(tasks))
+        async for obj, _, changes in collector.changes():
+            moid = obj._GetMoId()  # pylint: disable=W0212
+            if moid not in pending:
+                continue
+            info = infos[moid]
+            info.update(changes)
+            state = info.get('info.state')
+            if state == vim.TaskInfo.State.success:
+                results[moid] = info.get('info.result')
+                del pending[moid]
+            elif state == vim.TaskInfo.State.error:
+                raise info.get('info.error') or RuntimeError('Task %s failed' % moid)
+            if not pending:
+                break
+
+    return [results[task._GetMoId()] for task in tasks]  # pylint: disable=W0212
+
+
+async def wait_for_task(si, task, executor=None, max_wait_seconds=30):
+    """
+    Await completion of a single task and return its result.
+    """
+    results = await wait_for_tasks(si, [task], executor, max_wait_seconds)
+    return results[0]
@@ -382,6 +382,12 @@ class Argument:
         'name_or_flags': ['--ssl-cert'],
         'options': {'action': 'store', 'help': 'absolute location of the certificate file'}
     }
+    OUTPUT = {
+        'name_or_flags': ['--output'],
+        'options': {'action': 'store', 'default': 'table',
+                    'choices': ['table', 'csv', 'jsonl', 'ndjson'],
+                    'help': 'Output format, ndjson flushes every record for piping'}
+    }
 
 
 def prompt_y_n_question(question, default="no"):
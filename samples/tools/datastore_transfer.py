@@ -0,0 +1,330 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements helper functions for moving files between the local
+machine and datastores through the vCenter /folder HTTP interface.
+
+Transfers are streamed with large buffers over one pooled requests.Session
+that reuses the vCenter session cookie. Directory trees are synchronized
+concurrently and files whose size and modification time already match those
+reported by the HostDatastoreBrowser are skipped.
+"""
+
+import calendar
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from pyVmomi import vim, vmodl
+
+from . import pchelper, tasks
+
+__author__ = "VMware, Inc."
+
+BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class DatastoreLocation:
+    """
+    A datastore together with what is needed to address it over HTTP.
+    """
+    def __init__(self, datastore, name, datacenter, datacenter_name, browser):
+        self.datastore = datastore
+        self.name = name
+        self.datacenter = datacenter
+        self.datacenter_name = datacenter_name
+        self.browser = browser
+
+
+class FileTransfer:
+    """
+    Outcome of the transfer of a single file.
+    """
+    def __init__(self, datastore_name, local_path, remote_path, size=0, skipped=False,
+                 error=None):
+        """
+        datastore_name: The name of the datastore
+        local_path: Path of the file on the local machine
+        remote_path: Path of the file relative to the datastore root
+        size: Number of bytes transferred
+        skipped: True when the file was already up to date
+        error: Error message when the transfer failed
+        """
+        self.datastore_name = datastore_name
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.size = size
+        self.skipped = skipped
+        self.error = error
+
+
+class _BufferedReader:
+    """
+    File wrapper that hands buffer_size bytes to the HTTP layer on every read,
+    whatever block size it asks for, so large files go out in large writes.
+    """
+    def __init__(self, file_obj, size, buffer_size):
+        self._file = file_obj
+        self._size = size
+        self._buffer_size = buffer_size
+
+    def __len__(self):
+        return self._size
+
+    def read(self, _=-1):
+        return self._file.read(self._buffer_size)
+
+
+def locate_datastores(si, names, datacenter_name=None):
+    """
+    Resolve datastore names to DatastoreLocation objects with two property
+    collector calls, one for the datacenters and one for the datastores.
+    datacenter_name limits the lookup to one datacenter. Raises RuntimeError
+    for names that do not exist or that exist in several datacenters.
+    """
+    dc_view = pchelper.get_container_view(si, obj_type=[vim.Datacenter])
+    ds_view = pchelper.get_container_view(si, obj_type=[vim.Datastore])
+    try:
+        dc_data = pchelper.collect_properties(si, view_ref=dc_view, obj_type=vim.Datacenter,
+                                              path_set=['name', 'datastore'], include_mors=True)
+        ds_data = pchelper.collect_properties(si, view_ref=ds_view, obj_type=vim.Datastore,
+                                              path_set=['name', 'browser'], include_mors=True)
+    finally:
+        dc_view.Destroy()
+        ds_view.Destroy()
+
+    datacenters = {}
+    for props in dc_data:
+        if datacenter_name is not None and props['name'] != datacenter_name:
+            continue
+        for datastore in props.get('datastore', []):
+            datacenters[datastore] = (props['obj'], props['name'])
+
+    # names are only unique within a datacenter
+    locations = {}
+    for props in ds_data:
+        if props['name'] in names and props['obj'] in datacenters:
+            datacenter, dc_name = datacenters[props['obj']]
+            locations.setdefault(props['name'], {})[dc_name] = DatastoreLocation(
+                props['obj'], props['name'], datacenter, dc_name, props['browser'])
+
+    missing = [name for name in names if name not in locations]
+    if missing:
+        raise RuntimeError("Datastores not found: " + ", ".join(missing))
+    ambiguous = ["%s (%s)" % (name, ", ".join(sorted(locations[name])))
+                 for name in names if len(locations[name]) > 1]
+    if ambiguous:
+        raise RuntimeError("Datastores found in several datacenters, select one with "
+                           "the datacenter name: " + "; ".join(ambiguous))
+    return [list(locations[name].values())[0] for name in names]
+
+
+def create_session(si, pool_size=16, verify=True):
+    """
+    Create a requests.Session authenticated with the vCenter session cookie
+    whose connection pool can serve pool_size concurrent transfers.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.verify = verify
+    # vmware_soap_session="..."; Path=/; HttpOnly; Secure;
+    session.headers['Cookie'] = si._stub.cookie.split(';', 1)[0]  # pylint: disable=W0212
+    return session
+
+
+def datastore_url(host, location, remote_path, port=443):
+    """
+    Return the URL and query parameters addressing remote_path on location.
+    """
+    url = "https://%s:%d/folder/%s" % (host, port, remote_path.lstrip('/'))
+    params = {"dsName": location.name, "dcPath": location.datacenter_name}
+    return url, params
+
+
+def upload_file(session, url, params, local_path, buffer_size=BUFFER_SIZE):
+    """
+    Stream local_path to the datastore URL. Returns the number of bytes sent.
+    """
+    size = os.path.getsize(local_path)
+    headers = {'Content-Type': 'application/octet-stream'}
+    with open(local_path, 'rb') as local_file:
+        resp = session.put(url, params=params, headers=headers,
+                           data=_BufferedReader(local_file, size, buffer_size))
+    resp.raise_for_status()
+    return size
+
+
+def download_file(session, url, params, local_path, buffer_size=BUFFER_SIZE, mtime=None):
+    """
+    Stream the datastore URL into local_path. When mtime is given it is set
+    as the modification time of the local file, so a later sync sees both
+    sides as equal. Returns the number of bytes received.
+    """
+    size = 0
+    with session.get(url, params=params, stream=True) as resp:
+        resp.raise_for_status()
+        with open(local_path, 'wb') as local_file:
+            for chunk in resp.iter_content(chunk_size=buffer_size):
+                local_file.write(chunk)
+                size += len(chunk)
+    if mtime is not None:
+        os.utime(local_path, (mtime, mtime))
+    return size
+
+
+def list_remote_files(si, location, remote_dir):
+    """
+    Return a map of path relative to remote_dir to (size, mtime) for every
+    file below remote_dir, using one SearchDatastoreSubFolders_Task call.
+    A missing remote_dir yields an empty map.
+    """
+    root = "[%s] %s" % (location.name, remote_dir.strip('/'))
+    search_spec = vim.host.DatastoreBrowser.SearchSpec()
+    search_spec.details = vim.host.DatastoreBrowser.FileInfo.Details(
+        fileSize=True, modification=True, fileType=True)
+    task = location.browser.SearchDatastoreSubFolders_Task(root, search_spec)
+    try:
+        tasks.wait_for_tasks(si, [task])
+    except vim.fault.FileNotFound:
+        return {}
+
+    files = {}
+    base = remote_dir.strip('/')
+    for folder in task.info.result:
+        # folderPath looks like '[datastore1] iso/linux/'
+        folder_path = folder.folderPath.split(']', 1)[1].strip().strip('/')
+        relative_dir = folder_path[len(base):].strip('/')
+        if relative_dir:
+            relative_dir += '/'
+        for file_info in folder.file:
+            if isinstance(file_info, vim.host.DatastoreBrowser.FolderInfo):
+                continue
+            mtime = None
+            if file_info.modification is not None:
+                mtime = calendar.timegm(file_info.modification.utctimetuple())
+            files[relative_dir + file_info.path] = (file_info.fileSize, mtime)
+    return files
+
+
+def list_local_files(local_dir):
+    """
+    Return a map of '/' separated path relative to local_dir to (size, mtime).
+    """
+    files = {}
+    for dirpath, _, filenames in os.walk(local_dir):
+        relative = os.path.relpath(dirpath, local_dir)
+        for filename in filenames:
+            stat = os.stat(os.path.join(dirpath, filename))
+            path = filename if relative == '.' else \
+                posixpath.join(*(relative.split(os.sep) + [filename]))
+            files[path] = (stat.st_size, int(stat.st_mtime))
+    return files
+
+
+def is_up_to_date(source, target):
+    """
+    source and target are (size, mtime) tuples or None. The target is up to
+    date when the sizes match and it is not older than the source.
+    """
+    if source is None or target is None or source[0] != target[0]:
+        return False
+    return target[1] is not None and source[1] is not None and target[1] >= source[1]
+
+
+def make_remote_dirs(si, location, remote_dirs):
+    """
+    Create the datastore directories, including parents.
+    """
+    file_manager = si.content.fileManager
+    for remote_dir in sorted(set(remote_dirs)):
+        try:
+            file_manager.MakeDirectory("[%s] %s" % (location.name, remote_dir),
+                                       location.datacenter, True)
+        except vim.fault.FileAlreadyExists:
+            pass
+
+
+def _transfer(session, host, location, local_path, remote_path, download, mtime, buffer_size):
+    result = FileTransfer(location.name, local_path, remote_path)
+    url, params = datastore_url(host, location, remote_path)
+    try:
+        if download:
+            result.size = download_file(session, url, params, local_path, buffer_size, mtime)
+        else:
+            result.size = upload_file(session, url, params, local_path, buffer_size)
+    except (IOError, requests.RequestException) as error:
+        result.error = str(error)
+    return result
+
+
+def sync_tree(si, host, locations, local_dir, remote_dir, download=False, workers=8,
+              verify=True, buffer_size=BUFFER_SIZE):
+    """
+    Synchronize local_dir with remote_dir on every location in one pool of
+    workers. Uploads go to all locations; downloads read from the first one.
+    Returns a list of FileTransfer, including the skipped files.
+    """
+    results = []
+    jobs = []
+    if download:
+        locations = locations[:1]
+    local_files = list_local_files(local_dir) if os.path.isdir(local_dir) else {}
+
+    for location in locations:
+        try:
+            remote_files = list_remote_files(si, location, remote_dir)
+        except vmodl.MethodFault as error:
+            results.append(FileTransfer(location.name, local_dir, remote_dir,
+                                        error=error.msg or error.__class__.__name__))
+            continue
+        source, target = (remote_files, local_files) if download else \
+            (local_files, remote_files)
+        pending = []
+        for path, source_stat in sorted(source.items()):
+            local_path = os.path.join(local_dir, *path.split('/'))
+            remote_path = posixpath.join(remote_dir.strip('/'), path)
+            if is_up_to_date(source_stat, target.get(path)):
+                results.append(FileTransfer(location.name, local_path, remote_path,
+                                            skipped=True))
+                continue
+            pending.append((location, local_path, remote_path, source_stat[1]))
+
+        if download:
+            for directory in {os.path.dirname(job[1]) for job in pending}:
+                os.makedirs(directory, exist_ok=True)
+        elif pending:
+            try:
+                make_remote_dirs(si, location,
+                                 [posixpath.dirname(job[2]) for job in pending])
+            except vmodl.MethodFault as error:
+                results.extend(FileTransfer(location.name, job[1], job[2],
+                                            error=error.msg or error.__class__.__name__)
+                               for job in pending)
+                continue
+        jobs.extend(pending)
+
+    session = create_session(si, workers, verify)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_transfer, session, host, location, local_path,
+                                       remote_path, download, mtime, buffer_size)
+                       for location, local_path, remote_path, mtime in jobs]
+            results.extend(future.result() for future in futures)
+    finally:
+        session.close()
+    return results
@@ -0,0 +1,207 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements a collector for the Esxtop service of vCenter
+Server's Service Manager.
+
+The "CounterInfo" command returns the schema of every esxtop counter, one
+line per counter listing its fields and their types:
+
+    |PCPU|NumOfLCPUs,U32|NumOfCores,U32|...|
+
+"FetchStats" returns one line per counter instance in the same order:
+
+    |PCPU|8|4|...|
+
+EsxtopCollector asks for the schema once per host and parses every
+FetchStats snapshot into one Frame per counter, a set of typed columns.
+The columns are NumPy arrays when NumPy is installed and lists otherwise.
+
+Sample Usage:
+
+    collectors = collect_schemas(si, host_names)
+    for timestamp, snapshots in sample_hosts(collectors, samples=3, interval=5):
+        for host_name, frames in snapshots.items():
+            print(host_name, frames['PCPU'].columns)
+"""
+
+import time
+
+from . import host_service
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__author__ = "VMware, Inc."
+
+_INTEGER_TYPES = ('U8', 'U16', 'U32', 'U64', 'S8', 'S16', 'S32', 'S64', 'I32', 'I64')
+_FLOAT_TYPES = ('F32', 'F64', 'D')
+
+
+def _split(line):
+    line = line.strip()
+    if not line.startswith('|'):
+        return None
+    return line.strip('|').split('|')
+
+
+def parse_counter_info(payload):
+    """
+    Parse the CounterInfo payload into a dict of counter name to a list of
+    (field name, type) tuples
+    """
+    schema = {}
+    for line in payload.splitlines():
+        parts = _split(line)
+        if not parts:
+            continue
+        fields = []
+        for field in parts[1:]:
+            name, _, field_type = field.partition(',')
+            fields.append((name, field_type.upper()))
+        schema[parts[0]] = fields
+    return schema
+
+
+def _convert(value, field_type):
+    try:
+        if field_type in _INTEGER_TYPES:
+            return int(value)
+        if field_type in _FLOAT_TYPES:
+            return float(value)
+    except ValueError:
+        pass
+    return value
+
+
+def _column(values, field_type):
+    if numpy is None:
+        return values
+    dtype = object
+    if field_type in _INTEGER_TYPES:
+        dtype = numpy.int64
+    elif field_type in _FLOAT_TYPES:
+        dtype = numpy.float64
+    try:
+        return numpy.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return numpy.array(values, dtype=object)
+
+
+class Frame:
+    """
+    The instances of one counter in one snapshot, stored column wise
+    """
+
+    def __init__(self, counter, fields, rows):
+        self.counter = counter
+        self.fields = fields
+        self.columns = {name: _column([row[i] for row in rows], field_type)
+                        for i, (name, field_type) in enumerate(fields)}
+        self.rows = len(rows)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+def parse_stats(payload, schema):
+    """
+    Parse a FetchStats payload into a dict of counter name to Frame. Lines of
+    counters missing from the schema are ignored.
+    """
+    rows = {}
+    for line in payload.splitlines():
+        parts = _split(line)
+        if not parts or parts[0] not in schema:
+            continue
+        fields = schema[parts[0]]
+        values = parts[1:len(fields) + 1]
+        values += [None] * (len(fields) - len(values))
+        rows.setdefault(parts[0], []).append(
+            [_convert(value, field_type) if value is not None else None
+             for value, (_, field_type) in zip(values, fields)])
+    return {counter: Frame(counter, schema[counter], counter_rows)
+            for counter, counter_rows in rows.items()}
+
+
+class EsxtopCollector:
+    """
+    Esxtop snapshots of one host. The counter schema is fetched with the
+    first snapshot and reused afterwards.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self._schema = None
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            self._schema = parse_counter_info(
+                self.service.ExecuteSimpleCommand(arguments=['CounterInfo']))
+        return self._schema
+
+    def snapshot(self):
+        """ Fetch and parse one snapshot of all counters """
+        schema = self.schema
+        return parse_stats(self.service.ExecuteSimpleCommand(arguments=['FetchStats']), schema)
+
+    def close(self):
+        """ Free the statistics the service keeps for this session """
+        self.service.ExecuteSimpleCommand(arguments=['FreeStats'])
+
+
+def collect_schemas(si, host_names, workers=8, errors=None):
+    """
+    Create an EsxtopCollector for every host providing the Esxtop service and
+    fetch the counter schemas concurrently. Return a dict of host name to
+    collector; hosts without the service or failing are left out, and their
+    exception is stored in the errors dict when one is given.
+    """
+    def create(host_name):
+        service = host_service.get_host_service(si, host_name, 'Esxtop')
+        if service is None:
+            raise LookupError('Esxtop service not found on ' + host_name)
+        collector = EsxtopCollector(service)
+        collector.schema  # pylint: disable=pointless-statement
+        return collector
+
+    collectors = {}
+    for host_name, collector in host_service.map_hosts(create, host_names, workers).items():
+        if isinstance(collector, EsxtopCollector):
+            collectors[host_name] = collector
+        elif errors is not None:
+            errors[host_name] = collector
+    return collectors
+
+
+def sample_hosts(collectors, samples=1, interval=5, workers=8):
+    """
+    Take samples snapshots of all hosts, interval seconds apart, fetching
+    the hosts concurrently. Yield (timestamp, {host name: {counter: Frame}})
+    per sample; a host whose snapshot failed maps to the exception.
+    """
+    for sample in range(samples):
+        if sample:
+            time.sleep(interval)
+        timestamp = time.time()
+        yield timestamp, host_service.map_hosts(
+            lambda host_name: collectors[host_name].snapshot(), list(collectors), workers)
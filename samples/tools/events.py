@@ -0,0 +1,73 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements helper functions for reading the event history.
+
+EventManager.QueryEvent returns at most 1000 events. The functions below page
+through an EventHistoryCollector instead, so the whole history matching a
+filter can be read, and optionally keep following new events.
+"""
+
+import time
+
+from pyVmomi import vim
+
+__author__ = "VMware, Inc."
+
+MAX_PAGE_SIZE = 1000
+
+
+def time_filter(begin_time=None, end_time=None):
+    """
+    Return a vim.event.EventFilterSpec.ByTime for the given datetimes, or
+    None when both are None.
+    """
+    if begin_time is None and end_time is None:
+        return None
+    return vim.event.EventFilterSpec.ByTime(beginTime=begin_time, endTime=end_time)
+
+
+def read_events(si, filter_spec, page_size=100, tail=False, poll_interval=5):
+    """
+    Generator of the events matching filter_spec, oldest first, read in pages
+    of page_size events through ReadNextEvents.
+
+    With tail=True the generator does not stop at the end of the history but
+    polls for new events every poll_interval seconds until the caller stops
+    iterating. The collector is destroyed when the generator is exhausted or
+    closed, as the server limits the number of collectors per session.
+
+    Sample Usage:
+
+    filter_spec = vim.event.EventFilterSpec(time=time_filter(begin_time))
+    for event in read_events(si, filter_spec, page_size=500):
+        print(event.fullFormattedMessage)
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    collector = si.content.eventManager.CreateCollectorForEvents(filter_spec)
+    try:
+        collector.RewindCollector()
+        while True:
+            events = collector.ReadNextEvents(page_size)
+            if events:
+                for event in events:
+                    yield event
+                continue
+            if not tail:
+                break
+            time.sleep(poll_interval)
+    finally:
+        collector.DestroyCollector()
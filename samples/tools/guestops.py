@@ -0,0 +1,337 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements helper functions for running guest operations on many
+virtual machines at once.
+"""
+
+import http.client
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from pyVmomi import vim, vmodl
+
+from . import name_index
+
+__author__ = "VMware, Inc."
+
+# raised by the SOAP and HTTP calls when the connection to a host fails
+CONNECTION_ERRORS = (OSError, http.client.HTTPException)
+
+
+class ProgramResult:
+    """
+    Outcome of running one or more programs in the guest of a single VM.
+    """
+    def __init__(self, vm_name, pids=None, exit_codes=None, error=None):
+        """
+        vm_name: The name of the VM
+        pids: The PIDs of the started programs, in ProgramSpec order
+        exit_codes: A map of PID to exit code, None for programs still running
+        error: Error message when the VM could not be processed
+        """
+        self.vm_name = vm_name
+        self.pids = pids or []
+        self.exit_codes = exit_codes or {}
+        self.error = error
+
+    @property
+    def succeeded(self):
+        """ True when every program exited with 0 """
+        return (self.error is None and bool(self.pids) and
+                all(self.exit_codes.get(pid) == 0 for pid in self.pids))
+
+
+class TransferResult:
+    """
+    Outcome of a single guest file transfer.
+    """
+    def __init__(self, vm_name, local_path, guest_path, size=0, error=None):
+        """
+        vm_name: The name of the VM
+        local_path: Path of the file on the local machine
+        guest_path: Path of the file in the guest
+        size: Number of bytes transferred
+        error: Error message when the transfer failed
+        """
+        self.vm_name = vm_name
+        self.local_path = local_path
+        self.guest_path = guest_path
+        self.size = size
+        self.error = error
+
+
+def read_vm_list(path):
+    """
+    Read VM names from a file, one name per line
+    """
+    with open(path) as vm_list:
+        return [line.strip() for line in vm_list if line.strip()]
+
+
+def select_vms(si, names=None, pattern=None):
+    """
+    Collect VM names and guest tools status in one property collector call and
+    return a list of (vm, name, tools_running_status) for the VMs that match
+    the exact names or the glob pattern.
+    """
+    index = name_index.NameIndex.from_inventory(si, vim.VirtualMachine,
+                                                ['guest.toolsRunningStatus'])
+    records = {}
+    for name in names or []:
+        for record in index.exact(name):
+            records[record['obj']] = record
+    if pattern:
+        for record in index.glob(pattern):
+            records[record['obj']] = record
+    return [(record['obj'], record['name'], record.get('guest.toolsRunningStatus'))
+            for record in records.values()]
+
+
+def backoff_intervals(initial=0.5, maximum=10.0, factor=1.5):
+    """
+    Generator of polling intervals growing geometrically up to maximum.
+    """
+    interval = initial
+    while True:
+        yield interval
+        interval = min(interval * factor, maximum)
+
+
+def run_programs(process_manager, vm, vm_name, creds, program_specs,
+                 timeout=600, initial_interval=0.5, max_interval=10.0):
+    """
+    Start every ProgramSpec in the guest of vm and wait for all of them.
+    Each poll is one ListProcessesInGuest call covering all the started PIDs.
+    Returns a ProgramResult; programs still running at timeout have no exit code.
+    """
+    result = ProgramResult(vm_name)
+    try:
+        for program_spec in program_specs:
+            result.pids.append(process_manager.StartProgramInGuest(vm, creds, program_spec))
+
+        deadline = time.time() + timeout
+        pending = list(result.pids)
+        for interval in backoff_intervals(initial_interval, max_interval):
+            for process in process_manager.ListProcessesInGuest(vm, creds, pending):
+                if process.endTime is not None:
+                    result.exit_codes[process.pid] = process.exitCode
+            pending = [pid for pid in pending if pid not in result.exit_codes]
+            if not pending or time.time() >= deadline:
+                break
+            time.sleep(min(interval, max(deadline - time.time(), 0)))
+    except vmodl.MethodFault as error:
+        result.error = error.msg or error.__class__.__name__
+    except CONNECTION_ERRORS as error:
+        result.error = str(error) or error.__class__.__name__
+    return result
+
+
+def run_programs_on_vms(si, vms, creds, program_specs, workers=16, **kwargs):
+    """
+    Run the same ProgramSpecs on every (vm, name, tools_running_status) in vms
+    using a pool of worker threads. Extra keyword arguments are passed to
+    run_programs. Returns a list of ProgramResult.
+    """
+    process_manager = si.content.guestOperationsManager.processManager
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for vm, name, tools_status in vms:
+            if tools_status != 'guestToolsRunning':
+                results.append(ProgramResult(name, error='VMware Tools not running'))
+                continue
+            futures.append(executor.submit(run_programs, process_manager, vm, name, creds,
+                                           program_specs, **kwargs))
+        for future in futures:
+            results.append(future.result())
+    return results
+
+
+def summarize(results):
+    """
+    Aggregate results into a map of outcome to sorted VM names. The outcome is
+    the exit code tuple of the programs, 'running' on timeout or the error.
+    """
+    report = {}
+    for result in results:
+        if result.error is not None:
+            outcome = result.error
+        elif any(result.exit_codes.get(pid) is None for pid in result.pids):
+            outcome = 'running'
+        else:
+            outcome = tuple(result.exit_codes[pid] for pid in result.pids)
+        report.setdefault(outcome, []).append(result.vm_name)
+    for vm_names in report.values():
+        vm_names.sort()
+    return report
+
+
+def create_session(pool_size=16, verify=True):
+    """
+    Create a requests.Session whose connection pool can serve pool_size
+    concurrent transfers.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.verify = verify
+    return session
+
+
+def fix_transfer_url(url, host):
+    """
+    The guest file transfer URL may use '*' as host, e.g. https://*:443/guestFile?
+    Replace it with the host we are connected to.
+    """
+    return re.sub(r"^https://\*:", "https://" + str(host) + ":", url)
+
+
+def join_guest_path(guest_dir, *parts):
+    """
+    Join path parts with the separator already used in guest_dir, so that
+    Windows guests get backslashes.
+    """
+    separator = '\\' if '\\' in guest_dir else '/'
+    return separator.join([guest_dir.rstrip('/\\')] + list(parts))
+
+
+def upload_file(file_manager, session, vm, creds, local_path, guest_path, host,
+                overwrite=True):
+    """
+    Stream local_path to guest_path. The file is sent from the open file
+    object, so it is never loaded into memory. Returns the number of bytes sent.
+    """
+    size = os.path.getsize(local_path)
+    url = file_manager.InitiateFileTransferToGuest(vm, creds, guest_path,
+                                                   vim.vm.guest.FileManager.FileAttributes(),
+                                                   size, overwrite)
+    with open(local_path, 'rb') as local_file:
+        resp = session.put(fix_transfer_url(url, host), data=local_file)
+    resp.raise_for_status()
+    return size
+
+
+def download_file(file_manager, session, vm, creds, guest_path, local_path, host,
+                  chunk_size=1024 * 1024):
+    """
+    Stream guest_path into local_path in chunk_size pieces. Returns the number
+    of bytes received.
+    """
+    transfer_info = file_manager.InitiateFileTransferFromGuest(vm, creds, guest_path)
+    size = 0
+    with session.get(fix_transfer_url(transfer_info.url, host), stream=True) as resp:
+        resp.raise_for_status()
+        with open(local_path, 'wb') as local_file:
+            for chunk in resp.iter_content(chunk_size=chunk_size):
+                local_file.write(chunk)
+                size += len(chunk)
+    return size
+
+
+def expand_local_paths(local_paths, guest_dir):
+    """
+    Map local files and directory trees to (local_path, guest_path) pairs
+    below guest_dir. Directories are walked recursively and their layout is
+    kept in the guest.
+    """
+    pairs = []
+    for local_path in local_paths:
+        if not os.path.isdir(local_path):
+            pairs.append((local_path, join_guest_path(guest_dir, os.path.basename(local_path))))
+            continue
+        root_name = os.path.basename(os.path.normpath(local_path))
+        for dirpath, _, filenames in os.walk(local_path):
+            relative = os.path.relpath(dirpath, local_path)
+            parts = [root_name] + ([] if relative == '.' else relative.split(os.sep))
+            for filename in sorted(filenames):
+                pairs.append((os.path.join(dirpath, filename),
+                              join_guest_path(guest_dir, *(parts + [filename]))))
+    return pairs
+
+
+def _guest_dirs(pairs):
+    dirs = set()
+    for _, guest_path in pairs:
+        separator = '\\' if '\\' in guest_path else '/'
+        dirs.add(guest_path.rsplit(separator, 1)[0])
+    return sorted(dirs)
+
+
+def _transfer_vm(file_manager, session, vm, vm_name, creds, pairs, host, download):
+    results = []
+    if not download:
+        for guest_dir in _guest_dirs(pairs):
+            try:
+                file_manager.MakeDirectoryInGuest(vm, creds, guest_dir, True)
+            except vim.fault.FileAlreadyExists:
+                pass
+            except (vmodl.MethodFault,) + CONNECTION_ERRORS as error:
+                message = getattr(error, 'msg', None) or str(error) or error.__class__.__name__
+                return [TransferResult(vm_name, local_path, guest_path, error=message)
+                        for local_path, guest_path in pairs]
+    for local_path, guest_path in pairs:
+        result = TransferResult(vm_name, local_path, guest_path)
+        try:
+            if download:
+                result.size = download_file(file_manager, session, vm, creds, guest_path,
+                                            local_path, host)
+            else:
+                result.size = upload_file(file_manager, session, vm, creds, local_path,
+                                          guest_path, host)
+        except vmodl.MethodFault as error:
+            result.error = error.msg or error.__class__.__name__
+        except (requests.RequestException,) + CONNECTION_ERRORS as error:
+            result.error = str(error) or error.__class__.__name__
+        results.append(result)
+    return results
+
+
+def transfer_to_vms(si, vms, creds, pairs, host, workers=16, verify=True, download=False):
+    """
+    Transfer the (local_path, guest_path) pairs for every
+    (vm, name, tools_running_status) in vms. Transfers of different VMs run
+    concurrently over one pooled requests.Session; the files of one VM are
+    sent sequentially. With download=True the guest files are fetched and
+    local_path is used as a prefix, suffixed with the VM name.
+    Returns a list of TransferResult.
+    """
+    file_manager = si.content.guestOperationsManager.fileManager
+    session = create_session(workers, verify)
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for vm, name, tools_status in vms:
+                if tools_status != 'guestToolsRunning':
+                    results.extend(TransferResult(name, local_path, guest_path,
+                                                  error='VMware Tools not running')
+                                   for local_path, guest_path in pairs)
+                    continue
+                vm_pairs = pairs
+                if download and len(vms) > 1:
+                    vm_pairs = [('%s.%s' % (local_path, name), guest_path)
+                                for local_path, guest_path in pairs]
+                futures.append(executor.submit(_transfer_vm, file_manager, session, vm, name,
+                                               creds, vm_pairs, host, download))
+            for future in futures:
+                results.extend(future.result())
+    finally:
+        session.close()
+    return results
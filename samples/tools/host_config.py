@@ -0,0 +1,234 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements a rollout of ESXi advanced settings to many hosts.
+
+read_options finds the hosts below a container and their option managers
+with one property collector call. Given the setting keys it then queries
+only those settings of every host with OptionManager.QueryOptions in a
+worker pool, one call per host and key prefix, e.g. "VSAN.", so a host
+costs as many calls as the keys have distinct prefixes. Hosts whose query
+fails are returned with the fault instead of their settings. Without keys
+it reads the full settings of the option managers in pages with
+RetrievePropertiesEx. plan_changes computes the settings that differ per
+host and rollout applies them, canary hosts first and the remaining hosts
+concurrently.
+
+Sample Usage:
+
+    hosts = read_options(si, cluster, ['VSAN.ClomRepairDelay'])
+    plans = plan_changes(hosts, {'VSAN.ClomRepairDelay': '120'})
+    for result in rollout(plans, parallelism=16, canary=1):
+        print(result.host_name, result.changes, result.error)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pyVmomi import vim, vmodl
+
+from . import pchelper
+
+__author__ = "VMware, Inc."
+
+
+class HostOptions:
+    """
+    The advanced settings of one host.
+    """
+    def __init__(self, host, name, option_manager, values, error=None):
+        """
+        host: The HostSystem
+        name: The name of the host
+        option_manager: The OptionManager of the host
+        values: A map of setting key to current value
+        error: The fault raised while reading the settings, values is empty
+               then
+        """
+        self.host = host
+        self.name = name
+        self.option_manager = option_manager
+        self.values = values
+        self.error = error
+
+
+class RolloutResult:
+    """
+    Outcome of applying the changes of one host.
+    """
+    def __init__(self, host_name, changes, error=None):
+        """
+        host_name: The name of the host
+        changes: The OptionValues applied, or planned when not applied
+        error: The fault raised by UpdateOptions, or the reason the host was
+               not updated
+        """
+        self.host_name = host_name
+        self.changes = changes
+        self.error = error
+
+
+def _query_names(keys):
+    """
+    The names to pass to QueryOptions for keys: keys sharing the part before
+    their first dot are queried with that prefix and a trailing dot, which
+    returns the whole subtree; other keys are queried by their name
+    """
+    groups = {}
+    for key in sorted(keys):
+        prefix = key.split('.', 1)[0] + '.' if '.' in key else key
+        groups.setdefault(prefix, []).append(key)
+    return [prefix if len(group) > 1 else group[0] for prefix, group in groups.items()]
+
+
+def _query_options(option_manager, keys):
+    """
+    Query the given settings of one option manager; settings the host does
+    not have are left out. Returns (values, None), or ({}, fault) when a
+    query fails.
+    """
+    keys = set(keys)
+    values = {}
+    try:
+        for name in _query_names(keys):
+            try:
+                for option in option_manager.QueryOptions(name=name) or []:
+                    if option.key in keys:
+                        values[option.key] = option.value
+            except vim.fault.InvalidName:
+                pass
+    except vmodl.MethodFault as fault:
+        return {}, fault
+    return values, None
+
+
+def _retrieve_settings(si, option_managers, page_size):
+    """
+    Read the full settings of the option managers, at most page_size option
+    managers per round trip. Returns a dict of option manager to settings.
+    """
+    pc = vmodl.query.PropertyCollector
+    filter_spec = pc.FilterSpec(
+        objectSet=[pc.ObjectSpec(obj=option_manager) for option_manager in option_managers],
+        propSet=[pc.PropertySpec(type=vim.option.OptionManager, pathSet=['setting'])])
+    collector = si.content.propertyCollector
+    settings = {}
+    result = collector.RetrievePropertiesEx([filter_spec], pc.RetrieveOptions(maxObjects=page_size))
+    while result is not None:
+        for obj in result.objects:
+            for prop in obj.propSet:
+                settings[str(obj.obj)] = {option.key: option.value for option in prop.val or []}
+        if not result.token:
+            break
+        result = collector.ContinueRetrievePropertiesEx(result.token)
+    return settings
+
+
+def read_options(si, container=None, keys=None, workers=8, page_size=50):
+    """
+    Read the advanced settings of all hosts below container (the root folder
+    by default). With keys only these settings are queried, on at most
+    workers hosts at once; without keys all settings are read, page_size
+    hosts per round trip. Returns a list of HostOptions sorted by host name;
+    a host whose query failed has the fault as error.
+    """
+    view = pchelper.get_container_view(si, obj_type=[vim.HostSystem], container=container)
+    try:
+        hosts = pchelper.collect_properties(
+            si, view_ref=view, obj_type=vim.HostSystem,
+            path_set=['name', 'configManager.advancedOption'], include_mors=True)
+    finally:
+        view.Destroy()
+    hosts = [host for host in hosts if host.get('configManager.advancedOption') is not None]
+    if not hosts:
+        return []
+
+    option_managers = [host['configManager.advancedOption'] for host in hosts]
+    if keys is not None:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(hosts)))) as executor:
+            values = list(executor.map(lambda option_manager: _query_options(option_manager, keys),
+                                       option_managers))
+    else:
+        settings = _retrieve_settings(si, option_managers, page_size)
+        values = [(settings.get(str(option_manager), {}), None)
+                  for option_manager in option_managers]
+
+    result = [HostOptions(host['obj'], host['name'], option_manager, host_values, error)
+              for host, option_manager, (host_values, error)
+              in zip(hosts, option_managers, values)]
+    return sorted(result, key=lambda host: host.name)
+
+
+def coerce_value(value, current):
+    """
+    Convert the string value to the type of the current value of a setting,
+    so that integer settings are sent as xsd:int or xsd:long as expected
+    """
+    if not isinstance(value, str) or current is None or isinstance(current, str):
+        return value
+    if isinstance(current, bool):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return type(current)(value)
+
+
+def plan_changes(hosts, desired):
+    """
+    Compute the OptionValues each host needs to reach the desired map of
+    setting key to value. Returns a list of (HostOptions, [OptionValue]) for
+    the hosts with at least one change; settings a host does not have are
+    left out.
+    """
+    plans = []
+    for host in hosts:
+        changes = []
+        for key, value in desired.items():
+            if key not in host.values:
+                continue
+            value = coerce_value(value, host.values[key])
+            if host.values[key] != value:
+                changes.append(vim.option.OptionValue(key=key, value=value))
+        if changes:
+            plans.append((host, changes))
+    return plans
+
+
+def _apply(host, changes):
+    try:
+        host.option_manager.UpdateOptions(changedValue=changes)
+    except vmodl.MethodFault as fault:
+        return RolloutResult(host.name, changes, fault)
+    return RolloutResult(host.name, changes)
+
+
+def rollout(plans, parallelism=8, canary=1):
+    """
+    Apply the planned changes. The first canary hosts are updated one after
+    the other; if any of them fails the remaining hosts are not touched.
+    The remaining hosts are updated with at most parallelism hosts at once.
+    Yields a RolloutResult per host.
+    """
+    for host, changes in plans[:canary]:
+        result = _apply(host, changes)
+        yield result
+        if result.error is not None:
+            for skipped, skipped_changes in plans[canary:]:
+                yield RolloutResult(skipped.name, skipped_changes, 'canary failed')
+            return
+    remaining = plans[canary:]
+    if not remaining:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        for result in executor.map(lambda plan: _apply(*plan), remaining):
+            yield result
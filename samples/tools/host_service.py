@@ -0,0 +1,73 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements helpers for the host services (Esxtop, VscsiStats)
+that vCenter Server's Service Manager exposes for its managed hosts.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pyVmomi import vim
+
+from . import pchelper
+
+__author__ = "VMware, Inc."
+
+
+def get_host_service(si, host_name, service_name):
+    """
+    Return the simple command service named service_name of the host, or None
+    when the host does not provide it. host_name is the name of the host in
+    the vCenter inventory.
+    """
+    # "vmware.host." prefix is required when connecting to VC
+    services = si.content.serviceManager.QueryServiceList(
+        location=['vmware.host.' + host_name]) or []
+    for service in services:
+        if service.serviceName == service_name:
+            return service.service
+    return None
+
+
+def cluster_host_names(si, cluster_name):
+    """
+    Return the names of the hosts of a cluster, read in one property
+    collector call
+    """
+    cluster = pchelper.get_obj(si.content, [vim.ClusterComputeResource], cluster_name)
+    view = pchelper.get_container_view(si, obj_type=[vim.HostSystem], container=cluster)
+    try:
+        hosts = pchelper.collect_properties(si, view_ref=view, obj_type=vim.HostSystem,
+                                            path_set=['name'])
+    finally:
+        view.Destroy()
+    return sorted(host['name'] for host in hosts)
+
+
+def map_hosts(func, host_names, workers=8):
+    """
+    Call func(host_name) for all hosts with at most workers concurrent calls.
+    Return a dict of host name to result; hosts whose call raised are mapped
+    to the exception.
+    """
+    def call(host_name):
+        try:
+            return host_name, func(host_name)
+        except Exception as ex:  # pylint: disable=broad-except
+            return host_name, ex
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(host_names) or 1))) as executor:
+        return dict(executor.map(call, host_names))
@@ -0,0 +1,188 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module exports an inventory snapshot into a SQLite database.
+
+The properties of all virtual machines, hosts, datastores and networks are
+retrieved page by page with pchelper.iter_properties and every page is
+inserted as it arrives, so the inventory is never held in memory at once.
+Managed objects are stored by their managed object id, and the datastores
+and networks of the VMs are stored in the link tables vm_datastore and
+vm_network. Reports can then query the snapshot instead of vCenter.
+
+Sample Usage:
+
+    counts = export_inventory(si, 'inventory.db')
+
+    connection = sqlite3.connect('inventory.db')
+    connection.execute('SELECT host.name, count(*) FROM vm '
+                       'JOIN host ON vm.host = host.moid GROUP BY host.name')
+"""
+
+import sqlite3
+import time
+
+from pyVmomi import vim
+
+from . import pchelper
+
+__author__ = "VMware, Inc."
+
+# table: (managed object type, [(column, property path)])
+TABLES = {
+    'vm': (vim.VirtualMachine, [
+        ('name', 'name'),
+        ('power_state', 'runtime.powerState'),
+        ('host', 'runtime.host'),
+        ('guest_full_name', 'config.guestFullName'),
+        ('num_cpu', 'config.hardware.numCPU'),
+        ('memory_mb', 'config.hardware.memoryMB'),
+        ('uuid', 'config.uuid'),
+        ('instance_uuid', 'config.instanceUuid'),
+        ('template', 'config.template'),
+        ('vm_path_name', 'config.files.vmPathName'),
+        ('ip_address', 'guest.ipAddress'),
+        ('tools_running_status', 'guest.toolsRunningStatus'),
+        ('committed_bytes', 'summary.storage.committed'),
+    ]),
+    'host': (vim.HostSystem, [
+        ('name', 'name'),
+        ('parent', 'parent'),
+        ('connection_state', 'runtime.connectionState'),
+        ('power_state', 'runtime.powerState'),
+        ('maintenance_mode', 'runtime.inMaintenanceMode'),
+        ('version', 'summary.config.product.version'),
+        ('build', 'summary.config.product.build'),
+        ('num_cpu_cores', 'summary.hardware.numCpuCores'),
+        ('memory_bytes', 'summary.hardware.memorySize'),
+        ('vendor', 'summary.hardware.vendor'),
+        ('model', 'summary.hardware.model'),
+    ]),
+    'datastore': (vim.Datastore, [
+        ('name', 'name'),
+        ('type', 'summary.type'),
+        ('url', 'summary.url'),
+        ('capacity_bytes', 'summary.capacity'),
+        ('free_bytes', 'summary.freeSpace'),
+        ('accessible', 'summary.accessible'),
+        ('maintenance_mode', 'summary.maintenanceMode'),
+    ]),
+    'network': (vim.Network, [
+        ('name', 'name'),
+        ('accessible', 'summary.accessible'),
+    ]),
+}
+
+# link table: (table, list property, column)
+LINKS = {
+    'vm_datastore': ('vm', 'datastore', 'datastore'),
+    'vm_network': ('vm', 'network', 'network'),
+}
+
+# table: indexed columns
+INDEXES = {
+    'vm': ['name', 'host', 'instance_uuid'],
+    'host': ['name'],
+    'datastore': ['name'],
+    'network': ['name'],
+    'vm_datastore': ['vm', 'datastore'],
+    'vm_network': ['vm', 'network'],
+}
+
+
+def to_column(value):
+    """
+    Convert a property value to a value SQLite can store: managed objects
+    become their managed object id and booleans become 0 or 1.
+    """
+    if value is None:
+        return None
+    if isinstance(value, vim.ManagedObject):
+        return value._moId
+    if isinstance(value, (bool, int)):
+        return int(value)
+    if isinstance(value, float):
+        return value
+    return str(value)
+
+
+def create_schema(connection):
+    """
+    Create the snapshot, object and link tables, dropping earlier ones.
+    """
+    connection.execute('DROP TABLE IF EXISTS snapshot')
+    connection.execute('CREATE TABLE snapshot (taken_at REAL, vcenter TEXT)')
+    for table, (_, columns) in TABLES.items():
+        connection.execute('DROP TABLE IF EXISTS %s' % table)
+        connection.execute('CREATE TABLE %s (moid TEXT PRIMARY KEY, %s)' % (
+            table, ', '.join(column for column, _ in columns)))
+    for link, (table, _, column) in LINKS.items():
+        connection.execute('DROP TABLE IF EXISTS %s' % link)
+        connection.execute('CREATE TABLE %s (%s TEXT, %s TEXT)' % (link, table, column))
+
+
+def create_indexes(connection):
+    for table, columns in INDEXES.items():
+        for column in columns:
+            connection.execute('CREATE INDEX %s_%s ON %s (%s)' % (table, column, table, column))
+
+
+def export_table(si, connection, table, page_size=1000):
+    """
+    Insert the objects of one table, and their links, page by page.
+    Returns the number of objects inserted.
+    """
+    obj_type, columns = TABLES[table]
+    links = [(link, path) for link, (link_table, path, _) in LINKS.items()
+             if link_table == table]
+    path_set = [path for _, path in columns] + [path for _, path in links]
+    insert = 'INSERT INTO %s VALUES (%s)' % (table, ', '.join('?' * (len(columns) + 1)))
+    count = 0
+    view = pchelper.get_container_view(si, obj_type=[obj_type])
+    try:
+        for page in pchelper.iter_properties(si, view_ref=view, obj_type=obj_type,
+                                             path_set=path_set, include_mors=True,
+                                             page_size=page_size):
+            connection.executemany(insert, [
+                [item['obj']._moId] + [to_column(item.get(path)) for _, path in columns]
+                for item in page])
+            for link, path in links:
+                connection.executemany('INSERT INTO %s VALUES (?, ?)' % link, [
+                    (item['obj']._moId, to_column(linked))
+                    for item in page for linked in item.get(path) or []])
+            count += len(page)
+    finally:
+        view.Destroy()
+    return count
+
+
+def export_inventory(si, path, page_size=1000):
+    """
+    Export the inventory of si into the SQLite database at path, replacing an
+    earlier snapshot. Returns a dict of table to the number of objects.
+    """
+    connection = sqlite3.connect(path)
+    try:
+        with connection:
+            create_schema(connection)
+            connection.execute('INSERT INTO snapshot VALUES (?, ?)',
+                               (time.time(), si.content.about.instanceUuid))
+            counts = {table: export_table(si, connection, table, page_size)
+                      for table in TABLES}
+            create_indexes(connection)
+    finally:
+        connection.close()
+    return counts
@@ -0,0 +1,111 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements a sorted index of managed object names.
+
+Reading obj.name on every object of a ContainerView costs one round trip per
+object. NameIndex.from_inventory collects the names, and any other properties
+needed later, in one property collector call and keeps them sorted, so exact,
+prefix and glob lookups are binary searches and regular expressions are
+compiled once.
+
+Sample Usage:
+
+    index = NameIndex.from_inventory(si, vim.VirtualMachine, ['runtime.powerState'])
+    for record in index.search('web-*', 'glob'):
+        print(record['name'], record['runtime.powerState'], record['obj'])
+"""
+
+import bisect
+import fnmatch
+import re
+
+from . import pchelper
+
+__author__ = "VMware, Inc."
+
+MATCH_MODES = ('exact', 'glob', 'regex')
+_GLOB_SPECIAL = re.compile(r'[*?\[]')
+
+
+class NameIndex:
+    """
+    Records (dicts with at least a 'name' key) sorted by name.
+    """
+
+    def __init__(self, records):
+        self._records = sorted((record for record in records if record.get('name') is not None),
+                               key=lambda record: record['name'])
+        self._names = [record['name'] for record in self._records]
+
+    @classmethod
+    def from_inventory(cls, si, obj_type, path_set=None, container=None):
+        """
+        Build the index from all objects of obj_type below container (the
+        root folder by default). Each record holds 'obj', 'name' and the
+        properties in path_set.
+        """
+        view = pchelper.get_container_view(si, obj_type=[obj_type], container=container)
+        try:
+            records = pchelper.collect_properties(si, view_ref=view, obj_type=obj_type,
+                                                  path_set=['name'] + list(path_set or []),
+                                                  include_mors=True)
+        finally:
+            view.Destroy()
+        return cls(records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def exact(self, name):
+        """ Records whose name equals name """
+        start = bisect.bisect_left(self._names, name)
+        end = bisect.bisect_right(self._names, name, start)
+        return self._records[start:end]
+
+    def prefix(self, prefix):
+        """ Records whose name starts with prefix """
+        start = bisect.bisect_left(self._names, prefix)
+        end = start
+        while end < len(self._names) and self._names[end].startswith(prefix):
+            end += 1
+        return self._records[start:end]
+
+    def glob(self, pattern):
+        """
+        Records whose name matches the case sensitive glob pattern. The
+        literal part before the first wildcard narrows the candidates with a
+        binary search.
+        """
+        literal = _GLOB_SPECIAL.split(pattern, 1)[0]
+        if literal == pattern:
+            return self.exact(pattern)
+        matcher = re.compile(fnmatch.translate(pattern))
+        return [record for record in self.prefix(literal) if matcher.match(record['name'])]
+
+    def regex(self, pattern):
+        """ Records whose name contains a match for the regular expression """
+        matcher = re.compile(pattern)
+        return [record for record in self._records if matcher.search(record['name'])]
+
+    def search(self, pattern, mode='exact'):
+        """ Dispatch to exact, glob or regex according to mode """
+        if mode not in MATCH_MODES:
+            raise ValueError("Invalid match mode: '{}'".format(mode))
+        return getattr(self, mode)(pattern)
@@ -0,0 +1,126 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements an index of the network topology of a vCenter.
+
+Resolving the switch, port group and VLAN of a virtual NIC through
+QueryDvsByUuid, LookupDvPortGroup or the port groups of the VM's host costs
+round trips for every NIC. NetworkIndex.from_inventory collects the
+distributed switches, the distributed port groups with their VLAN
+configuration and the standard port groups of all hosts in three property
+collector calls, after which NIC backings are resolved with dictionary
+lookups.
+
+Sample Usage:
+
+    index = NetworkIndex.from_inventory(si)
+    for device in vm.config.hardware.device:
+        if isinstance(device, vim.vm.device.VirtualEthernetCard):
+            switch, port_group, vlan = index.resolve(device, vm.runtime.host)
+"""
+
+from pyVmomi import vim
+
+from . import pchelper
+
+__author__ = "VMware, Inc."
+
+NOT_AVAILABLE = 'NA'
+DVS_NOT_FOUND = '** Error: DVS not found **'
+
+
+def _collect(si, obj_type, path_set):
+    view = pchelper.get_container_view(si, obj_type=[obj_type])
+    try:
+        return pchelper.collect_properties(si, view_ref=view, obj_type=obj_type,
+                                           path_set=path_set, include_mors=True)
+    finally:
+        view.Destroy()
+
+
+def vlan_to_str(vlan):
+    """
+    Format the VLAN of a distributed port group port setting as a VLAN id,
+    a list of trunked VLAN ranges or a private VLAN id
+    """
+    if isinstance(vlan, vim.dvs.VmwareDistributedVirtualSwitch.TrunkVlanSpec):
+        return ','.join(str(r.start) if r.start == r.end else '{}-{}'.format(r.start, r.end)
+                        for r in vlan.vlanId)
+    if isinstance(vlan, vim.dvs.VmwareDistributedVirtualSwitch.PvlanSpec):
+        return str(vlan.pvlanId)
+    if getattr(vlan, 'vlanId', None) is not None:
+        return str(vlan.vlanId)
+    return NOT_AVAILABLE
+
+
+class NetworkIndex:
+    """
+    Switch, port group and VLAN lookup tables for virtual NIC backings.
+    """
+
+    def __init__(self, switches, dv_port_groups, hosts):
+        """
+        switches, dv_port_groups and hosts are property collector records
+        as returned by NetworkIndex.from_inventory.
+        """
+        self._switches = {record['uuid']: record['name'] for record in switches}
+        switch_names = {record['obj']: record['name'] for record in switches}
+        self._dv_port_groups = {}
+        for record in dv_port_groups:
+            port_config = record.get('config.defaultPortConfig')
+            self._dv_port_groups[record['key']] = (
+                switch_names.get(record.get('config.distributedVirtualSwitch'),
+                                 NOT_AVAILABLE),
+                record['name'],
+                vlan_to_str(getattr(port_config, 'vlan', None)))
+        self._host_port_groups = {}
+        for record in hosts:
+            for port_group in record.get('config.network.portgroup') or []:
+                self._host_port_groups[(record['obj'], port_group.spec.name)] = (
+                    port_group.spec.vswitchName, str(port_group.spec.vlanId))
+
+    @classmethod
+    def from_inventory(cls, si):
+        """
+        Build the index from all distributed switches, distributed port
+        groups and hosts of the vCenter.
+        """
+        switches = _collect(si, vim.DistributedVirtualSwitch, ['name', 'uuid'])
+        dv_port_groups = _collect(si, vim.dvs.DistributedVirtualPortgroup,
+                                  ['key', 'name', 'config.defaultPortConfig',
+                                   'config.distributedVirtualSwitch'])
+        hosts = _collect(si, vim.HostSystem, ['config.network.portgroup'])
+        return cls(switches, dv_port_groups, hosts)
+
+    def resolve(self, nic, host):
+        """
+        Return (switch name, port group name, VLAN) of the virtual NIC of a
+        VM running on host. Unknown values are 'NA'.
+        """
+        backing = nic.backing
+        if isinstance(backing,
+                      vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo):
+            if backing.port.switchUuid not in self._switches:
+                return NOT_AVAILABLE, DVS_NOT_FOUND, NOT_AVAILABLE
+            return self._dv_port_groups.get(
+                backing.port.portgroupKey,
+                (self._switches[backing.port.switchUuid], NOT_AVAILABLE, NOT_AVAILABLE))
+        if isinstance(backing, vim.vm.device.VirtualEthernetCard.NetworkBackingInfo):
+            port_group = backing.deviceName
+            switch, vlan = self._host_port_groups.get((host, port_group),
+                                                      (NOT_AVAILABLE, NOT_AVAILABLE))
+            return switch, port_group, vlan
+        return NOT_AVAILABLE, NOT_AVAILABLE, NOT_AVAILABLE
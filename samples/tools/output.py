@@ -0,0 +1,215 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements the record writers behind the --output argument of
+the listing samples.
+
+Records are dicts written one at a time as they are produced, so a listing
+never holds the full result set in memory. The writers write to a buffered
+stream on stdout instead of calling print once per field:
+
+    table   fixed width columns with a header line
+    csv     comma separated values with a header line
+    jsonl   one JSON object per line
+    ndjson  one JSON object per line, flushed after every record so that a
+            program reading the pipe, e.g. jq, sees each record at once
+
+A reader that goes away, e.g. "| head", closes the writer instead of
+raising BrokenPipeError; samples can stop producing records once
+writer.closed is set.
+
+Sample Usage:
+
+    parser.add_optional_arguments(cli.Argument.OUTPUT)
+    ...
+    with output.open_writer(args.output, ['name', 'state']) as writer:
+        for vm in vms:
+            writer.write({'name': vm.name, 'state': vm.runtime.powerState})
+"""
+
+import csv
+import io
+import json
+import sys
+
+__author__ = "VMware, Inc."
+
+FORMATS = ('table', 'csv', 'jsonl', 'ndjson')
+
+BUFFER_SIZE = 64 * 1024
+
+DEFAULT_WIDTH = 20
+
+
+def open_stdout():
+    """
+    Open a buffered text stream on the stdout file descriptor that is left
+    open when the stream is closed
+    """
+    sys.stdout.flush()
+    return io.open(sys.stdout.fileno(), 'w', buffering=BUFFER_SIZE,
+                   encoding=sys.stdout.encoding, errors='replace', newline='',
+                   closefd=False)
+
+
+def to_text(value):
+    """
+    Convert a record value to text, None becomes an empty string and lists
+    are joined with commas
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ','.join(to_text(item) for item in value)
+    return str(value)
+
+
+class RecordWriter:
+    """
+    Base class of the writers, writes records to stream.
+    """
+    def __init__(self, stream, columns, close_stream=False):
+        """
+        stream: The text stream to write to
+        columns: The keys of the records to write, in order
+        close_stream: Whether close also closes the stream
+        """
+        self.stream = stream
+        self.columns = columns
+        self.closed = False
+        self._close_stream = close_stream
+        self._header_written = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_header(self):
+        pass
+
+    def write_record(self, record):
+        raise NotImplementedError
+
+    def write(self, record):
+        """
+        Write one record, a dict of column to value. Missing columns are
+        written as empty values and additional keys are ignored.
+        """
+        if self.closed:
+            return
+        try:
+            if not self._header_written:
+                self._header_written = True
+                self.write_header()
+            self.write_record(record)
+        except BrokenPipeError:
+            self.closed = True
+
+    def close(self):
+        """
+        Write the header if no record was written and flush the stream
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if not self._header_written:
+                self.write_header()
+            if self._close_stream:
+                self.stream.close()
+            else:
+                self.stream.flush()
+        except BrokenPipeError:
+            pass
+
+
+class TableWriter(RecordWriter):
+    """
+    Writes records as fixed width columns. Values longer than their column
+    are not truncated.
+    """
+    def __init__(self, stream, columns, close_stream=False, widths=None):
+        """
+        widths: A map of column to width, DEFAULT_WIDTH for other columns
+        """
+        RecordWriter.__init__(self, stream, columns, close_stream)
+        widths = widths or {}
+        self._template = ''.join('{%d:<%d} ' % (i, widths.get(column, DEFAULT_WIDTH))
+                                 for i, column in enumerate(columns[:-1]))
+        self._template += '{%d}\n' % (len(columns) - 1)
+
+    def write_header(self):
+        self.stream.write(self._template.format(*self.columns))
+
+    def write_record(self, record):
+        self.stream.write(self._template.format(
+            *[to_text(record.get(column)).replace('\n', ' ') for column in self.columns]))
+
+
+class CsvWriter(RecordWriter):
+    """
+    Writes records as comma separated values.
+    """
+    def __init__(self, stream, columns, close_stream=False):
+        RecordWriter.__init__(self, stream, columns, close_stream)
+        self._writer = csv.writer(stream)
+
+    def write_header(self):
+        self._writer.writerow(self.columns)
+
+    def write_record(self, record):
+        self._writer.writerow([to_text(record.get(column)) for column in self.columns])
+
+
+class JsonLinesWriter(RecordWriter):
+    """
+    Writes one JSON object per record and line.
+    """
+    def write_record(self, record):
+        self.stream.write(json.dumps({column: record.get(column) for column in self.columns},
+                                     default=str) + '\n')
+
+
+class NdjsonWriter(JsonLinesWriter):
+    """
+    Like JsonLinesWriter, but flushes after every record.
+    """
+    def write_record(self, record):
+        JsonLinesWriter.write_record(self, record)
+        self.stream.flush()
+
+
+def open_writer(output_format, columns, stream=None, widths=None):
+    """
+    Create the writer for output_format, one of FORMATS, writing the columns
+    of every record. Writes to a buffered stream on stdout unless stream is
+    given. widths sets the column widths of the table format.
+    """
+    if output_format not in FORMATS:
+        raise ValueError('Unknown output format %s, expected one of %s' %
+                         (output_format, ', '.join(FORMATS)))
+    close_stream = stream is None
+    if close_stream:
+        stream = open_stdout()
+    if output_format == 'table':
+        return TableWriter(stream, columns, close_stream, widths)
+    if output_format == 'csv':
+        return CsvWriter(stream, columns, close_stream)
+    if output_format == 'jsonl':
+        return JsonLinesWriter(stream, columns, close_stream)
+    return NdjsonWriter(stream, columns, close_stream)
@@ -11,45 +11,209 @@ This module implements simple helper functions for working with the
 VMware Storage Policy (pbm) API
 """
 
-from pyVmomi import pbm, VmomiSupport
+import threading
+import time
+import weakref
+
+from pyVmomi import pbm, SoapStubAdapter
+
+
+class _PbmSession(object):
+    """ The PBM ServiceInstance and its content for one vCenter stub """
+
+    def __init__(self, session_cookie, pbm_stub, pbm_si):
+        self.session_cookie = session_cookie
+        self.pbm_stub = pbm_stub
+        self.pbm_si = pbm_si
+        self._content = None
+        self._catalogue = None
+        self._lock = threading.Lock()
+
+    def content(self):
+        with self._lock:
+            if self._content is None:
+                self._content = self.pbm_si.RetrieveContent()
+            return self._content
+
+    def catalogue(self, profile_manager, max_age):
+        with self._lock:
+            if self._catalogue is None:
+                self._catalogue = ProfileCatalogue(profile_manager, max_age)
+            return self._catalogue
+
+
+_sessions = weakref.WeakKeyDictionary()
+_sessions_lock = threading.Lock()
+
+
+def _get_session(stub):
+    session_cookie = stub.cookie.split('"')[1]
+    with _sessions_lock:
+        session = _sessions.get(stub)
+        # a new login on the vCenter stub invalidates the PBM session
+        if session is None or session.session_cookie != session_cookie:
+            host, port = stub.host.rsplit(":", 1)
+            # the session cookie goes into the SOAP header of this stub only,
+            # instead of the thread local request context, so the stub can be
+            # shared between threads. The TLS context of the vCenter stub is
+            # reused and connections are pooled.
+            pbm_stub = SoapStubAdapter(
+                host=host.strip("[]"),
+                port=int(port),
+                version="pbm.version.version1",
+                path="/pbm/sdk",
+                poolSize=getattr(stub, "poolSize", 5) or 5,
+                sslContext=getattr(stub, "schemeArgs", {}).get("context"),
+                requestContext={"vcSessionCookie": session_cookie})
+            pbm_stub.cookie = stub.cookie
+            session = _PbmSession(session_cookie, pbm_stub,
+                                  pbm.ServiceInstance("ServiceInstance", pbm_stub))
+            _sessions[stub] = session
+        return session
 
 
 def create_pbm_session(stub):
     """
-    Creates a session with the VMware Storage Policy API
+    Creates a session with the VMware Storage Policy API, or returns the one
+    already created for this vCenter stub. Safe to call from many threads.
 
     Sample Usage:
 
     create_pbm_session(service_instance._stub)
     """
-    import pyVmomi
-    import ssl
-    # Make compatible with both Python2/3
-    try:
-        from http import cookies
-    except ImportError:
-        import Cookie as cookies
+    return _get_session(stub).pbm_si
 
-    session_cookie = stub.cookie.split('"')[1]
-    http_context = VmomiSupport.GetHttpContext()
-    cookie = cookies.SimpleCookie()
-    cookie["vmware_soap_session"] = session_cookie
-    http_context["cookies"] = cookie
-    VmomiSupport.GetRequestContext()["vcSessionCookie"] = session_cookie
-    hostname = stub.host.split(":")[0]
-
-    context = None
-    if hasattr(ssl, "_create_unverified_context"):
-        context = ssl._create_unverified_context()
-    pbm_stub = pyVmomi.SoapStubAdapter(
-        host=hostname,
-        version="pbm.version.version1",
-        path="/pbm/sdk",
-        poolSize=0,
-        sslContext=context)
-    pbm_si = pbm.ServiceInstance("ServiceInstance", pbm_stub)
-
-    return pbm_si
+
+def get_pbm_content(stub):
+    """
+    Returns the content of the VMware Storage Policy API session for this
+    vCenter stub. The content is retrieved once per session.
+
+    Sample Usage:
+
+    pbm_content = get_pbm_content(service_instance._stub)
+    """
+    return _get_session(stub).content()
+
+
+class ProfileCatalogue(object):
+    """
+    Every storage requirement profile of a PBM session, loaded once and
+    indexed by name and by ID.
+
+    The catalogue is revalidated at most every max_age seconds with a single
+    PbmQueryProfile call, which only returns IDs; PbmRetrieveContent is called
+    for new IDs only. Profiles changed in place keep their ID, so call
+    invalidate() after updating one.
+
+    Sample Usage:
+
+    catalogue = get_profile_catalogue(pbm_content.profileManager)
+    profile = catalogue.by_name("Policy Name")
+    """
+
+    def __init__(self, profile_manager, max_age=300):
+        self._profile_manager = profile_manager
+        self._max_age = max_age
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_name = {}
+        self._loaded_at = None
+
+    def _query_ids(self):
+        return self._profile_manager.PbmQueryProfile(
+            resourceType=pbm.profile.ResourceType(resourceType="STORAGE"),
+            profileCategory="REQUIREMENT")
+
+    def _retrieve(self, profile_ids):
+        if not profile_ids:
+            return []
+        profiles = self._profile_manager.PbmRetrieveContent(profileIds=profile_ids)
+        for profile in profiles:
+            self._by_id[profile.profileId.uniqueId] = profile
+        return profiles
+
+    def _index_names(self, unique_ids):
+        self._by_name = {}
+        for unique_id in unique_ids:
+            profile = self._by_id.get(unique_id)
+            if profile is not None:
+                self._by_name.setdefault(profile.name, profile)
+
+    def refresh(self, force=False):
+        """
+        Revalidate the catalogue when it is older than max_age, or always
+        when force is True.
+        """
+        with self._lock:
+            if not force and self._loaded_at is not None and \
+                    time.time() - self._loaded_at < self._max_age:
+                return
+            profile_ids = self._query_ids()
+            unique_ids = [profile_id.uniqueId for profile_id in profile_ids]
+            self._retrieve([profile_id for profile_id in profile_ids
+                            if profile_id.uniqueId not in self._by_id])
+            self._index_names(unique_ids)
+            self._loaded_at = time.time()
+
+    def invalidate(self, profile_id=None):
+        """
+        Forget one profile, or every profile when profile_id is None, so the
+        next lookup retrieves it again.
+        """
+        with self._lock:
+            if profile_id is None:
+                self._by_id = {}
+            else:
+                self._by_id.pop(getattr(profile_id, 'uniqueId', profile_id), None)
+            self._loaded_at = None
+
+    def profiles(self):
+        """ All storage requirement profiles """
+        self.refresh()
+        with self._lock:
+            return list(self._by_name.values())
+
+    def by_name(self, name):
+        """ The profile with this name or None """
+        self.refresh()
+        with self._lock:
+            return self._by_name.get(name)
+
+    def by_id(self, profile_id):
+        """ The profile with this pbm.profile.ProfileId or unique ID, or None """
+        return (self.get([profile_id]) or [None])[0]
+
+    def get(self, profile_ids):
+        """
+        The profiles for a list of pbm.profile.ProfileId or unique IDs, in
+        the same order. IDs missing from the catalogue, for example profiles
+        of other categories, are retrieved in one call and kept.
+        """
+        self.refresh()
+        unique_ids = [getattr(profile_id, 'uniqueId', profile_id) for profile_id in profile_ids]
+        with self._lock:
+            missing = sorted({unique_id for unique_id in unique_ids
+                              if unique_id not in self._by_id})
+            self._retrieve([pbm.profile.ProfileId(uniqueId=unique_id) for unique_id in missing])
+            return [self._by_id[unique_id] for unique_id in unique_ids
+                    if unique_id in self._by_id]
+
+
+def get_profile_catalogue(profile_manager, max_age=300):
+    """
+    Return the ProfileCatalogue of the PBM session profile_manager belongs
+    to, creating it on first use. The catalogue is kept on the session, so it
+    is freed together with the vCenter stub. A profile manager of a session
+    not created by create_pbm_session gets a new catalogue on every call.
+    """
+    stub = profile_manager._stub  # pylint: disable=W0212
+    with _sessions_lock:
+        session = next((session for session in _sessions.values()
+                        if session.pbm_stub is stub), None)
+    if session is None:
+        return ProfileCatalogue(profile_manager, max_age)
+    return session.catalogue(profile_manager, max_age)
 
 
 def retrieve_storage_policy(pbm_content, policy):
@@ -61,24 +225,12 @@ def retrieve_storage_policy(pbm_content, policy):
     pbm_content = pbm_si.RetrieveContent()
     retrieve_storage_policy(pbm_content, "Policy Name")
     """
-    # Set PbmQueryProfile
-    profile_manager = pbm_content.profileManager
-
-    # Retrieving Storage Policies
-    profile_ids = profile_manager.PbmQueryProfile(resourceType=pbm.profile.ResourceType(
-        resourceType="STORAGE"), profileCategory="REQUIREMENT"
-    )
-    if len(profile_ids) > 0:
-        profiles = profile_manager.PbmRetrieveContent(profileIds=profile_ids)
-    else:
+    catalogue = get_profile_catalogue(pbm_content.profileManager)
+    if not catalogue.profiles():
         raise RuntimeError("No Storage Policies found.")
 
     # Searching for Storage Policy
-    storage_polity_profile = None
-    for profile in profiles:
-        if profile.name == policy:
-            storage_polity_profile = profile
-            break
+    storage_polity_profile = catalogue.by_name(policy)
     if not storage_polity_profile:
         raise RuntimeError("Storage Policy specified not found.")
 
@@ -76,6 +76,38 @@ def collect_properties(si, view_ref, obj_type, path_set=None,
     return data
 
 
+def iter_properties(si, view_ref, obj_type, path_set, include_mors=False,
+                    page_size=1000):
+    """
+    Like collect_properties, but retrieves the objects in pages of at most
+    page_size objects with RetrievePropertiesEx and yields the property
+    dicts one page at a time, so large inventories are never held in memory
+    at once.
+
+    Returns:
+        A generator of lists of property dicts
+    """
+    pc = pyVmomi.vmodl.query.PropertyCollector
+    collector = si.content.propertyCollector
+    filter_spec = pc.FilterSpec(
+        objectSet=[pc.ObjectSpec(obj=view_ref, skip=True, selectSet=[pc.TraversalSpec(
+            name='traverseEntities', path='view', skip=False, type=view_ref.__class__)])],
+        propSet=[pc.PropertySpec(type=obj_type, pathSet=path_set)])
+    result = collector.RetrievePropertiesEx([filter_spec],
+                                            pc.RetrieveOptions(maxObjects=page_size))
+    while result is not None:
+        page = []
+        for obj in result.objects:
+            properties = {prop.name: prop.val for prop in obj.propSet}
+            if include_mors:
+                properties['obj'] = obj.obj
+            page.append(properties)
+        yield page
+        if not result.token:
+            break
+        result = collector.ContinueRetrievePropertiesEx(result.token)
+
+
 def get_container_view(si, obj_type, container=None):
     """
     Get a vSphere Container View reference to all objects of type 'obj_type'
@@ -0,0 +1,246 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements bulk power operations on many virtual machines.
+
+The VMs are looked up with their power state and host in one property
+collector call. The operations are submitted through tasks.run_throttled,
+which limits the number of running tasks overall and per host and the rate
+at which tasks are started, and the outcome of every VM is reported as a
+PowerResult.
+
+power_on_by_datacenter instead powers VMs on with
+Datacenter.PowerOnMultiVM_Task, so DRS places each batch of VMs at once.
+
+Sample Usage:
+
+    vms, missing = find_vms(si, ['web-01', 'web-02'])
+    for result in run_power_operation(si, vms, 'on', max_in_flight=16, max_per_host=4,
+                                      max_per_second=5):
+        print(result.vm_name, result.state, result.error)
+
+    vms, missing = find_vms_by_datacenter(si, ['web-01', 'web-02'])
+    for result in power_on_by_datacenter(si, vms, batch_size=50):
+        print(result.vm_name, result.state, result.error)
+"""
+
+import functools
+
+from pyVmomi import vim
+
+from . import name_index, pchelper, tasks
+
+__author__ = "VMware, Inc."
+
+_ON = vim.VirtualMachinePowerState.poweredOn
+_OFF = vim.VirtualMachinePowerState.poweredOff
+
+# operation: (VirtualMachine method, power states the operation applies to)
+OPERATIONS = {
+    'on': ('PowerOnVM_Task', None),
+    'off': ('PowerOffVM_Task', None),
+    'reset': ('ResetVM_Task', (_ON,)),
+    'shutdown': ('ShutdownGuest', (_ON,)),
+    'reboot': ('RebootGuest', (_ON,)),
+    'destroy': ('Destroy_Task', (_OFF, vim.VirtualMachinePowerState.suspended)),
+}
+
+# VMs already in this state are skipped
+_TARGET_STATES = {'on': _ON, 'off': _OFF}
+
+
+class PowerResult:
+    """
+    Outcome of a power operation on a single VM.
+    """
+    def __init__(self, vm_name, state, error=None, vm=None):
+        """
+        vm_name: The name of the VM
+        state: 'success', 'error', 'skipped' or 'recommended'
+        error: The fault of a failed operation, the reason a VM was skipped
+               or the DRS recommendation of a VM that was not powered on
+        vm: The VirtualMachine, names are not unique
+        """
+        self.vm_name = vm_name
+        self.state = state
+        self.error = error
+        self.vm = vm
+
+
+def find_vms(si, names):
+    """
+    Collect VM names, power states and hosts in one property collector call.
+    Returns a list of (vm, name, power state, host) for the VMs with the
+    given names and the list of names that were not found.
+    """
+    index = name_index.NameIndex.from_inventory(si, vim.VirtualMachine,
+                                                ['runtime.powerState', 'runtime.host'])
+    vms, missing = [], []
+    for name in names:
+        records = index.exact(name)
+        if not records:
+            missing.append(name)
+        vms.extend((record['obj'], record['name'], record.get('runtime.powerState'),
+                    record.get('runtime.host')) for record in records)
+    return vms, missing
+
+
+def find_vms_by_datacenter(si, names):
+    """
+    Like find_vms, with one property collector call per datacenter. Returns
+    a dict of datacenter to its list of (vm, name, power state, host) and
+    the list of names that were not found.
+    """
+    datacenters = pchelper.get_all_obj(si.content, [vim.Datacenter])
+    vms, found = {}, set()
+    for datacenter in datacenters:
+        index = name_index.NameIndex.from_inventory(
+            si, vim.VirtualMachine, ['runtime.powerState', 'runtime.host'],
+            container=datacenter)
+        for name in names:
+            for record in index.exact(name):
+                found.add(name)
+                vms.setdefault(datacenter, []).append(
+                    (record['obj'], record['name'], record.get('runtime.powerState'),
+                     record.get('runtime.host')))
+    return vms, [name for name in names if name not in found]
+
+
+def check_operation(operation, multi=False):
+    """
+    Raise ValueError when operation is not a key of OPERATIONS, or when multi,
+    powering on with PowerOnMultiVM_Task, is asked for another operation than
+    on.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError('Unknown power operation %s, expected one of %s' % (
+            operation, ', '.join(sorted(OPERATIONS))))
+    if multi and operation != 'on':
+        raise ValueError('PowerOnMultiVM_Task only powers VMs on, it cannot run the '
+                         'operation %s' % operation)
+
+
+def run_power_operation(si, vms, operation, max_in_flight=8, max_per_host=None,
+                        max_per_second=None):
+    """
+    Run operation (a key of OPERATIONS) on every (vm, name, power state,
+    host) in vms. VMs already in the target state, or in a state the
+    operation does not apply to, are skipped. At most max_per_second
+    operations are started per second. Yields a PowerResult per VM as the
+    operations complete.
+    """
+    method, states = OPERATIONS[operation]
+    jobs, by_key = [], {}
+    for vm, name, power_state, host in vms:
+        if power_state == _TARGET_STATES.get(operation):
+            yield PowerResult(name, 'skipped', 'already ' + power_state, vm)
+        elif states is not None and power_state not in states:
+            yield PowerResult(name, 'skipped', power_state, vm)
+        else:
+            by_key[str(vm)] = (vm, name)
+            jobs.append((str(vm), getattr(vm, method), str(host)))
+    for key, state, value in tasks.run_throttled(si, jobs, max_in_flight,
+                                                 max_per_group=max_per_host,
+                                                 max_per_second=max_per_second):
+        vm, name = by_key[key]
+        if state == vim.TaskInfo.State.success:
+            yield PowerResult(name, state, vm=vm)
+        else:
+            yield PowerResult(name, state, value, vm)
+
+
+def _batches(vms_by_datacenter, batch_size):
+    for datacenter, vms in vms_by_datacenter.items():
+        for start in range(0, len(vms), batch_size):
+            yield datacenter, vms[start:start + batch_size]
+
+
+def _power_on_batches(si, vms_by_datacenter, batch_size, max_in_flight, option):
+    """
+    Run one PowerOnMultiVM_Task per batch and wait for the power on tasks it
+    started. Returns PowerResults by VM.
+    """
+    names = {str(vm): name for vms in vms_by_datacenter.values() for vm, name, _, _ in vms}
+    objs = {str(vm): vm for vms in vms_by_datacenter.values() for vm, _, _, _ in vms}
+
+    def result(key, state, error=None):
+        return PowerResult(names[key], state, error, objs[key])
+
+    jobs = [((datacenter, tuple(vm for vm, _, _, _ in batch)),
+             functools.partial(datacenter.PowerOnMultiVM_Task,
+                               [vm for vm, _, _, _ in batch], option))
+            for datacenter, batch in _batches(vms_by_datacenter, batch_size)]
+    results, power_on_jobs, started = {}, [], set()
+    for (_, batch), state, value in tasks.run_throttled(si, jobs, max_in_flight):
+        if state != vim.TaskInfo.State.success:
+            for vm in batch:
+                results[str(vm)] = result(str(vm), state, value)
+            continue
+        for attempted in value.attempted or []:
+            if attempted.task is None:
+                # powered on without a task, e.g. a VM that was already running
+                results[str(attempted.vm)] = result(str(attempted.vm), 'success')
+            else:
+                started.add(str(attempted.vm))
+                power_on_jobs.append((str(attempted.vm), functools.partial(
+                    lambda task: task, attempted.task)))
+        for not_attempted in value.notAttempted or []:
+            results[str(not_attempted.vm)] = result(
+                str(not_attempted.vm), vim.TaskInfo.State.error, not_attempted.fault)
+        for recommendation in value.recommendations or []:
+            if str(recommendation.target) in names:
+                results[str(recommendation.target)] = result(
+                    str(recommendation.target), 'recommended', recommendation)
+        for vm in batch:
+            if str(vm) not in results and str(vm) not in started:
+                results[str(vm)] = result(str(vm), vim.TaskInfo.State.error, 'not attempted')
+    # the power on tasks already run, this only waits for them
+    for key, state, value in tasks.run_throttled(si, power_on_jobs, len(power_on_jobs) or 1):
+        results[key] = result(key, state, value if state == vim.TaskInfo.State.error else None)
+    return results
+
+
+def power_on_by_datacenter(si, vms_by_datacenter, batch_size=50, retries=1, max_in_flight=4,
+                           option=None):
+    """
+    Power on the VMs of every datacenter with Datacenter.PowerOnMultiVM_Task
+    in batches of batch_size, running at most max_in_flight batches at once.
+    VMs that failed are retried up to retries times in new batches. option
+    is passed to PowerOnMultiVM_Task, e.g. [vim.option.OptionValue(
+    key='OverrideAutomationLevel', value=True)]. VMs that are already
+    powered on are skipped. Yields a PowerResult per VM; VMs for which DRS
+    only made a recommendation are reported as 'recommended'.
+    """
+    pending = {}
+    for datacenter, vms in vms_by_datacenter.items():
+        for vm in vms:
+            if vm[2] == _ON:
+                yield PowerResult(vm[1], 'skipped', 'already ' + _ON, vm[0])
+            else:
+                pending.setdefault(datacenter, []).append(vm)
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        results = _power_on_batches(si, pending, batch_size, max_in_flight, option)
+        retry = {}
+        for datacenter, vms in pending.items():
+            for vm in vms:
+                result = results[str(vm[0])]
+                if result.state == vim.TaskInfo.State.error and attempt < retries:
+                    retry.setdefault(datacenter, []).append(vm)
+                else:
+                    yield result
+        pending = retry
@@ -9,9 +9,14 @@ http://www.apache.org/licenses/LICENSE-2.0.html
 
 Helper module for task operations.
 """
+import collections
+import time
+
 from pyVmomi import vim
 from pyVmomi import vmodl
 
+from . import async_collector
+
 
 def wait_for_tasks(si, tasks):
     """Given the service instance and tasks, it returns after all the
@@ -58,3 +63,104 @@ def wait_for_tasks(si, tasks):
     finally:
         if pcfilter:
             pcfilter.Destroy()
+
+
+def run_throttled(si, jobs, max_in_flight=8, max_wait_seconds=30, max_per_group=None,
+                  max_per_second=None):
+    """Start tasks with at most max_in_flight of them running at once.
+
+    jobs is an iterable of (key, start) or (key, start, group) where start
+    is a callable returning a vim.Task. A new task is started whenever a
+    running one completes. With max_per_group, at most that many tasks of
+    the same group (for example the host of a VM) run at once; jobs of a
+    full group are held back while jobs of other groups start. With
+    max_per_second, consecutive jobs are started at least 1 / max_per_second
+    seconds apart, so that freed slots are not refilled all at once.
+    Yields (key, state, value) as tasks complete, where value is the task
+    result on success and the fault on error. A fault raised by start is
+    reported the same way as a task error. A start callable may also return
+    None for operations that complete without a task (for example
+    ShutdownGuest); these are reported as successful right away.
+
+    A private property collector watches the running tasks, so this can be
+    used while other code waits on si.content.propertyCollector. The task
+    filters and their teardown are the same as in
+    async_collector.wait_for_tasks.
+    """
+    collector = si.content.propertyCollector.CreatePropertyCollector()
+    wait_options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=max_wait_seconds)
+    jobs = iter(jobs)
+    held_back = collections.deque()
+    running = collections.Counter()
+
+    def fits(job):
+        return max_per_group is None or len(job) < 3 or running[job[2]] < max_per_group
+
+    def next_job():
+        for job in held_back:
+            if fits(job):
+                held_back.remove(job)
+                return job
+        for job in jobs:
+            if fits(job):
+                return job
+            held_back.append(job)
+        return None
+
+    min_interval = 1.0 / max_per_second if max_per_second else 0
+    last_start = None
+    in_flight = {}
+    version = ''
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                job = next_job()
+                if job is None:
+                    break
+                key, start, group = (tuple(job) + (None,))[:3]
+                if min_interval and last_start is not None:
+                    delay = last_start + min_interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                last_start = time.monotonic()
+                try:
+                    task = start()
+                except vmodl.MethodFault as fault:
+                    yield key, vim.TaskInfo.State.error, fault
+                    continue
+                if task is None:
+                    yield key, vim.TaskInfo.State.success, None
+                    continue
+                filter_spec = async_collector.create_task_filter_spec([task])
+                running[group] += 1
+                in_flight[str(task)] = (key, collector.CreateFilter(filter_spec, True), {},
+                                        group)
+            if not in_flight:
+                break
+
+            update = collector.WaitForUpdatesEx(version, wait_options)
+            if update is None:
+                continue
+            version = update.version
+            for filter_set in update.filterSet:
+                for obj_set in filter_set.objectSet:
+                    if str(obj_set.obj) not in in_flight:
+                        continue
+                    key, pcfilter, info, group = in_flight[str(obj_set.obj)]
+                    for change in obj_set.changeSet:
+                        info[change.name] = change.val
+                    state = info.get('info.state')
+                    if state == vim.TaskInfo.State.success:
+                        value = info.get('info.result')
+                    elif state == vim.TaskInfo.State.error:
+                        value = info.get('info.error')
+                    else:
+                        continue
+                    del in_flight[str(obj_set.obj)]
+                    running[group] -= 1
+                    pcfilter.DestroyPropertyFilter()
+                    yield key, state, value
+    finally:
+        for _, pcfilter, _, _ in in_flight.values():
+            pcfilter.DestroyPropertyFilter()
+        collector.DestroyPropertyCollector()
@@ -19,11 +19,38 @@ virtual machine objects
 """
 __author__ = "VMware, Inc."
 
+# the columns of vm_record
+VM_COLUMNS = ['name', 'template', 'path', 'guest', 'instance_uuid', 'bios_uuid',
+              'annotation', 'state', 'tools_status', 'ip', 'question']
 
-def print_vm_info(vm, depth=1, max_depth=10):
+
+def vm_record(summary):
+    """
+    Convert the summary of a virtual machine to a record for an
+    output.RecordWriter, with the keys of VM_COLUMNS
+    """
+    guest = summary.guest
+    question = summary.runtime.question
+    return {
+        'name': summary.config.name,
+        'template': summary.config.template,
+        'path': summary.config.vmPathName,
+        'guest': summary.config.guestFullName,
+        'instance_uuid': summary.config.instanceUuid,
+        'bios_uuid': summary.config.uuid,
+        'annotation': summary.config.annotation or None,
+        'state': summary.runtime.powerState,
+        'tools_status': guest.toolsStatus if guest is not None else None,
+        'ip': (guest.ipAddress or None) if guest is not None else None,
+        'question': question.text if question is not None else None,
+    }
+
+
+def print_vm_info(vm, depth=1, max_depth=10, writer=None):
     """
     Print information for a particular virtual machine or recurse into a
-    folder with depth protection
+    folder with depth protection. With an output.RecordWriter the VM is
+    written as a vm_record instead.
     """
 
     # if this is a group it will have children. if it does, recurse into them
@@ -33,21 +60,21 @@ def print_vm_info(vm, depth=1, max_depth=10):
             return
         vm_list = vm.childEntity
         for child_vm in vm_list:
-            print_vm_info(child_vm, depth + 1)
+            print_vm_info(child_vm, depth + 1, max_depth, writer)
         return
 
-    summary = vm.summary
-    print("Name       :", summary.config.name)
-    print("Path       :", summary.config.vmPathName)
-    print("Guest      :", summary.config.guestFullName)
-    annotation = summary.config.annotation
-    if annotation:
-        print("Annotation :", annotation)
-    print("State      :", summary.runtime.powerState)
-    if summary.guest is not None:
-        ip = summary.guest.ipAddress
-        if ip:
-            print("IP         :", ip)
-    if summary.runtime.question is not None:
-        print("Question  :", summary.runtime.question.text)
-    print("")
+    record = vm_record(vm.summary)
+    if writer is not None:
+        writer.write(record)
+        return
+    lines = ["Name       : %s" % record['name'],
+             "Path       : %s" % record['path'],
+             "Guest      : %s" % record['guest']]
+    if record['annotation']:
+        lines.append("Annotation : %s" % record['annotation'])
+    lines.append("State      : %s" % record['state'])
+    if record['ip']:
+        lines.append("IP         : %s" % record['ip'])
+    if record['question'] is not None:
+        lines.append("Question  : %s" % record['question'])
+    print('\n'.join(lines) + '\n')
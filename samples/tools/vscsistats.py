@@ -0,0 +1,213 @@
+# VMware vSphere Python SDK Community Samples Addons
+# Copyright (c) 2014-2021 VMware, Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module implements a collector for the VscsiStats service of vCenter
+Server's Service Manager.
+
+"FetchAllHistograms" returns the histograms in the vscsiStats text format:
+
+    Histogram: Latency of IOs in Microseconds (us) for virtual machine
+        worldGroupID : 12345, virtual disk handleID : 8192 (scsi0:0) {
+     min : 102
+     ...
+       {
+          10               (<=                   100)
+          ...
+          0                (>                 100000)
+       }
+    }
+
+parse_histograms turns them into Histogram objects keyed by world group,
+disk handle and histogram name. The bucket limits and counts are NumPy
+arrays when NumPy is installed and lists otherwise; percentiles and the
+difference of two snapshots are computed on them.
+
+The VscsiStats service of every host is looked up once with get_services
+and reused for all commands.
+
+Sample Usage:
+
+    services = get_services(si, host_names)
+    run_on_hosts(services, 'StartVscsiStats')
+    before = fetch_hosts(services)
+    ...
+    after = fetch_hosts(services)
+    for key, histogram in after['esx-01'].items():
+        print(key, histogram.diff(before['esx-01'][key]).percentile(99))
+"""
+
+import re
+
+from . import host_service
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__author__ = "VMware, Inc."
+
+_HEADER = re.compile(r'^Histogram:\s*(?P<name>.+?)\s+for virtual machine\s+'
+                     r'worldGroupID\s*:\s*(?P<world_group>\d+)'
+                     r'(?:,\s*virtual disk handleID\s*:\s*(?P<disk>\d+)'
+                     r'(?:\s*\((?P<device>[^)]*)\))?)?\s*\{\s*$')
+_STAT = re.compile(r'^(?P<key>\w+)\s*:\s*(?P<value>-?\d+)$')
+_BUCKET = re.compile(r'^(?P<count>\d+)\s+\((?P<op><=|>)\s*(?P<limit>-?\d+)\)$')
+
+
+def _array(values):
+    return numpy.array(values, dtype=numpy.int64) if numpy is not None else list(values)
+
+
+class Histogram:
+    """
+    One vscsiStats histogram. limits[i] is the upper bound of bucket i, the
+    last bucket counts the values above the last limit.
+    """
+
+    def __init__(self, name, world_group, disk, device, limits, counts, stats=None):
+        self.name = name
+        self.world_group = world_group
+        self.disk = disk
+        self.device = device
+        self.limits = _array(limits)
+        self.counts = _array(counts)
+        self.stats = stats or {}
+
+    @property
+    def key(self):
+        return self.world_group, self.disk, self.name
+
+    @property
+    def total(self):
+        return int(sum(self.counts))
+
+    def percentile(self, percent):
+        """
+        Return the upper limit of the bucket containing the given percentile,
+        None for an empty histogram. Values in the overflow bucket report the
+        last limit.
+        """
+        total = self.total
+        if not total:
+            return None
+        target = total * percent / 100.0
+        if numpy is not None:
+            index = int(numpy.searchsorted(numpy.cumsum(self.counts), target))
+        else:
+            running, index = 0, 0
+            for index, count in enumerate(self.counts):
+                running += count
+                if running >= target:
+                    break
+        return int(self.limits[min(index, len(self.limits) - 1)])
+
+    def diff(self, earlier):
+        """
+        Return the histogram of the IOs counted since the earlier snapshot of
+        the same histogram
+        """
+        if numpy is not None:
+            counts = self.counts - earlier.counts
+        else:
+            counts = [now - before for now, before in zip(self.counts, earlier.counts)]
+        return Histogram(self.name, self.world_group, self.disk, self.device,
+                         self.limits, counts)
+
+
+def parse_histograms(payload):
+    """
+    Parse FetchAllHistograms output into a dict of
+    (world group, disk handle, histogram name) to Histogram. The disk handle
+    is None for the histograms of all disks of a VM.
+    """
+    histograms = {}
+    header = None
+    for line in payload.splitlines():
+        line = line.strip()
+        match = _HEADER.match(line)
+        if match:
+            header = match.groupdict()
+            stats, limits, counts = {}, [], []
+            continue
+        if header is None:
+            continue
+        match = _BUCKET.match(line)
+        if match:
+            if match.group('op') == '<=':
+                limits.append(int(match.group('limit')))
+            counts.append(int(match.group('count')))
+            continue
+        match = _STAT.match(line)
+        if match:
+            stats[match.group('key')] = int(match.group('value'))
+            continue
+        if line == '}' and counts:
+            histogram = Histogram(header['name'], int(header['world_group']),
+                                  int(header['disk']) if header['disk'] else None,
+                                  header['device'], limits, counts, stats)
+            histograms[histogram.key] = histogram
+            header = None
+    return histograms
+
+
+def get_services(si, host_names, workers=8):
+    """
+    Look up the VscsiStats service of all hosts concurrently. Return a dict
+    of host name to the service or the exception raised; hosts without the
+    service map to a LookupError.
+    """
+    def lookup(host_name):
+        service = host_service.get_host_service(si, host_name, 'VscsiStats')
+        if service is None:
+            raise LookupError('VscsiStats service not found on ' + host_name)
+        return service
+
+    return host_service.map_hosts(lookup, host_names, workers)
+
+
+def _map_services(func, services, workers):
+    """
+    Call func(service) for the hosts whose service was found; hosts whose
+    lookup failed keep the exception of the lookup
+    """
+    results = {host_name: service for host_name, service in services.items()
+               if isinstance(service, Exception)}
+    results.update(host_service.map_hosts(
+        lambda host_name: func(services[host_name]),
+        [host_name for host_name in services if host_name not in results], workers))
+    return results
+
+
+def run_on_hosts(services, command, workers=8):
+    """
+    Run a VscsiStats command (StartVscsiStats, ResetVscsiStats,
+    StopVscsiStats) on all hosts concurrently. services is the result of
+    get_services. Return a dict of host name to the command output or the
+    exception raised.
+    """
+    return _map_services(lambda service: service.ExecuteSimpleCommand(arguments=[command]),
+                         services, workers)
+
+
+def fetch_hosts(services, workers=8):
+    """
+    Fetch and parse the histograms of all hosts concurrently. services is the
+    result of get_services. Return a dict of host name to the parsed
+    histograms or the exception raised.
+    """
+    return _map_services(lambda service: parse_histograms(
+        service.ExecuteSimpleCommand(arguments=['FetchAllHistograms'])), services, workers)
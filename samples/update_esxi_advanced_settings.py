@@ -8,11 +8,18 @@ vSphere Python SDK program for updating ESXi Advanced Settings
 Usage:
     python update_esxi_advanced_settings.py -s 192.168.1.200 \
     -u 'administrator@vsphere.local' \
-    -p VMware1! -c VSAN-Cluster -k VSAN.ClomRepairDelay -v 120
+    -p VMware1! --cluster-name VSAN-Cluster --key VSAN.ClomRepairDelay --value 120
+
+The hosts of the cluster are found with one property collector call, and
+the given settings of every host are then read with OptionManager.QueryOptions,
+--parallelism hosts at once and one call per host for keys sharing a prefix
+such as "VSAN.". Hosts that cannot be read are reported and left out. Only
+the hosts whose value differs are updated, the first --canary hosts one at
+a time and the others --parallelism at once.
 """
 
 from pyVmomi import vim, vmodl
-from tools import cli, service_instance, pchelper
+from tools import cli, service_instance, pchelper, host_config
 
 
 def main():
@@ -23,11 +30,23 @@ def main():
 
     parser = cli.Parser()
     parser.add_required_arguments(cli.Argument.CLUSTER_NAME)
-    parser.add_custom_argument('--key', required=True, action='store',
-                               help='Name of ESXi Advanced Setting to update')
-    parser.add_custom_argument('--value', required=True, action='store',
-                               help='Value of the ESXi Advanced Setting to update')
+    parser.add_custom_argument('--key', required=True, action='append',
+                               help='Name of ESXi Advanced Setting to update, '
+                                    'may be given several times')
+    parser.add_custom_argument('--value', required=True, action='append',
+                               help='Value of the ESXi Advanced Setting to update, '
+                                    'one per --key')
+    parser.add_custom_argument('--parallelism', required=False, type=int, default=8,
+                               help='Number of hosts updated concurrently')
+    parser.add_custom_argument('--canary', required=False, type=int, default=1,
+                               help='Number of hosts updated first, one at a time; '
+                                    'the rollout stops if one of them fails')
+    parser.add_custom_argument('--dry-run', required=False, action='store_true',
+                               help='Only print the changes')
     args = parser.get_args()
+    if len(args.key) != len(args.value):
+        print("Every --key needs a --value")
+        return -1
     try:
         si = service_instance.connect(args)
 
@@ -35,15 +54,39 @@ def main():
 
         cluster = pchelper.get_obj(content, [vim.ClusterComputeResource], args.cluster_name)
 
-        hosts = cluster.host
+        desired = dict(zip(args.key, args.value))
+        hosts = host_config.read_options(si, cluster, set(desired), args.parallelism)
+        unread = [host for host in hosts if host.error is not None]
+        for host in unread:
+            print("Failed to read the settings of ESXi host %s: %s" % (
+                host.name, getattr(host.error, 'msg', host.error)))
+        hosts = [host for host in hosts if host.error is None]
+        plans = host_config.plan_changes(hosts, desired)
+        print("%d of %d ESXi hosts need changes" % (len(plans), len(hosts)))
         for host in hosts:
-            option_manager = host.configManager.advancedOption
-            option = vim.option.OptionValue(key=args.key,
-                                            value=int(args.value))
-            print("Updating %s on ESXi host %s "
-                  "with value of %s" % (args.key, host.name, args.value))
-            if option_manager.UpdateOptions(changedValue=[option]):
-                print("Settings updated!")
+            for key in desired:
+                if key not in host.values:
+                    print("ESXi host %s has no setting %s" % (host.name, key))
+
+        if args.dry_run:
+            for host, changes in plans:
+                for option in changes:
+                    print("%s: %s %s -> %s" % (host.name, option.key,
+                                               host.values[option.key], option.value))
+            return 0
+
+        failed = len(unread)
+        for result in host_config.rollout(plans, args.parallelism, args.canary):
+            changes = ', '.join('%s=%s' % (o.key, o.value) for o in result.changes)
+            if result.error is None:
+                print("Updated %s on ESXi host %s" % (changes, result.host_name))
+            else:
+                failed += 1
+                print("Failed to update %s on ESXi host %s: %s" % (
+                    changes, result.host_name, getattr(result.error, 'msg', result.error)))
+        if failed:
+            return -1
+        print("Settings updated!")
 
     except vmodl.MethodFault as ex:
         print("Caught vmodl fault : " + ex.msg)
@@ -1,9 +1,8 @@
 #!/usr/bin/env python
 
 import ast
-import ssl
-from pyVmomi import pbm, VmomiSupport
-from tools import cli, service_instance
+from pyVmomi import pbm
+from tools import cli, service_instance, pbmhelper
 
 """
 Example of using Storage Policy Based Management (SPBM) API
@@ -15,33 +14,6 @@ Required Prviledge: Profile-driven storage update
 __author__ = 'William Lam'
 
 
-# retrieve SPBM API endpoint
-def get_pbm_connection(vpxd_stub):
-    from http import cookies
-    import pyVmomi
-    session_cookie = vpxd_stub.cookie.split('"')[1]
-    http_context = VmomiSupport.GetHttpContext()
-    cookie = cookies.SimpleCookie()
-    cookie["vmware_soap_session"] = session_cookie
-    http_context["cookies"] = cookie
-    VmomiSupport.GetRequestContext()["vcSessionCookie"] = session_cookie
-    hostname = vpxd_stub.host.split(":")[0]
-
-    context = None
-    if hasattr(ssl, "_create_unverified_context"):
-        context = ssl._create_unverified_context()
-    pbm_stub = pyVmomi.SoapStubAdapter(
-        host=hostname,
-        version="pbm.version.version1",
-        path="/pbm/sdk",
-        poolSize=0,
-        sslContext=context)
-    pbm_si = pbm.ServiceInstance("ServiceInstance", pbm_stub)
-    pbm_content = pbm_si.RetrieveContent()
-
-    return pbm_si, pbm_content
-
-
 # Create required SPBM Capability object from python dict
 def _dict_to_capability(d):
     return [
@@ -98,24 +70,13 @@ def main():
     si = service_instance.connect(args)
 
     # Connect to SPBM Endpoint
-    pbm_si, pbm_content = get_pbm_connection(si._stub)
+    pbm_content = pbmhelper.get_pbm_content(si._stub)
 
     pm = pbm_content.profileManager
-    profile_ids = pm.PbmQueryProfile(
-        resourceType=pbm.profile.ResourceType(resourceType="STORAGE"),
-        profileCategory="REQUIREMENT"
-    )
-
-    profiles = []
-    if len(profile_ids) > 0:
-        profiles = pm.PbmRetrieveContent(profileIds=profile_ids)
+    catalogue = pbmhelper.get_profile_catalogue(pm)
 
     # Attempt to find profile name given by user
-    vm_profile = None
-    for profile in profiles:
-        if profile.name == args.policy_name:
-            vm_profile = profile
-            break
+    vm_profile = catalogue.by_name(args.policy_name)
 
     if vm_profile:
         # Convert string to dict
@@ -124,6 +85,7 @@ def main():
         print("Updating VM Storage Policy %s with %s ..." % (
             args.policy_name, args.policy_rule))
         update_profile(pm, vm_profile, vm_policy_rules)
+        catalogue.invalidate(vm_profile.profileId)
     else:
         print("Unable to find VM Storage Policy %s " % args.policy_name)
 
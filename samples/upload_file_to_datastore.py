@@ -2,24 +2,40 @@
 
 """
 Example for file upload to datastore
+
+The file is streamed from disk with large buffers. --download fetches
+--remote-file-path into --local-file-path instead. With --sync-dir,
+--local-file-path and --remote-file-path are directories that are
+synchronized concurrently; files whose size and modification time already
+match on the target side are skipped. --datastore-name accepts a comma
+separated list of datastores to stage the same content on all of them.
+
+Example:
+
+python upload_file_to_datastore.py ... --datastore-name ds1,ds2,ds3
+    --local-file-path ./iso --remote-file-path iso --sync-dir --workers 16
 """
 
-import ssl
 import requests
-from pyVmomi import vim, vmodl
-from tools import cli, service_instance
+from pyVmomi import vmodl
+from tools import cli, service_instance, datastore_transfer
 
 
 def main():
     parser = cli.Parser()
     parser.add_required_arguments(cli.Argument.DATASTORE_NAME)
-    parser.add_optional_arguments(cli.Argument.LOCAL_FILE_PATH, cli.Argument.REMOTE_FILE_PATH)
+    parser.add_optional_arguments(cli.Argument.LOCAL_FILE_PATH, cli.Argument.REMOTE_FILE_PATH,
+                                  cli.Argument.DATACENTER_NAME)
+    parser.add_custom_argument('--download', required=False, action='store_true',
+                               help='Download from the datastore instead of uploading')
+    parser.add_custom_argument('--sync-dir', required=False, action='store_true',
+                               help='Synchronize directory trees instead of a single file')
+    parser.add_custom_argument('--workers', required=False, action='store', type=int,
+                               default=8, help='Number of concurrent file transfers')
     args = parser.get_args()
 
-    verify_cert = None
+    verify_cert = True
     if args.disable_ssl_verification:
-        ssl_context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
-        ssl_context.verify_mode = ssl.CERT_NONE
         verify_cert = False
         # disable urllib3 warnings
         requests.packages.urllib3.disable_warnings(
@@ -27,72 +43,53 @@ def main():
 
     try:
         si = service_instance.connect(args)
-        content = si.RetrieveContent()
-        # session_manager = content.sessionManager
-
-        # Get the list of all datacenters we have available to us
-        datacenters_object_view = content.viewManager.CreateContainerView(
-            content.rootFolder,
-            [vim.Datacenter],
-            True)
-
-        # Find the datastore and datacenter we are using
-        datacenter = None
-        datastore = None
-        for dc_obj in datacenters_object_view.view:
-            datastores_object_view = content.viewManager.CreateContainerView(
-                dc_obj,
-                [vim.Datastore],
-                True)
-            for ds_obj in datastores_object_view.view:
-                if ds_obj.info.name == args.datastore_name:
-                    datacenter = dc_obj
-                    datastore = ds_obj
-        if not datacenter or not datastore:
-            print("Could not find the datastore specified")
+
+        # Find the datastores and their datacenters in one pass
+        try:
+            locations = datastore_transfer.locate_datastores(
+                si, [name.strip() for name in args.datastore_name.split(',')],
+                args.datacenter_name)
+        except RuntimeError as error:
+            print(error)
             raise SystemExit(-1)
-        # Clean up the views now that we have what we need
-        datastores_object_view.Destroy()
-        datacenters_object_view.Destroy()
+
+        if args.sync_dir:
+            results = datastore_transfer.sync_tree(si, args.host, locations,
+                                                   args.local_file_path,
+                                                   args.remote_file_path,
+                                                   download=args.download,
+                                                   workers=args.workers,
+                                                   verify=verify_cert)
+            failed = [result for result in results if result.error]
+            for result in failed:
+                print("[%s] %s failed: %s"
+                      % (result.datastore_name, result.remote_path, result.error))
+            print("%d transferred, %d up to date, %d failed, %d bytes"
+                  % (len([r for r in results if not r.skipped and not r.error]),
+                     len([r for r in results if r.skipped]), len(failed),
+                     sum(result.size for result in results)))
+            raise SystemExit(-1 if failed else 0)
 
         # Build the url to put the file - https://hostname:port/resource?params
-        if not args.remote_file_path.startswith("/"):
-            remote_file = "/" + args.remote_file_path
-        else:
-            remote_file = args.remote_file_path
-        resource = "/folder" + remote_file
-        params = {"dsName": datastore.info.name,
-                  "dcPath": datacenter.name}
-        http_url = "https://" + args.host + ":443" + resource
-
-        # Get the cookie built from the current session
-        client_cookie = si._stub.cookie
-        # Break apart the cookie into it's component parts - This is more than
-        # is needed, but a good example of how to break apart the cookie
-        # anyways. The verbosity makes it clear what is happening.
-        cookie_name = client_cookie.split("=", 1)[0]
-        cookie_value = client_cookie.split("=", 1)[1].split(";", 1)[0]
-        cookie_path = client_cookie.split("=", 1)[1].split(";", 1)[1].split(
-            ";", 1)[0].lstrip()
-        cookie_text = " " + cookie_value + "; $" + cookie_path
-        # Make a cookie
-        cookie = dict()
-        cookie[cookie_name] = cookie_text
-
-        # Get the request headers set up
-        headers = {'Content-Type': 'application/octet-stream'}
-
-        # Get the file to upload ready, extra protection by using with against
-        # leaving open threads
-        with open(args.local_file_path, "rb") as file_data:
-            # Connect and upload the file
-            requests.put(http_url,
-                         params=params,
-                         data=file_data,
-                         headers=headers,
-                         cookies=cookie,
-                         verify=verify_cert)
-        print("uploaded the file")
+        # The session carries the cookie of the current vCenter session
+        session = datastore_transfer.create_session(si, pool_size=1, verify=verify_cert)
+        try:
+            if args.download:
+                url, params = datastore_transfer.datastore_url(args.host, locations[0],
+                                                               args.remote_file_path)
+                datastore_transfer.download_file(session, url, params, args.local_file_path)
+                print("downloaded the file")
+            else:
+                for location in locations:
+                    url, params = datastore_transfer.datastore_url(args.host, location,
+                                                                   args.remote_file_path)
+                    datastore_transfer.upload_file(session, url, params, args.local_file_path)
+                print("uploaded the file")
+        except requests.RequestException as ex:
+            print("Transfer failed : " + str(ex))
+            raise SystemExit(-1)
+        finally:
+            session.close()
 
     except vmodl.MethodFault as ex:
         print("Caught vmodl fault : " + ex.msg)
@@ -103,31 +100,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
-# This may or may not be useful to the person who writes the download example
-# def download(remote_file_path, local_file_path):
-#    resource = "/folder/%s" % remote_file_path.lstrip("/")
-#    url = self._get_url(resource)
-#
-#    if sys.version_info >= (2, 6):
-#        resp = self._do_request(url)
-#        CHUNK = 16 * 1024
-#        fd = open(local_file_path, "wb")
-#        while True:
-#            chunk = resp.read(CHUNK)
-#            if not chunk: break
-#            fd.write(chunk)
-#        fd.close()
-#    else:
-#        urllib.urlretrieve(url, local_file_path)
-#
-
-# This may or may not be useful to the person who tries to use a service
-# request in the future
-
-# Get the service request set up
-#        service_request_spec = vim.SessionManager.HttpServiceRequestSpec(
-#            method='httpPut', url=http_url)
-#        ticket = session_manager.AcquireGenericServiceTicket(
-#            service_request_spec)
@@ -8,13 +8,44 @@ http://www.apache.org/licenses/LICENSE-2.0.html
 
 Example script to upload a file from host to guest
 
+The file is streamed from disk, so payloads larger than the available memory
+can be uploaded. --local-file-path may also be a directory, which is copied
+recursively below --remote-file-path, and --extra-files adds more files to the
+same guest directory. With --vm-name-pattern and/or --vm-list the transfer is
+run concurrently on every matching VM over one pooled HTTPS session.
+--download fetches --remote-file-path from the guest instead.
+
+The HTTPS transfers verify the certificate of the ESXi host unless
+-nossl/--disable-ssl-verification is given; earlier versions of this sample
+never verified it, so hosts with self-signed certificates now need -nossl.
+
+Example:
+
+python upload_file_to_vm.py ... --vm-user root --vm-password secret
+    --vm-name-pattern "web-*" --local-file-path ./agent-bundle
+    --remote-file-path /opt --workers 32
+
 """
-import re
+import os
 import requests
-from tools import cli, service_instance, pchelper
+from tools import cli, service_instance, pchelper, guestops
 from pyVmomi import vim, vmodl
 
 
+def print_results(results):
+    """
+    Print one line per failed transfer and a summary
+    """
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        print("%s: %s -> %s failed: %s"
+              % (result.vm_name, result.local_path, result.guest_path, result.error))
+    print("%d of %d transfers succeeded, %d bytes"
+          % (len(results) - len(failed), len(results),
+             sum(result.size for result in results)))
+    return 1 if failed else 0
+
+
 def main():
     """
     Simple command-line program for Uploading a file from host to guest
@@ -25,6 +56,17 @@ def main():
     parser.add_required_arguments(cli.Argument.VM_USER, cli.Argument.VM_PASS,
                                   cli.Argument.REMOTE_FILE_PATH, cli.Argument.LOCAL_FILE_PATH)
     parser.add_optional_arguments(cli.Argument.VM_NAME, cli.Argument.UUID)
+    parser.add_custom_argument('--extra-files', required=False, nargs='+', default=[],
+                               help='More local files to upload into --remote-file-path')
+    parser.add_custom_argument('--download', required=False, action='store_true',
+                               help='Download --remote-file-path from the guest to '
+                                    '--local-file-path')
+    parser.add_custom_argument('--vm-name-pattern', required=False, action='store',
+                               help='Transfer to every VM whose name matches this glob pattern')
+    parser.add_custom_argument('--vm-list', required=False, action='store',
+                               help='Transfer to every VM named in this file, one name per line')
+    parser.add_custom_argument('--workers', required=False, action='store', type=int,
+                               default=16, help='Number of VMs processed concurrently')
     args = parser.get_args()
 
     vm_path = args.remote_file_path
@@ -32,6 +74,29 @@ def main():
         si = service_instance.connect(args)
         content = si.RetrieveContent()
 
+        creds = vim.vm.guest.NamePasswordAuthentication(
+            username=args.vm_user, password=args.vm_password)
+        verify = not args.disable_ssl_verification
+
+        multi_file = not args.download and (os.path.isdir(args.local_file_path) or
+                                            args.extra_files)
+        if multi_file:
+            pairs = guestops.expand_local_paths([args.local_file_path] + args.extra_files,
+                                                vm_path)
+        else:
+            pairs = [(args.local_file_path, vm_path)]
+
+        if args.vm_name_pattern or args.vm_list:
+            names = guestops.read_vm_list(args.vm_list) if args.vm_list else None
+            vms = guestops.select_vms(si, names=names, pattern=args.vm_name_pattern)
+            if not vms:
+                raise SystemExit("Unable to locate any VirtualMachine.")
+            print("Transferring %d files on %d VMs" % (len(pairs), len(vms)))
+            results = guestops.transfer_to_vms(si, vms, creds, pairs, args.host,
+                                               workers=args.workers, verify=verify,
+                                               download=args.download)
+            return print_results(results)
+
         vm = None
         if args.uuid:
             search_index = si.content.searchIndex
@@ -53,30 +118,35 @@ def main():
                 "Rerun the script after verifying that VMWareTools "
                 "is running")
 
-        creds = vim.vm.guest.NamePasswordAuthentication(
-            username=args.vm_user, password=args.vm_pwd)
-        with open(args.local_file_path, 'rb') as myfile:
-            data_to_send = myfile.read()
-
+        if multi_file:
+            results = guestops.transfer_to_vms(si, [(vm, vm.name, 'guestToolsRunning')],
+                                               creds, pairs, args.host, workers=1,
+                                               verify=verify)
+            return print_results(results)
+
+        # When : host argument becomes https://*:443/guestFile?
+        # Ref: https://github.com/vmware/pyvmomi/blob/master/docs/ \
+        #            vim/vm/guest/FileManager.rst
+        # Script fails in that case, saying URL has an invalid label.
+        # guestops.fix_transfer_url puts the hostname in place.
+        file_manager = content.guestOperationsManager.fileManager
+        session = guestops.create_session(pool_size=1, verify=verify)
         try:
-            file_attribute = vim.vm.guest.FileManager.FileAttributes()
-            url = content.guestOperationsManager.fileManager. \
-                InitiateFileTransferToGuest(vm, creds, vm_path,
-                                            file_attribute,
-                                            len(data_to_send), True)
-            # When : host argument becomes https://*:443/guestFile?
-            # Ref: https://github.com/vmware/pyvmomi/blob/master/docs/ \
-            #            vim/vm/guest/FileManager.rst
-            # Script fails in that case, saying URL has an invalid label.
-            # By having hostname in place will take take care of this.
-            url = re.sub(r"^https://\*:", "https://"+str(args.host)+":", url)
-            resp = requests.put(url, data=data_to_send, verify=False)
-            if not resp.status_code == 200:
-                print("Error while uploading file")
+            if args.download:
+                guestops.download_file(file_manager, session, vm, creds, vm_path,
+                                       args.local_file_path, args.host)
+                print("Successfully downloaded file")
             else:
+                guestops.upload_file(file_manager, session, vm, creds, args.local_file_path,
+                                     vm_path, args.host)
                 print("Successfully uploaded file")
+        except requests.HTTPError:
+            print("Error while uploading file" if not args.download
+                  else "Error while downloading file")
         except IOError as ex:
             print(ex)
+        finally:
+            session.close()
     except vmodl.MethodFault as error:
         print("Caught vmodl fault : " + error.msg)
         return -1
@@ -9,9 +9,15 @@ and also enable the auto restart settings of virtual machines
 (which are powered on at the time of script execution)
 running on the host in a random order.
 This scrpt can be tailored to adjust more settings within
+
+With --batched the names and power states of all hosts and VMs are read in
+one property collector call, one AutoStartManager config holding the
+settings of every VM is built per host and the hosts are reconfigured
+concurrently.
 """
 import sys
-from pyVmomi import vim
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim, vmodl
 from tools import cli, service_instance
 sys.dont_write_bytecode = True
 
@@ -78,6 +84,89 @@ def enable_autorestart(host, defstartdelay):
             host.configManager.autoStartManager.ReconfigureAutostart(spec)
 
 
+def collect_hosts_and_vms(conn):
+    """
+    Read the names and AutoStartManagers of all hosts and the names, power
+    states and hosts of all VMs in one property collector call.
+    Returns a dict of host name to (AutoStartManager, [(vm, name, power state)]).
+    """
+    content = conn.RetrieveContent()
+    container = content.viewManager.CreateContainerView(
+        content.rootFolder, [vim.HostSystem, vim.VirtualMachine], True)
+    try:
+        pc = vmodl.query.PropertyCollector
+        filter_spec = pc.FilterSpec(
+            objectSet=[pc.ObjectSpec(obj=container, skip=True, selectSet=[pc.TraversalSpec(
+                name='traverseEntities', path='view', skip=False,
+                type=vim.view.ContainerView)])],
+            propSet=[pc.PropertySpec(type=vim.HostSystem,
+                                     pathSet=['name', 'configManager.autoStartManager']),
+                     pc.PropertySpec(type=vim.VirtualMachine,
+                                     pathSet=['name', 'runtime.powerState', 'runtime.host'])])
+        objects = content.propertyCollector.RetrieveContents([filter_spec])
+    finally:
+        container.Destroy()
+
+    hosts, vms = {}, []
+    for obj in objects:
+        props = {prop.name: prop.val for prop in obj.propSet}
+        if isinstance(obj.obj, vim.HostSystem):
+            hosts[str(obj.obj)] = (props.get('name'),
+                                   props.get('configManager.autoStartManager'), [])
+        else:
+            vms.append((obj.obj, props))
+    for vm, props in vms:
+        host = hosts.get(str(props.get('runtime.host')))
+        if host is not None:
+            host[2].append((vm, props.get('name'), props.get('runtime.powerState')))
+    return {name: (manager, host_vms) for name, manager, host_vms in hosts.values()}
+
+
+def build_autostart_config(vms, defstartdelay):
+    """
+    Build one AutoStartManager config that powers on the VMs which are
+    powered on now and disables auto start of the others
+    """
+    config = vim.host.AutoStartManager.Config()
+    config.defaults = vim.host.AutoStartManager.SystemDefaults(
+        enabled=True, startDelay=int(defstartdelay))
+    for vm, _, power_state in vms:
+        auto_power_info = vim.host.AutoStartManager.AutoPowerInfo(
+            key=vm, startDelay=-1, startOrder=-1, stopAction='None', stopDelay=-1,
+            waitForHeartbeat='no')
+        if power_state == "poweredOn":
+            auto_power_info.startAction = 'powerOn'
+        else:
+            auto_power_info.startAction = 'None'
+        config.powerInfo.append(auto_power_info)
+    return config
+
+
+def enable_autorestart_batched(connection, comma_list, defstartdelay, workers):
+    print("Actioning the Provided Hosts")
+    acthosts = comma_list.split(",")
+    hosts = collect_hosts_and_vms(connection)
+    for action_host in acthosts:
+        if action_host not in hosts:
+            print("The host cant be found " + action_host)
+
+    def reconfigure(host_name):
+        manager, vms = hosts[host_name]
+        try:
+            manager.ReconfigureAutostart(build_autostart_config(vms, defstartdelay))
+        except vmodl.MethodFault as ex:
+            return host_name, len(vms), ex.msg
+        return host_name, len(vms), None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for host_name, vm_count, error in executor.map(
+                reconfigure, [h for h in acthosts if h in hosts]):
+            if error:
+                print("Failed to apply Auto Start settings to %s: %s" % (host_name, error))
+            else:
+                print("Applied Auto Start settings of %d VMs to %s" % (vm_count, host_name))
+
+
 # MAIN
 parser = cli.Parser()
 parser.add_custom_argument('--listallhosts', required=False, action='store_true')
@@ -86,6 +175,10 @@ parser.add_custom_argument('--actionhosts',
                            required=False, action='store')
 parser.add_custom_argument('--defstartdelay', help='Default Startup Delay',
                            default=10, required=False, action='store')
+parser.add_custom_argument('--batched', required=False, action='store_true',
+                           help='Apply one config per host to all hosts concurrently')
+parser.add_custom_argument('--workers', help='Number of hosts reconfigured concurrently',
+                           type=int, default=8, required=False, action='store')
 args = parser.get_args()
 print("Starting")
 print("Getting Config")
@@ -99,5 +192,8 @@ if args.listallhosts is True:
         print("\n" + host.name)
 
 if args.actionhosts is not None:
-    action_hosts(
-        args.actionhosts, si, args.defstartdelay)
+    if args.batched:
+        enable_autorestart_batched(si, args.actionhosts, args.defstartdelay, args.workers)
+    else:
+        action_hosts(
+            args.actionhosts, si, args.defstartdelay)
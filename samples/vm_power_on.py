@@ -17,11 +17,45 @@
 
 """
 Python program for powering on VMs
+
+The VMs are looked up in one property collector call and the operations are
+submitted with a limit on the number of running tasks, overall and per
+host, and optionally on the number of tasks started per second.
+--operation also allows powering off, resetting, shutting down or
+rebooting the guests, or destroying the VMs after a confirmation.
+
+With --multi, which only applies to --operation on, the VMs are powered on
+per datacenter with PowerOnMultiVM_Task in batches of --batch-size, so DRS
+places every batch at once, and failed VMs are retried --retries times.
 """
 
 from pyVmomi import vim, vmodl
-from tools import cli, service_instance
-from tools.tasks import wait_for_tasks
+from tools import cli, service_instance, power
+
+
+def power_on_multi(si, args):
+    """
+    Power on the VMs with PowerOnMultiVM_Task batches per datacenter
+    """
+    vms, missing = power.find_vms_by_datacenter(si, args.vm_name)
+    for name in missing:
+        print("Virtual Machine %s not found" % name)
+    failed = 0
+    for result in power.power_on_by_datacenter(si, vms, args.batch_size, args.retries,
+                                               args.max_in_flight):
+        if result.state == 'recommended':
+            print("%s: not powered on, DRS recommends %s" % (
+                result.vm_name, result.error.reasonText or result.error.reason))
+        elif result.state == 'skipped':
+            print("%s: skipped (%s)" % (result.vm_name, result.error))
+        elif result.state != 'success':
+            failed += 1
+            print("%s: power on failed: %s" % (result.vm_name,
+                                               getattr(result.error, 'msg', result.error)))
+    if failed:
+        print("%d VM(s) failed to power on" % failed)
+    else:
+        print("Virtual Machine(s) have been powered on successfully")
 
 
 def main():
@@ -32,7 +66,30 @@ def main():
     parser = cli.Parser()
     parser.add_custom_argument('-v', '--vm-name', required=True, action='append',
                                help='Names of the Virtual Machines to power on')
+    parser.add_custom_argument('--operation', required=False, default='on',
+                               choices=sorted(power.OPERATIONS),
+                               help='Power operation to run, default is on. destroy powers '
+                                    'off running VMs first')
+    parser.add_custom_argument('--max-in-flight', required=False, type=int, default=16,
+                               help='Maximum number of running tasks')
+    parser.add_custom_argument('--max-per-host', required=False, type=int, default=4,
+                               help='Maximum number of running tasks per host')
+    parser.add_custom_argument('--max-per-second', required=False, type=float, default=None,
+                               help='Maximum number of tasks started per second')
+    parser.add_custom_argument('--multi', required=False, action='store_true',
+                               help='Power on with Datacenter.PowerOnMultiVM_Task batches, '
+                                    'only with --operation on')
+    parser.add_custom_argument('--batch-size', required=False, type=int, default=50,
+                               help='Number of VMs per PowerOnMultiVM_Task with --multi')
+    parser.add_custom_argument('--retries', required=False, type=int, default=1,
+                               help='Number of times failed VMs are retried with --multi')
     args = parser.get_args()
+    try:
+        power.check_operation(args.operation, args.multi)
+    except ValueError as error:
+        print("Invalid arguments: %s" % error)
+        return
+
     # form a connection...
     si = service_instance.connect(args)
 
@@ -41,22 +98,45 @@ def main():
         if not vmnames:
             print("No virtual machine specified for poweron")
 
-        # Retreive the list of Virtual Machines from the inventory objects
-        # under the rootFolder
-        content = si.content
-        obj_view = content.viewManager.CreateContainerView(content.rootFolder,
-                                                           [vim.VirtualMachine],
-                                                           True)
-        vm_list = obj_view.view
-        obj_view.Destroy()
+        if args.multi:
+            power_on_multi(si, args)
+            return
 
-        # Find the vm and power it on
-        tasks = [vm.PowerOn() for vm in vm_list if vm.name in vmnames]
+        vms, missing = power.find_vms(si, vmnames)
+        for name in missing:
+            print("Virtual Machine %s not found" % name)
 
-        # Wait for power on to complete
-        wait_for_tasks(si, tasks)
+        operations = [args.operation]
+        if args.operation == 'destroy':
+            if not vms or not cli.prompt_y_n_question(
+                    "Are you sure you want to destroy %d VM(s): %s?" % (
+                        len(vms), ', '.join(name for _, name, _, _ in vms))):
+                print("No VM destroyed")
+                return
+            operations = ['off', 'destroy']
+        failed = 0
+        for operation in operations:
+            results = {}
+            for result in power.run_power_operation(si, vms, operation, args.max_in_flight,
+                                                    args.max_per_host, args.max_per_second):
+                # names are not unique, the results are keyed by VM
+                results[str(result.vm)] = result
+                if result.state == 'error':
+                    failed += 1
+                    print("%s: %s failed: %s" % (result.vm_name, operation,
+                                                 getattr(result.error, 'msg', result.error)))
+                elif result.state == 'skipped' and operation != 'off':
+                    print("%s: %s skipped (%s)" % (result.vm_name, operation, result.error))
+            if operation == 'off':
+                # only destroy the VMs that are powered off now
+                vms = [(vm, name, vim.VirtualMachinePowerState.poweredOff, host)
+                       for vm, name, _, host in vms if results[str(vm)].state != 'error']
 
-        print("Virtual Machine(s) have been powered on successfully")
+        if failed:
+            print("%d operation(s) failed" % failed)
+        else:
+            print("Virtual Machine(s) have been powered on successfully"
+                  if args.operation == 'on' else "Operation %s completed" % args.operation)
     except vmodl.MethodFault as error:
         print("Caught vmodl fault : " + error.msg)
     except Exception as error:
@@ -39,6 +39,7 @@ from pyVim.connect import SmartConnect, Disconnect
 import pyVmomi
 import vsanmgmtObjects
 import vsanapiutils
+from vsanspaceutils import SpaceUsageTable
 
 def GetArgs():
    """
@@ -65,7 +66,14 @@ def GetArgs():
    parser.add_argument('--cluster', dest='clusterName', metavar="CLUSTER",
                       default='VSAN-Cluster',
                       help='The name of the vSAN cluster which the space usage '
-                           'query is going to perform on')
+                           'query is going to perform on. Several clusters '
+                           'can be given as a comma separated list')
+   parser.add_argument('--csv', metavar='FILE', action='store',
+                       help='Append the space usage by object type to the '
+                            'given CSV file')
+   parser.add_argument('--json', metavar='FILE', action='store',
+                       help='Append the space usage by object type to the '
+                            'given file as JSON lines')
    args = parser.parse_args()
    return args
 
@@ -83,7 +91,8 @@ def connectToServers(args, sslContext):
    """
    Creates connections to the vCenter, vSAN and vSAN space reporting system
    @param args
-   @return vc service instance, cluster, vSAN space reporting system
+   @return vc service instance, list of (cluster name, cluster),
+           vSAN space reporting system
    """
    if args.password:
       password = args.password
@@ -113,15 +122,44 @@ def connectToServers(args, sslContext):
    # Get vSAN cluster config system and vsan cluster health system
    vss = vsanStub['vsan-cluster-space-report-system']
 
-   # Get cluster
-   cluster = getClusterInstance(args.clusterName, si)
+   # Get clusters
+   clusters = [(name.strip(), getClusterInstance(name.strip(), si))
+               for name in args.clusterName.split(',')]
 
-   return (si, cluster, vss)
+   return (si, clusters, vss)
 
 def bytesToTibBytes(byteSize):
    tibSize = byteSize / (2**40)
    return round(tibSize, 4)
 
+def printSpaceUsage(clusterName, spaceResult, table):
+   print("vSAN Space Usage Overview of cluster %s" % clusterName)
+   print("Total vSAN Capacity: "
+         "%s TiB" % bytesToTibBytes(spaceResult.totalCapacityB))
+   print("Used vSAN Capacity: "
+         "%s TiB" % bytesToTibBytes(spaceResult.spaceOverview.usedB))
+   print("Free vSAN Capacity: "
+         "%s TiB" % bytesToTibBytes(spaceResult.freeCapacityB))
+
+   if hasattr(spaceResult, 'efficientCapacity') and \
+      spaceResult.efficientCapacity is not None:
+      print("vSAN efficiency (Deduplication / Compression) is enabled")
+      efficiencySavings = \
+         spaceResult.efficientCapacity.logicalCapacityUsed - \
+         spaceResult.efficientCapacity.physicalCapacityUsed
+      print("Space saved by Efficiency: "
+            "%s TiB" % bytesToTibBytes(efficiencySavings))
+
+   if hasattr(spaceResult, 'spaceEfficiencyRatio') and \
+      spaceResult.spaceEfficiencyRatio is not None:
+      print("Space Efficiency Ratio: "
+            "%sx" % spaceResult.spaceEfficiencyRatio.overallRatio)
+
+   print("\nUsed Capacity Breakdown")
+   usedByType = table.totals(clusterName=clusterName)
+   for objType in sorted(usedByType):
+      print("%s: %s TiB" % (objType, bytesToTibBytes(usedByType[objType])))
+
 def main():
    args = GetArgs()
 
@@ -134,12 +172,14 @@ def main():
       sslContext.check_hostname = False
       sslContext.verify_mode = ssl.CERT_NONE
 
-   (si, cluster, vss) = connectToServers(args, sslContext)
+   (si, clusters, vss) = connectToServers(args, sslContext)
+
+   table = SpaceUsageTable()
+   for clusterName, cluster in clusters:
+      if cluster is None:
+         print("Cluster %s is not found for %s" % (clusterName, args.vc))
+         return -1
 
-   if cluster is None:
-      print("Cluster %s is not found for %s" % (args.clusterName, args.vc))
-      return -1
-   else:
       # Here is an example of how to get space reporting results
       # by vSAN space reporting API.
       spaceResult = \
@@ -147,61 +187,17 @@ def main():
 
       if not spaceResult:
          print("Space result is None for the given cluster %s" % \
-            args.clusterName)
+            clusterName)
          return -1
 
-      print("vSAN Space Usage Overview")
-      print("Total vSAN Capacity: "
-            "%s TiB" % bytesToTibBytes(spaceResult.totalCapacityB))
-      print("Used vSAN Capacity: "
-            "%s TiB" % bytesToTibBytes(spaceResult.spaceOverview.usedB))
-      print("Free vSAN Capacity: "
-            "%s TiB" % bytesToTibBytes(spaceResult.freeCapacityB))
-
-      if hasattr(spaceResult, 'efficientCapacity') and \
-         spaceResult.efficientCapacity is not None:
-         print("vSAN efficiency (Deduplication / Compression) is enabled")
-         efficiencySavings = \
-            spaceResult.efficientCapacity.logicalCapacityUsed - \
-            spaceResult.efficientCapacity.physicalCapacityUsed
-         print("Space saved by Efficiency: "
-               "%s TiB" % bytesToTibBytes(efficiencySavings))
-
-      if hasattr(spaceResult, 'spaceEfficiencyRatio') and \
-         spaceResult.spaceEfficiencyRatio is not None:
-         print("Space Efficiency Ratio: "
-               "%sx" % spaceResult.spaceEfficiencyRatio.overallRatio)
-
-      spaceUsageByObjectType = spaceResult.spaceDetail.spaceUsageByObjectType
-      print("\nUsed Capacity Breakdown")
-      print("vdisk: %s TiB" % bytesToTibBytes(sum([
-         obj.usedB for obj in spaceUsageByObjectType
-         if obj.objType == 'vdisk'
-         ])))
-      print("vmswap: %s TiB" % bytesToTibBytes(sum([
-         obj.usedB for obj in spaceUsageByObjectType
-         if obj.objType == 'vmswap'
-         ])))
-      print("statsdb: %s TiB" % bytesToTibBytes(sum([
-         obj.usedB for obj in spaceUsageByObjectType
-         if obj.objType == 'statsdb'
-         ])))
-      print("namespace: %s TiB" % bytesToTibBytes(sum([
-         obj.usedB for obj in spaceUsageByObjectType
-         if obj.objType == 'namespace'
-         ])))
-      print("traceobject: %s TiB" % bytesToTibBytes(sum([
-         obj.usedB for obj in spaceUsageByObjectType
-         if obj.objType == 'traceobject'
-         ])))
-      print("esaObjectOverhead: %s TiB" % bytesToTibBytes(sum([
-         obj.usedB for obj in spaceUsageByObjectType
-         if obj.objType == 'esaObjectOverhead'
-         ])))
-      print("fileSystemOverhead: %s TiB" % bytesToTibBytes(sum([
-         obj.usedB for obj in spaceUsageByObjectType
-         if obj.objType == 'fileSystemOverhead'
-         ])))
+      table.add(clusterName, spaceResult)
+      printSpaceUsage(clusterName, spaceResult, table)
+      print('')
+
+   if args.csv:
+      table.writeCsv(args.csv)
+   if args.json:
+      table.writeJson(args.json)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (c) 2016-2024 Broadcom. All Rights Reserved.
+The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+
+This file includes sample codes for collecting vSAN health and space usage of
+every vSAN cluster managed by a vCenter Server.
+
+The vSAN enabled clusters are discovered with a single property collector
+call instead of resolving cluster names one datacenter at a time. The cached
+cluster health summary (QueryClusterHealthSummary with fetchFromCache=True)
+and the space usage (QuerySpaceUsage) of the clusters are then queried
+concurrently by a bounded pool of worker threads, and one JSON report with an
+entry per cluster is written to stdout or to the given file.
+
+NOTE: this sample requires Python 3.
+
+"""
+
+__author__ = 'Broadcom, Inc'
+
+import sys
+import ssl
+import json
+import atexit
+import argparse
+import getpass
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append("/usr/lib64/vmware-vpx/vsan-health/")
+sys.path.append("/usr/lib/vmware/site-packages/")
+from pyVmomi import vim, vmodl
+from pyVim.connect import SmartConnect, Disconnect
+
+# Import the vSAN API python bindings and utilities.
+import pyVmomi
+import vsanmgmtObjects
+import vsanapiutils
+from vsanspaceutils import SpaceUsageTable
+
+def GetArgs():
+   """
+   Supports the command-line arguments listed below.
+   """
+   parser = argparse.ArgumentParser(
+       description='vSAN SDK sample application which reports the health '
+                   'summary and the space usage of all vSAN clusters of a '
+                   'vCenter Server as one JSON document.')
+   parser.add_argument('-v', '--vc', required=True, action='store',
+                       help='Remote vCenter Server to connect to')
+   parser.add_argument('-o', '--port', type=int, default=443, action='store',
+                       help='Port to connect on, default is 443')
+   parser.add_argument('-u', '--user', required=True, action='store',
+                       help='User name to use when connecting to '
+                            'vCenter Server')
+   parser.add_argument('-p', '--password', required=False, action='store',
+                       help='Password to use when connecting to vCenter '
+                            'Server. If not provided, it will prompt to '
+                            'ask for manually inputting the password')
+   parser.add_argument('--workers', type=int, default=8, action='store',
+                       help='Number of clusters queried concurrently, '
+                            'default is 8')
+   parser.add_argument('--report', metavar='FILE', action='store',
+                       help='File the JSON report is written to, default is '
+                            'stdout')
+   args = parser.parse_args()
+   return args
+
+def getVsanClusters(si):
+   """
+   Retrieves the name and the vSAN enablement of all clusters in one
+   property collector call.
+   @return list of (cluster, name) for the vSAN enabled clusters
+   """
+   content = si.RetrieveContent()
+   view = content.viewManager.CreateContainerView(
+      content.rootFolder, [vim.ClusterComputeResource], True)
+   try:
+      traversalSpec = vmodl.query.PropertyCollector.TraversalSpec(
+         name='traverseEntities', path='view', skip=False,
+         type=vim.view.ContainerView)
+      objSpec = vmodl.query.PropertyCollector.ObjectSpec(
+         obj=view, skip=True, selectSet=[traversalSpec])
+      propSpec = vmodl.query.PropertyCollector.PropertySpec(
+         type=vim.ClusterComputeResource,
+         pathSet=['name', 'configurationEx.vsanConfigInfo.enabled'])
+      filterSpec = vmodl.query.PropertyCollector.FilterSpec(
+         objectSet=[objSpec], propSet=[propSpec])
+
+      pc = content.propertyCollector
+      result = pc.RetrievePropertiesEx(
+         [filterSpec], vmodl.query.PropertyCollector.RetrieveOptions())
+      objects = []
+      while result is not None:
+         objects.extend(result.objects)
+         if not result.token:
+            break
+         result = pc.ContinueRetrievePropertiesEx(result.token)
+   finally:
+      view.Destroy()
+
+   clusters = []
+   for obj in objects:
+      props = dict((prop.name, prop.val) for prop in obj.propSet)
+      if props.get('configurationEx.vsanConfigInfo.enabled'):
+         clusters.append((obj.obj, props['name']))
+   return clusters
+
+def healthReport(vhs, cluster):
+   healthSummary = vhs.QueryClusterHealthSummary(
+      cluster=cluster, includeObjUuids=False, fetchFromCache=True)
+   clusterStatus = healthSummary.clusterStatus
+   return {
+      'overallHealth': healthSummary.overallHealth,
+      'overallHealthDescription': healthSummary.overallHealthDescription,
+      'healthScore': getattr(healthSummary, 'healthScore', None),
+      'hosts': dict((hostStatus.hostname, hostStatus.status)
+                    for hostStatus in clusterStatus.trackedHostsStatus or [])
+      if clusterStatus else {},
+   }
+
+def spaceReport(vss, cluster):
+   spaceResult = vss.QuerySpaceUsage(cluster=cluster)
+   report = {
+      'totalCapacityB': spaceResult.totalCapacityB,
+      'freeCapacityB': spaceResult.freeCapacityB,
+      'usedB': spaceResult.spaceOverview.usedB
+      if spaceResult.spaceOverview else None,
+   }
+   if getattr(spaceResult, 'spaceEfficiencyRatio', None) is not None:
+      report['spaceEfficiencyRatio'] = \
+         spaceResult.spaceEfficiencyRatio.overallRatio
+   table = SpaceUsageTable()
+   table.add(cluster._moId, spaceResult)
+   report['usedBByObjectType'] = table.totals()
+   return report
+
+def clusterReport(vhs, vss, cluster, name):
+   """
+   Queries the health summary and the space usage of one cluster. A failing
+   query is recorded in the report instead of aborting the other clusters.
+   """
+   report = {'cluster': name, 'moId': cluster._moId}
+   for key, query, system in (('health', healthReport, vhs),
+                              ('space', spaceReport, vss)):
+      try:
+         report[key] = query(system, cluster)
+      except vmodl.MethodFault as e:
+         report[key] = {'error': e.msg or type(e).__name__}
+   return report
+
+def collectReports(vhs, vss, clusters, workers):
+   """
+   Queries all clusters with at most workers concurrent queries.
+   @return list of cluster reports, sorted by cluster name
+   """
+   with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+      reports = list(executor.map(
+         lambda item: clusterReport(vhs, vss, item[0], item[1]), clusters))
+   return sorted(reports, key=lambda report: report['cluster'])
+
+def main():
+   args = GetArgs()
+   if args.password:
+      password = args.password
+   else:
+      password = getpass.getpass(prompt='Enter password for vc %s and '
+                                        'user %s: ' % (args.vc, args.user))
+
+   # The default SSL context has stricter connection handshaking rule, hence
+   # we are turning off the hostname checking and client side cert
+   # verification.
+   sslContext = ssl.create_default_context()
+   sslContext.check_hostname = False
+   sslContext.verify_mode = ssl.CERT_NONE
+
+   si = SmartConnect(host=args.vc,
+                     user=args.user,
+                     pwd=password,
+                     port=int(args.port),
+                     sslContext=sslContext)
+
+   atexit.register(Disconnect, si)
+
+   aboutInfo = si.content.about
+   if aboutInfo.apiType != 'VirtualCenter':
+      print("The sample script should be run against vc.")
+      return -1
+
+   apiVersion = vsanapiutils.GetLatestVmodlVersion(args.vc, int(args.port))
+   vcMos = vsanapiutils.GetVsanVcMos(si._stub,
+                                     context=sslContext,
+                                     version=apiVersion)
+   vhs = vcMos['vsan-cluster-health-system']
+   vss = vcMos['vsan-cluster-space-report-system']
+
+   clusters = getVsanClusters(si)
+   reports = collectReports(vhs, vss, clusters, args.workers)
+
+   report = {'vc': args.vc, 'clusters': reports}
+   if args.report:
+      with open(args.report, 'w') as f:
+         json.dump(report, f, indent=2, sort_keys=True)
+   else:
+      json.dump(report, sys.stdout, indent=2, sort_keys=True)
+      sys.stdout.write('\n')
+
+if __name__ == "__main__":
+   main()
@@ -27,6 +27,7 @@ import argparse
 
 # Import the vSAN API python bindings
 import vsanapiutils
+from vsancnssamples import iterVolumes, updateVolumeMetadataInBatches
 
 # Users can customize the parameters according to your own environment
 DOMAIN_NAME = "VSANFS-PA.PRV"
@@ -138,7 +139,7 @@ def prepareFileVolumeCreateSpec(args, volumeName, datastores=None):
    containerCluster.vSphereUser = args.user
 
    backingOption = vim.cns.VsanFileShareBackingDetails()
-   backingOption.capacityInMb = 1024L
+   backingOption.capacityInMb = 1024
    createSpec = vim.cns.VolumeCreateSpec()
    createSpec.name = volumeName
    createSpec.volumeType = "FILE"
@@ -148,7 +149,7 @@ def prepareFileVolumeCreateSpec(args, volumeName, datastores=None):
       permissions=vim.vsan.FileShareAccessType.READ_WRITE,
       allowRoot=True)]
    cnsFileCreateSpec = vim.cns.VSANFileCreateSpec()
-   cnsFileCreateSpec.softQuotaInMb = 100L
+   cnsFileCreateSpec.softQuotaInMb = 100
    cnsFileCreateSpec.permission = netPermission
    createSpec.createSpec = cnsFileCreateSpec
 
@@ -413,26 +414,22 @@ def main():
    print("Querying file volume with volumeName: %s" % volumeName)
    filterSpec = vim.cns.QueryFilter()
    filterSpec.names = [volumeName]
-   volumeQueryResult = volmgr.Query(filterSpec)
-   print("CNS query result: {}".format(volumeQueryResult))
-   if volumeQueryResult is None:
-      print("ERROR: Query CNS volume failed, result is %s"
-            % volumeQueryResult)
+   volume = next(iterVolumes(volmgr, filterSpec, pageSize=1), None)
+   print("CNS query result: {}".format(volume))
+   if volume is None:
+      print("ERROR: Query CNS volume failed, volume %s is not found"
+            % volumeName)
       return -1
-   volumeId = volumeQueryResult.volumes[0].volumeId
+   volumeId = volume.volumeId
 
    # Update volume metadata
    print("Updating file volume metadata with volumeId: %s" % volumeId.id)
    updateSpecs = prepareFileVolumeMetadataUpdateSpec(args, volumeId)
-   cnsUpdateTask = volmgr.UpdateVolumeMetadata(updateSpecs)
-   vcTask = vsanapiutils.ConvertVsanTaskToVcTask(cnsUpdateTask, si._stub)
-   vsanapiutils.WaitForTasks([vcTask], si)
-   print(('Update CNS file volume task finished with status: %s' %
-          vcTask.info.state))
-   if vcTask.info.error is not None:
-      print("Update CNS file volume failed with error %s"
-            % vcTask.info.error)
+   failures = updateVolumeMetadataInBatches(si, volmgr, updateSpecs)
+   if failures:
+      print("Update CNS file volume failed with error %s" % failures[0][1])
       return -1
+   print('Update CNS file volume task finished')
 
    # Delete CNS volume
    print("Deleting file volume with volumeId: %s" % volumeId.id)
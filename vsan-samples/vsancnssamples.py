@@ -13,6 +13,7 @@ query CNS volume, together with delete CNS volume.
 NOTE: using vSAN CNS API requires a minimal vim.version.version11 Stub.
 
 usage: vsancnssamples.py [-h] -s HOST [-o PORT] -u USER [-p PASSWORD] [--cluster CLUSTER]
+                         [--list] [--page-size PAGESIZE] [--fields FIELDS]
   -h, --help            show this help message and exit
   -s HOST, --host HOST  Remote vCenter host to connect to
   -o PORT, --port PORT  Port to connect on
@@ -20,6 +21,10 @@ usage: vsancnssamples.py [-h] -s HOST [-o PORT] -u USER [-p PASSWORD] [--cluster
   -p PASSWORD, --password PASSWORD
                         Password to use when connecting to host
   --cluster CLUSTER
+  --list                List all CNS volumes instead of creating one
+  --page-size PAGESIZE  Number of volumes fetched per query when listing
+  --fields FIELDS       Comma separated CnsQuerySelection names returned when
+                        listing, e.g. VOLUME_NAME,HEALTH_STATUS
 
 """
 
@@ -41,12 +46,79 @@ import vsanmgmtObjects
 if sys.version[0] < '3':
    input = raw_input
 
+def iterVolumes(cnsVolumeManager, filterSpec=None, pageSize=100,
+                fields=None):
+   """
+   Iterates over the CNS volumes matching filterSpec, one page at a time.
+
+   The cursor of the filter is advanced with the offset returned by every
+   Query call, so volumes are fetched lazily in pages of pageSize instead of
+   in one response.
+   @param fields optional CnsQuerySelection names (for example VOLUME_NAME,
+          VOLUME_TYPE or HEALTH_STATUS) to limit the returned volume fields
+   """
+   if filterSpec is None:
+      filterSpec = vim.cns.QueryFilter()
+   selection = vim.cns.QuerySelection(names=fields) if fields else None
+   offset = 0
+   while True:
+      filterSpec.cursor = vim.cns.Cursor(offset=offset, limit=pageSize)
+      if selection is None:
+         result = cnsVolumeManager.Query(filterSpec)
+      else:
+         result = cnsVolumeManager.Query(filterSpec, selection)
+      if result is None or not result.volumes:
+         return
+      for volume in result.volumes:
+         yield volume
+      cursor = result.cursor
+      if cursor is None or cursor.offset <= offset or \
+            cursor.offset >= cursor.totalRecords:
+         return
+      offset = cursor.offset
+
+def updateVolumeMetadataInBatches(vcServiceInst, cnsVolumeManager, updateSpecs,
+                                  batchSize=100):
+   """
+   Updates volume metadata with one UpdateVolumeMetadata task per batch of
+   batchSize specs.
+   @return list of (volume id, error) for the failed updates
+   """
+   failures = []
+   for start in range(0, len(updateSpecs), batchSize):
+      batch = updateSpecs[start:start + batchSize]
+      cnsUpdateTask = cnsVolumeManager.UpdateVolumeMetadata(batch)
+      vcTask = vsanapiutils.ConvertVsanTaskToVcTask(cnsUpdateTask,
+                                                    vcServiceInst._stub)
+      vsanapiutils.WaitForTasks([vcTask], vcServiceInst)
+      if vcTask.info.error is not None:
+         failures.extend((spec.volumeId.id, vcTask.info.error)
+                         for spec in batch)
+         continue
+      results = getattr(vcTask.info.result, 'volumeResults', None) or []
+      failures.extend((result.volumeId.id, result.fault)
+                      for result in results if result.fault is not None)
+   return failures
+
+def listVolumes(cnsVolumeManager, args):
+   fields = args.fields.split(',') if args.fields else None
+   count = 0
+   for volume in iterVolumes(cnsVolumeManager, pageSize=args.pageSize,
+                             fields=fields):
+      print("%s\t%s" % (volume.volumeId.id, volume.name))
+      count += 1
+   print("%d CNS volumes found" % count)
+
 def main():
    args = GetArgs()
 
    # Create connection and get vc service instance and CNS volume manager stub
    (vcServiceInst, cnsVolumeManager) = connectToServers(args)
 
+   if args.list:
+      listVolumes(cnsVolumeManager, args)
+      return
+
    # Create CNS volume
    volumeName = "volume_sdk_test"
    datastores = GetVsanDatastore(args.clusterName, vcServiceInst)
@@ -65,12 +137,12 @@ def main():
    # Query CNS volume
    filterSpec = vim.cns.QueryFilter()
    filterSpec.names = [volumeName]
-   volumeQueryResult = cnsVolumeManager.Query(filterSpec)
-   print("CNS query result: {}".format(volumeQueryResult))
-   if volumeQueryResult is None:
-      msg = "ERROR: Query CNS volume failed. result is \n {0}".format(volumeQueryResult)
+   volume = next(iterVolumes(cnsVolumeManager, filterSpec, pageSize=1), None)
+   print("CNS query result: {}".format(volume))
+   if volume is None:
+      msg = "ERROR: Query CNS volume failed. volume {0} is not found".format(volumeName)
       sys.exit(msg)
-   volumeId = volumeQueryResult.volumes[0].volumeId
+   volumeId = volume.volumeId
 
    # Delete CNS volume
    cnsDeleteTask = cnsVolumeManager.Delete([volumeId], deleteDisk=True)
@@ -98,6 +170,13 @@ def GetArgs():
                        help='Password to use when connecting to host')
    parser.add_argument('--cluster', dest='clusterName', metavar="CLUSTER",
                        default='VSAN-Cluster')
+   parser.add_argument('--list', action='store_true',
+                       help='List all CNS volumes instead of creating one')
+   parser.add_argument('--page-size', dest='pageSize', type=int, default=100,
+                       help='Number of volumes fetched per query when listing')
+   parser.add_argument('--fields', action='store',
+                       help='Comma separated CnsQuerySelection names returned '
+                            'when listing, e.g. VOLUME_NAME,HEALTH_STATUS')
    args = parser.parse_args()
    return args
 
@@ -182,7 +261,7 @@ def PrepareVolumeCreateSpec(args, volumeName, datastores=None):
    containerCluster.clusterId = "k8_cls_1"
    containerCluster.vSphereUser = args.user
    backingOption = vim.cns.BlockBackingDetails()
-   backingOption.capacityInMb = 1024L
+   backingOption.capacityInMb = 1024
    createSpec = vim.cns.VolumeCreateSpec()
    createSpec.name = volumeName
    createSpec.volumeType = "BLOCK"
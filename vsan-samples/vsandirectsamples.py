@@ -11,9 +11,10 @@ To provide an example of vSAN direct API access, it shows how to query eligible
 disks, claim vSAN direct storages and query vsan direct storages.
 
 NOTE: this sample can only be run against vc whose version is equal
-to or higher than 7.0 u1.
+to or higher than 7.0 u1, and requires Python 3.
 
 usage: vsandirectsamples.py [-h] -s HOST [-o PORT] -u USER [-p PASSWORD] [--cluster CLUSTER]
+                            [--workers WORKERS]
   -h, --help            show this help message and exit
   -s HOST, --host HOST  Remote vCenter host to connect to
   -o PORT, --port PORT  Port to connect on
@@ -21,6 +22,7 @@ usage: vsandirectsamples.py [-h] -s HOST [-o PORT] -u USER [-p PASSWORD] [--clus
   -p PASSWORD, --password PASSWORD
                         Password to use when connecting to host
   --cluster CLUSTER
+  --workers WORKERS     Number of hosts queried concurrently
 
 """
 
@@ -32,15 +34,106 @@ import atexit
 import argparse
 import getpass
 import vsanapiutils
-from pyVmomi import vim
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim, vmodl
 from pyVim.connect import SmartConnect, Disconnect
 from pyVim import task
 
 import pyVmomi
 import vsanmgmtObjects
 
-if sys.version[0] < '3':
-   input = raw_input
+def getHostNames(si, cluster):
+   """
+   Retrieves the names of all hosts of the cluster in one property collector
+   call.
+   @return dict of host to host name
+   """
+   traversalSpec = vmodl.query.PropertyCollector.TraversalSpec(
+      name='traverseHosts', path='host', skip=False, type=vim.ComputeResource)
+   objSpec = vmodl.query.PropertyCollector.ObjectSpec(
+      obj=cluster, skip=True, selectSet=[traversalSpec])
+   propSpec = vmodl.query.PropertyCollector.PropertySpec(
+      type=vim.HostSystem, pathSet=['name'])
+   filterSpec = vmodl.query.PropertyCollector.FilterSpec(
+      objectSet=[objSpec], propSet=[propSpec])
+   pc = si.content.propertyCollector
+   result = pc.RetrievePropertiesEx(
+      [filterSpec], vmodl.query.PropertyCollector.RetrieveOptions())
+   hostNames = {}
+   while result is not None:
+      for obj in result.objects:
+         hostNames[obj.obj] = obj.propSet[0].val
+      if not result.token:
+         break
+      result = pc.ContinueRetrievePropertiesEx(result.token)
+   return hostNames
+
+class HostDiskInventory(object):
+   """
+   Disk inventory of the hosts of a cluster.
+
+   QueryDisksForVsan is sent to all hosts concurrently by at most workers
+   threads, and the result is cached until invalidate() is called, so a
+   claim operation plans with a single scan of the cluster.
+   """
+
+   def __init__(self, hostNames, workers=8):
+      self.hostNames = hostNames
+      self.workers = max(1, workers)
+      self._disks = None
+
+   def _queryHost(self, host):
+      return host, host.configManager.vsanSystem.QueryDisksForVsan()
+
+   def refresh(self):
+      with ThreadPoolExecutor(max_workers=self.workers) as executor:
+         self._disks = dict(executor.map(self._queryHost, self.hostNames))
+
+   def invalidate(self):
+      self._disks = None
+
+   def disks(self):
+      """
+      @return dict of host to the vim.vsan.host.DiskResult list of the host
+      """
+      if self._disks is None:
+         self.refresh()
+      return self._disks
+
+   def table(self):
+      """
+      @return list of (host name, canonical name, state, ssd) rows sorted by
+              host name and canonical name
+      """
+      rows = [(self.hostNames[host], result.disk.canonicalName, result.state,
+               bool(result.disk.ssd))
+              for host, results in self.disks().items() for result in results]
+      return sorted(rows)
+
+   def eligibleDisks(self, ssd=None):
+      """
+      @param ssd only return SSDs (True) or only magnetic disks (False)
+      @return dict of host to its eligible vim.host.ScsiDisk list
+      """
+      return dict(
+         (host, [result.disk for result in results
+                 if result.state == 'eligible' and
+                 (ssd is None or bool(result.disk.ssd) == ssd)])
+         for host, results in self.disks().items())
+
+def queryVsanDirectDisks(vdms, hostNames, workers=8):
+   """
+   Queries the vSAN direct disks of all hosts concurrently.
+   @return dict of host name to the set of canonical names
+   """
+   def queryHost(host):
+      ret = vdms.QueryVsanManagedDisks(host)
+      return hostNames[host], set(
+         disk.canonicalName for vsanDirectStorage in ret.vSANDirectDisks
+         for disk in vsanDirectStorage.scsiDisks)
+
+   with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+      return dict(executor.map(queryHost, hostNames))
 
 def main():
    args = GetArgs()
@@ -51,42 +144,36 @@ def main():
       return -1
 
    # Query available disks
-   hostDisks = {}
-   hosts = cluster.host
-   for host in hosts:
-      disks = host.configManager.vsanSystem.QueryDisksForVsan()
-      eligibleDisks = [d.disk for d in disks if d.state == 'eligible']
-      hostDisks[host.name] = eligibleDisks
+   hostNames = getHostNames(si, cluster)
+   inventory = HostDiskInventory(hostNames, args.workers)
+   for row in inventory.table():
+      print("%s\t%s\t%s\tssd=%s" % row)
+   hostDisks = inventory.eligibleDisks()
    outPutEligibleDisks = dict(
-      [(h, [d.canonicalName for d in hostDisks[h]]) for h in hostDisks])
+      [(hostNames[h], [d.canonicalName for d in hostDisks[h]])
+       for h in hostDisks])
    print("Eligible disks: %s" % outPutEligibleDisks)
 
    # Claim vSAN direct storages
-   for host in hosts:
-      eligibleDisks = hostDisks.get(host.name)
+   for host, eligibleDisks in hostDisks.items():
       if eligibleDisks:
          spec = vim.vsan.host.DiskMappingCreationSpec()
          spec.host = host
          spec.capacityDisks = [eligibleDisks[0]]
          spec.creationType = "vsandirect"
          print("Claiming disks %s for host %s" % \
-           (eligibleDisks[0].canonicalName, host.name))
+           (eligibleDisks[0].canonicalName, hostNames[host]))
          tsk = vdms.InitializeDiskMappings(spec)
          tsk = vim.Task(tsk._moId, si._stub)
          if (task.WaitForTask(tsk) != vim.TaskInfo.State.success):
             raise Exception("%s diskmapping creation task failed %s" % \
                (spec.creationType, tsk.info))
-         print("Succeed in claiming disk for host %s" % host.name)
+         print("Succeed in claiming disk for host %s" % hostNames[host])
+   # The disk states changed with the claim
+   inventory.invalidate()
 
    # Query vSAN direct storages
-   result = {}
-   for host in cluster.host:
-      ret = vdms.QueryVsanManagedDisks(host)
-      retDisks = set()
-      result[host.name] = retDisks
-      for vsanDirectStorage in ret.vSANDirectDisks:
-         retDisks.update(
-            [disk.canonicalName for disk in vsanDirectStorage.scsiDisks])
+   result = queryVsanDirectDisks(vdms, hostNames, args.workers)
    print("vSAN direct storages: %s" % result)
 
 def GetArgs():
@@ -105,6 +192,8 @@ def GetArgs():
                        help='Password to use when connecting to host')
    parser.add_argument('--cluster', dest='clusterName', metavar="CLUSTER",
                        default='VSAN-Cluster')
+   parser.add_argument('--workers', type=int, default=8, action='store',
+                       help='Number of hosts queried concurrently')
    args = parser.parse_args()
    return args
 
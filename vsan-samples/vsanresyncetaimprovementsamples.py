@@ -12,6 +12,14 @@ To provide an example of vCenter side vSAN API access, it shows how to get resyc
 query summary by  invoking the QuerySyncingVsanObjectsSummary() API of the
 VsanVcObjectSystemImpl MO.
 
+With --monitor the summary of the active resync is polled for one or more
+clusters concurrently, and every poll prints one line per cluster with the
+remaining objects and bytes, the throughput measured between successive
+samples and the ETA derived from it. The poll interval grows while nothing
+changes and is reset when the resync progresses.
+
+NOTE: this sample requires Python 3.
+
 """
 
 __author__ = 'Broadcom, Inc'
@@ -22,8 +30,9 @@ import ssl
 import atexit
 import argparse
 import getpass
-if sys.version[0] < '3':
-   input = raw_input
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Import the vSAN API python bindings and utilities.
 import pyVmomi
@@ -46,7 +55,19 @@ def GetArgs():
    parser.add_argument('-p', '--password', required=False, action='store',
                        help='Password to use when connecting to host')
    parser.add_argument('--cluster', dest='clusterName', metavar="CLUSTER",
-                      default='VSAN-Cluster')
+                      default='VSAN-Cluster',
+                      help='Cluster name, or a comma separated list of '
+                           'cluster names with --monitor')
+   parser.add_argument('--monitor', action='store_true',
+                       help='Poll the resync summary until no resync is left')
+   parser.add_argument('--interval', type=int, default=10,
+                       help='Initial poll interval in seconds with --monitor')
+   parser.add_argument('--max-interval', dest='maxInterval', type=int,
+                       default=120,
+                       help='Maximum poll interval in seconds with --monitor')
+   parser.add_argument('--samples', type=int, default=0,
+                       help='Stop after this many polls, 0 polls until the '
+                            'resync of all clusters completed')
    args = parser.parse_args()
    return args
 
@@ -65,6 +86,110 @@ def displayResyncSummary(res):
    print('totalBytesToSync = %s' % res.totalBytesToSync)
    print('totalRecoveryETA = %s' % res.totalRecoveryETA)
 
+class ResyncTrend(object):
+   """
+   Throughput and ETA of the resync of one cluster computed from successive
+   summary samples.
+   """
+
+   def __init__(self, window=5):
+      self.window = window
+      self.samples = []
+
+   def add(self, timestamp, res):
+      """
+      Adds the summary sampled at timestamp (seconds).
+      @return dict with the remaining objects and bytes, the throughput in
+              bytes per second over the last samples and the derived ETA
+      """
+      self.samples.append((timestamp, res.totalBytesToSync or 0))
+      self.samples = self.samples[-self.window:]
+      (firstTime, firstBytes), (lastTime, lastBytes) = \
+         self.samples[0], self.samples[-1]
+      throughput = None
+      if lastTime > firstTime:
+         throughput = max(firstBytes - lastBytes, 0) / (lastTime - firstTime)
+      eta = None
+      if throughput:
+         eta = int(lastBytes / throughput)
+      return {'objects': res.totalObjectsToSync or 0,
+              'bytes': lastBytes,
+              'throughput': throughput,
+              'eta': eta,
+              'reportedEta': res.totalRecoveryETA}
+
+   def progressed(self):
+      return len(self.samples) < 2 or self.samples[-1][1] != self.samples[-2][1]
+
+def nextInterval(interval, progressed, minInterval, maxInterval):
+   """
+   Resets the poll interval when the resync progressed, otherwise doubles it
+   up to maxInterval.
+   """
+   if progressed:
+      return minInterval
+   return min(interval * 2, maxInterval)
+
+def querySummary(vhs, cluster, of):
+   """
+   Queries the resync summary of one cluster. A failing query is returned
+   as the error message instead of aborting the other clusters.
+   @return (summary, None) or (None, error message)
+   """
+   try:
+      return vhs.QuerySyncingVsanObjectsSummary(cluster, of), None
+   except vmodl.MethodFault as e:
+      return None, e.msg or type(e).__name__
+
+def monitorResync(vhs, clusters, minInterval, maxInterval, samples=0):
+   """
+   Polls the active resync summary of all clusters concurrently and prints
+   one tab separated line per cluster and poll. A cluster whose query fails
+   gets an error line and is polled again, as its resync may not be done.
+   @param clusters list of (cluster name, cluster)
+   """
+   of = vim.cluster.VsanSyncingObjectFilter()
+   of.resyncStatus = 'active'
+   of.offset = 0
+   # Only the summary totals are used
+   of.numberOfObjects = 1
+
+   trends = dict((name, ResyncTrend()) for name, _ in clusters)
+   interval = minInterval
+   count = 0
+   print('time\tcluster\tobjects\tbytes\tthroughputBps\teta\treportedEta')
+   with ThreadPoolExecutor(max_workers=min(len(clusters), 16) or 1) as executor:
+      while True:
+         now = time.time()
+         results = executor.map(
+            lambda item: querySummary(vhs, item[1], of), clusters)
+         stamp = datetime.datetime.fromtimestamp(now).strftime('%H:%M:%S')
+         remaining = 0
+         failed = False
+         progressed = False
+         for (name, _), (res, error) in zip(clusters, results):
+            if error is not None:
+               failed = True
+               print('%s\t%s\terror: %s' % (stamp, name, error))
+               continue
+            point = trends[name].add(now, res)
+            progressed = progressed or trends[name].progressed()
+            remaining += point['bytes']
+            print('%s\t%s\t%s\t%s\t%s\t%s\t%s' % (
+               stamp, name, point['objects'], point['bytes'],
+               '-' if point['throughput'] is None
+               else int(point['throughput']),
+               '-' if point['eta'] is None else point['eta'],
+               point['reportedEta']))
+         sys.stdout.flush()
+         count += 1
+         if (remaining == 0 and not failed) or \
+               (samples and count >= samples):
+            return
+         interval = nextInterval(interval, progressed, minInterval,
+                                 maxInterval)
+         time.sleep(interval)
+
 def main():
    args = GetArgs()
    if args.password:
@@ -104,6 +229,19 @@ def main():
       vcMos = vsanapiutils.GetVsanVcMos(
             si._stub, context=context, version=apiVersion)
       vhs = vcMos['vsan-cluster-object-system']
+
+      if args.monitor:
+         clusters = []
+         for name in args.clusterName.split(','):
+            cluster = getClusterInstance(name.strip(), si)
+            if cluster is None:
+               print("Cluster %s is not found for %s" % (name, args.host))
+               return -1
+            clusters.append((name.strip(), cluster))
+         monitorResync(vhs, clusters, args.interval, args.maxInterval,
+                       args.samples)
+         return
+
       cluster = getClusterInstance(args.clusterName, si)
 
       if cluster is None:
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (c) 2016-2024 Broadcom. All Rights Reserved.
+The term "Broadcom" refers to Broadcom Inc. and/or its subsidiaries.
+
+This file includes helpers shared by the vSAN space usage samples
+vsanSpaceReportSamples.py and vsanclusterreportsamples.py for collecting
+the QuerySpaceUsage results of several clusters by object type and exporting
+them as CSV or JSON lines.
+
+"""
+
+__author__ = 'Broadcom, Inc'
+
+import sys
+import os
+import io
+import csv
+import json
+import datetime
+
+class SpaceUsageTable(object):
+   """
+   Columnar table of vSAN space usage by object type.
+
+   Every QuerySpaceUsage result added to the table contributes one row per
+   object type, tagged with the cluster name and the sample time, so the
+   results of many clusters and of repeated runs can be kept together and
+   exported for trending. The object types are taken from the result instead
+   of a fixed list, so types added by newer vSAN releases are not missed.
+   """
+
+   COLUMNS = ('time', 'cluster', 'objType', 'usedB', 'primaryCapacityB',
+              'overheadB', 'reservedCapacityB')
+
+   def __init__(self):
+      self.columns = dict((column, []) for column in self.COLUMNS)
+
+   def __len__(self):
+      return len(self.columns['time'])
+
+   def add(self, clusterName, spaceResult, timestamp=None):
+      """
+      Adds the space usage by object type of one QuerySpaceUsage result in a
+      single pass, summing entries reported more than once for a type.
+      """
+      if timestamp is None:
+         timestamp = datetime.datetime.utcnow().isoformat() + 'Z'
+      spaceDetail = spaceResult.spaceDetail
+      usageByType = {}
+      for usage in (spaceDetail.spaceUsageByObjectType or []
+                    if spaceDetail else []):
+         totals = usageByType.setdefault(usage.objType, [0, 0, 0, 0])
+         for i, column in enumerate(self.COLUMNS[3:]):
+            totals[i] += getattr(usage, column, None) or 0
+      for objType in sorted(usageByType):
+         row = [timestamp, clusterName, objType] + usageByType[objType]
+         for column, value in zip(self.COLUMNS, row):
+            self.columns[column].append(value)
+
+   def rows(self):
+      return [dict(zip(self.COLUMNS, row))
+              for row in zip(*[self.columns[c] for c in self.COLUMNS])]
+
+   def totals(self, key='objType', column='usedB', clusterName=None):
+      """
+      Sums column grouped by the key column, optionally for one cluster.
+      """
+      result = {}
+      for group, cluster, value in zip(self.columns[key],
+                                       self.columns['cluster'],
+                                       self.columns[column]):
+         if clusterName is None or cluster == clusterName:
+            result[group] = result.get(group, 0) + value
+      return result
+
+   def writeCsv(self, path):
+      """
+      Appends the rows to the CSV file at path, writing the header to a new
+      file only.
+      """
+      newFile = not os.path.exists(path) or os.path.getsize(path) == 0
+      if sys.version[0] < '3':
+         f = open(path, 'ab')
+      else:
+         f = io.open(path, 'a', newline='')
+      with f:
+         writer = csv.writer(f)
+         if newFile:
+            writer.writerow(self.COLUMNS)
+         writer.writerows(zip(*[self.columns[c] for c in self.COLUMNS]))
+
+   def writeJson(self, path):
+      """
+      Appends the rows to the file at path as JSON lines.
+      """
+      with open(path, 'a') as f:
+         for row in self.rows():
+            f.write(json.dumps(row, sort_keys=True) + '\n')